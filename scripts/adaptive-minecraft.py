@@ -1,80 +1,427 @@
 #!/usr/bin/env python3
 import subprocess
 import os
+import shlex
+import signal
 import time
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
 import psutil
 import requests
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
+from hibernate import WakeListener, query_status
+from jarcache import JarCache, JarError
+from jvmprofile import launch_args
+from rcon import RconError, RconPool, ensure_rcon, rcon_settings, read_properties
+from serverlog import Histogram, ServerLog
 
 app = Flask(__name__)
 
+SERVERS_DIR = os.environ.get('MC_SERVERS_DIR', '/home/termux/minecraft/servers')
+JAR_CACHE_DIR = os.environ.get('MC_JAR_CACHE', os.path.join(os.path.dirname(SERVERS_DIR), 'jars'))
+
+class Supervisor:
+    """Runs each server's JVM as a tracked child process and reaps it when it exits"""
+    def __init__(self, on_exit):
+        self.processes = {}  # server_id -> {'process', 'pid', 'started', 'stopping', 'exited'}
+        self.lock = threading.Lock()
+        self.on_exit = on_exit
+    
+    def launch(self, server_id, args, cwd):
+        """Start args in cwd with a console pipe on stdin and output in console.log"""
+        with open(os.path.join(cwd, 'console.log'), 'ab') as log:
+            process = subprocess.Popen(args, cwd=cwd, stdin=subprocess.PIPE, stdout=log,
+                                       stderr=subprocess.STDOUT, start_new_session=True)
+        with open(os.path.join(cwd, 'server.pid'), 'w') as f:
+            f.write(str(process.pid))
+        return self.track(server_id, process, process.pid, time.time(), cwd)
+    
+    def adopt(self, server_id, cwd):
+        """Track a server left running by a previous manager (no console until it restarts)"""
+        try:
+            with open(os.path.join(cwd, 'server.pid')) as f:
+                process = psutil.Process(int(f.read().strip()))
+            if 'java' not in ' '.join(process.cmdline()):
+                return None
+        except (OSError, ValueError, psutil.Error):
+            return None
+        return self.track(server_id, process, process.pid, process.create_time(), cwd)
+    
+    def track(self, server_id, process, pid, started, cwd):
+        entry = {'process': process, 'pid': pid, 'started': started, 'cwd': cwd,
+                 'stopping': False, 'exited': threading.Event()}
+        with self.lock:
+            self.processes[server_id] = entry
+        threading.Thread(target=self.reap, args=(server_id, entry), daemon=True).start()
+        return entry
+    
+    def reap(self, server_id, entry):
+        """Block until the process exits, then record it"""
+        try:
+            code = entry['process'].wait()  # psutil returns None for processes we did not start
+        except psutil.Error:
+            code = None
+        with self.lock:
+            if self.processes.get(server_id) is entry:
+                del self.processes[server_id]
+        try:
+            os.unlink(os.path.join(entry['cwd'], 'server.pid'))
+        except OSError:
+            pass
+        entry['exit_code'] = code
+        entry['exited'].set()
+        self.on_exit(server_id, code, entry['stopping'])
+    
+    def get(self, server_id):
+        with self.lock:
+            return self.processes.get(server_id)
+    
+    def send(self, server_id, *commands):
+        """Write console commands to the server's stdin"""
+        entry = self.get(server_id)
+        if entry is None:
+            raise KeyError(server_id)
+        stdin = getattr(entry['process'], 'stdin', None)
+        if stdin is None:
+            raise RuntimeError('server was adopted after a restart and has no console pipe')
+        stdin.write(''.join(f'{command}\n' for command in commands).encode())
+        stdin.flush()
+    
+    def stop(self, server_id, timeout=90, request_stop=None):
+        """Ask the server to stop (request_stop, else the console pipe) and wait for the process
+        to exit; escalate to SIGTERM, then SIGKILL"""
+        entry = self.get(server_id)
+        if entry is None:
+            return None
+        entry['stopping'] = True
+        try:
+            if request_stop:
+                request_stop()
+            else:
+                self.send(server_id, 'stop')
+        except (RconError, RuntimeError, OSError):
+            try:
+                self.send(server_id, 'stop')
+            except (RuntimeError, OSError):
+                entry['process'].send_signal(signal.SIGTERM)  # the JVM saves worlds on SIGTERM too
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            if entry['exited'].wait(timeout):
+                break
+            print(f"⚠️  Server {server_id} still running, sending {sig.name}")
+            try:
+                entry['process'].send_signal(sig)
+            except (OSError, psutil.Error):
+                pass
+            timeout = 10
+        entry['exited'].wait(10)
+        return entry.get('exit_code')
+
 class AdaptiveMinecraft:
     def __init__(self):
-        self.combiner_url = "http://localhost:5001"
+        self.combiner_url = os.environ.get('COMBINER_URL', "http://localhost:5001")  # the main node's, on a worker
         self.version = "1.21.10"
+        self.node_id = os.environ.get('NODE_ID', 'main-node')  # servers placed elsewhere are not started here
+        self.config_refresh = float(os.environ.get('CONFIG_REFRESH', 30))
+        self.stop_timeout = float(os.environ.get('STOP_TIMEOUT', 90))
+        self.log_poll = float(os.environ.get('LOG_POLL', 1))
+        self.jar_wait = float(os.environ.get('JAR_WAIT', 300))
+        self.zgc_min_heap = float(os.environ.get('ZGC_MIN_HEAP_GB', 16))
+        self.hibernate_after = float(os.environ.get('HIBERNATE_AFTER', 600))  # 0 disables
+        self.idle_rcon_checks = int(os.environ.get('IDLE_RCON_CHECKS', 3))
+        self.listeners = {}  # server_id -> WakeListener holding a hibernated server's port
+        self.hibernating = set()  # servers being put to sleep
+        self.idle_checks = {}  # server_id -> {'misses': RCON failures in a row, 'next': earliest next check}
+        self.status_cache = {}  # server_id -> last server-list status JSON
+        self.launch_timings = {}  # launch label -> Histogram of launch-to-Done seconds
+        self.timings_lock = threading.Lock()
+        self.jars = JarCache(JAR_CACHE_DIR, mirror=os.environ.get('MC_JAR_MIRROR'),
+                             allow_unverified=os.environ.get('MC_JAR_ALLOW_UNVERIFIED') == '1')
+        self.jars.prefetch(self.version).add_done_callback(  # in the background, ready before the first start
+            lambda f: f.exception() and print(f"⚠️  Jar prefetch failed: {f.exception()}"))
+        self.lock = threading.Lock()
+        self.servers = {}
+        self.config_etag = None
+        self.resources = {}
+        self.supervisor = Supervisor(self.server_exited)
+        self.rcon = RconPool()
+        self.logs = {}  # server_id -> ServerLog
         self.update_config()
+        self.refresh_resources()
+        for server_id, server in self.servers.items():
+            entry = self.supervisor.adopt(server_id, server['directory'])
+            if entry:
+                self.server_log(server_id).launched(entry['started'], fresh=False)  # replay its log
+                self.mark_running(server_id)
+                print(f"🔗 Adopted running server {server_id} (pid {server['pid']})")
         
     def update_config(self):
-        """Get adaptive configuration from combiner"""
+        """Get adaptive configuration from combiner (a 304 when nothing changed)"""
+        headers = {'If-None-Match': self.config_etag} if self.config_etag else {}
         try:
-            response = requests.get(f"{self.combiner_url}/resources/adaptive", timeout=5)
-            config = response.json()
-            self.adaptive_config = config['minecraft']
-            self.setup_servers()
-            return True
-        except:
+            response = requests.get(f"{self.combiner_url}/resources/adaptive", headers=headers, timeout=5)
+            if response.status_code == 304:
+                return True
+            response.raise_for_status()
+            config = response.json()['minecraft']
+            self.config_etag = response.headers.get('ETag')
+            success = True
+        except (requests.RequestException, ValueError, KeyError):
+            if self.servers:
+                return False  # keep the last good configuration
             # Fallback configuration
-            self.adaptive_config = {
+            config = {
                 'max_servers': 1,
                 'ram_per_server': 6,
                 'strategy': 'fallback'
             }
+            success = False
+        with self.lock:
+            self.adaptive_config = config
             self.setup_servers()
-            return False
+        return success
     
     def setup_servers(self):
-        """Setup servers based on adaptive configuration"""
-        self.servers = {}
+        """Merge the adaptive configuration into self.servers; caller holds self.lock.
+        
+        Running servers keep their settings until they restart. Stopped servers beyond
+        max_servers are dropped.
+        """
+        wanted = {str(i) for i in range(1, self.adaptive_config['max_servers'] + 1)}
+        for server_id in list(self.servers):
+            if server_id not in wanted and self.servers[server_id]['status'] != 'running':
+                listener = self.listeners.pop(server_id, None)
+                if listener:
+                    listener.close()
+                del self.servers[server_id]
         
-        for i in range(1, self.adaptive_config['max_servers'] + 1):
+        for server_id in sorted(wanted, key=int):
+            i = int(server_id)
+            server = self.servers.setdefault(server_id, {
+                'status': 'stopped',
+                'pid': None,
+                'started_at': None,
+                'exit_code': None,
+                'directory': f'{SERVERS_DIR}/server-{i}'
+            })
+            if server['status'] == 'running':
+                continue
             ram_config = self.get_ram_config(i)
-            self.servers[str(i)] = {
+            server.update({
                 'port': 25564 + i,
+                'rcon_port': 25574 + i,
                 'memory_xmx': f"{ram_config['xmx']}G",
                 'memory_xms': f"{ram_config['xms']}G",
-                'status': 'stopped',
-                'screen_session': f'mc-adaptive-{i}',
-                'directory': f'/home/termux/minecraft/servers/server-{i}',
-                'strategy': self.adaptive_config['strategy']
-            }
+                'strategy': self.adaptive_config['strategy'],
+                'node': self.adaptive_config.get('placements', {}).get(server_id, self.node_id)
+            })
+    
+    def refresh_resources(self):
+        memory = psutil.virtual_memory()
+        self.resources = {
+            "available_ram_gb": round(memory.available / (1024**3), 2),
+            "total_ram_gb": round(memory.total / (1024**3), 2),
+            "ram_percent": memory.percent
+        }
+    
+    def rcon_client(self, server_id):
+        """Pooled RCON connection to a server, or None if its server.properties has no RCON"""
+        settings = rcon_settings(self.servers[server_id]['directory'])
+        if settings is None:
+            return None
+        return self.rcon.get(server_id, '127.0.0.1', *settings)
+    
+    def server_log(self, server_id):
+        with self.lock:
+            log = self.logs.get(server_id)
+            if log is None:
+                log = self.logs[server_id] = ServerLog(self.servers[server_id]['directory'],
+                                                       on_ready=self.record_launch)
+            return log
+    
+    def record_launch(self, label, seconds):
+        """Launch-to-Done time per profile, to compare cold starts across profiles and CDS"""
+        if label is None:
+            return
+        with self.timings_lock:
+            histogram = self.launch_timings.setdefault(label, Histogram([5, 10, 20, 30, 45, 60, 90, 120, 180, 300]))
+            histogram.observe(seconds)
+        print(f"⏱️  Launch to Done in {seconds:.1f}s ({label})")
+    
+    def log_loop(self):
+        """Parse new log lines of running servers; each poll reads only what was appended"""
+        while True:
+            time.sleep(self.log_poll)
+            with self.lock:
+                running = [self.logs[server_id] for server_id, server in self.servers.items()
+                           if server['status'] == 'running' and server_id in self.logs]
+            for log in running:
+                try:
+                    log.poll()
+                except OSError as e:
+                    print(f"Log tail error: {e}")
+            if self.hibernate_after > 0:
+                self.check_idle()
+    
+    def check_idle(self):
+        """Hibernate running servers that have been empty for hibernate_after seconds"""
+        with self.lock:
+            candidates = [server_id for server_id, server in self.servers.items()
+                          if server['status'] == 'running' and server_id in self.logs
+                          and server_id not in self.hibernating]
+        now = time.time()
+        for server_id in candidates:
+            empty = self.logs[server_id].empty_seconds()
+            if empty is None:
+                self.idle_checks.pop(server_id, None)
+            elif empty >= self.hibernate_after and now >= self.idle_checks.get(server_id, {}).get('next', 0):
+                with self.lock:
+                    self.hibernating.add(server_id)
+                threading.Thread(target=self.hibernate, args=(server_id,), daemon=True).start()
+    
+    def cache_status(self, server_id):
+        """Remember what the server shows in the server list, for the listener to repeat"""
+        server = self.servers[server_id]
+        try:
+            self.status_cache[server_id] = query_status('127.0.0.1', server['port'])
+        except (OSError, ValueError):
+            if server_id not in self.status_cache:
+                properties = read_properties(os.path.join(server['directory'], 'server.properties'))
+                self.status_cache[server_id] = {
+                    'description': {'text': properties.get('motd', 'A Minecraft Server')},
+                    'players': {'max': int(properties.get('max-players', 20))}
+                }
+        return self.status_cache[server_id]
+    
+    def hibernate(self, server_id):
+        """Stop an empty server and hold its port with a WakeListener until someone joins"""
+        try:
+            if not self.confirm_empty(server_id):
+                return
+            self.idle_checks.pop(server_id, None)
+            status = self.cache_status(server_id)
+            print(f"💤 Server {server_id} has been empty for {self.hibernate_after:.0f}s, hibernating")
+            if not self.stop_server(server_id)['success']:
+                return
+            self.listen(server_id, status)
+        finally:
+            with self.lock:
+                self.hibernating.discard(server_id)
+    
+    def confirm_empty(self, server_id):
+        """Cross-check the log's empty player list with RCON 'list'.
+        
+        An RCON failure counts as unknown: the check is repeated on the next tick, and
+        after IDLE_RCON_CHECKS failures in a row the log's player count is trusted.
+        """
+        check = self.idle_checks.setdefault(server_id, {'misses': 0, 'next': 0})
+        client = self.rcon_client(server_id)
+        if client is None:
+            return True
+        try:
+            players = client.command('list')
+        except RconError as e:
+            check['misses'] += 1
+            if check['misses'] >= self.idle_rcon_checks:
+                print(f"⚠️  RCON to server {server_id} failed {check['misses']} times ({e}), trusting its log: no players")
+                return True
+            print(f"⚠️  Idle check of server {server_id} could not ask RCON ({e}), retrying")
+            return False
+        check['misses'] = 0
+        if not players.startswith('There are 0 '):
+            print(f"👥 Server {server_id} has players the log did not show, not hibernating")
+            check['next'] = time.time() + self.hibernate_after  # the log missed a join
+            return False
+        return True
+    
+    def listen(self, server_id, status):
+        with self.lock:
+            server = self.servers.get(server_id)
+            if server is None or server['status'] == 'running':
+                return
+            try:
+                listener = WakeListener(server['port'], status, lambda: self.wake(server_id))
+            except OSError as e:
+                print(f"⚠️  Cannot hold port {server['port']} for server {server_id}: {e}")
+                return
+            self.listeners[server_id] = listener.start()
+            server.update(status='hibernating', hibernated_at=time.time())
+    
+    def release_port(self, server_id):
+        """Close a hibernated server's listener; True if it had one"""
+        with self.lock:
+            listener = self.listeners.pop(server_id, None)
+            if listener and self.servers.get(server_id, {}).get('status') == 'hibernating':
+                self.servers[server_id]['status'] = 'stopped'
+        if listener:
+            listener.close()
+        return listener is not None
+    
+    def wake(self, server_id):
+        """WakeListener callback on a login attempt"""
+        print(f"⏰ Login attempt on hibernated server {server_id}, starting it")
+        result = self.start_server(server_id)
+        if not result['success']:
+            print(f"⚠️  Could not wake server {server_id}: {result['error']}")
+            self.listen(server_id, self.status_cache.get(server_id, {}))
+    
+    def background_refresh(self):
+        """Keep config and resource figures fresh so status requests never block"""
+        last_config = time.time()
+        while True:
+            time.sleep(5)
+            try:
+                self.refresh_resources()
+                if time.time() - last_config >= self.config_refresh:
+                    self.update_config()
+                    last_config = time.time()
+            except Exception as e:
+                print(f"Background refresh error: {e}")
+    
+    def mark_running(self, server_id):
+        with self.lock:
+            entry = self.supervisor.get(server_id)
+            if entry is None:
+                return  # already exited and reaped
+            self.servers[server_id].update(status='running', pid=entry['pid'], started_at=entry['started'],
+                                           exit_code=None)
+    
+    def server_exited(self, server_id, code, requested):
+        """Supervisor callback when a server process has been reaped"""
+        status = 'stopped' if requested or code == 0 else 'crashed'
+        print(f"{'🛑' if status == 'stopped' else '💥'} Server {server_id} exited with code {code} ({status})")
+        log = self.logs.get(server_id)
+        if log:
+            try:
+                log.poll()  # the last lines often say why it died
+            except OSError:
+                pass
+            log.exited(unexpected=status == 'crashed')
+        with self.lock:
+            server = self.servers.get(server_id)
+            if server:
+                server.update(status=status, pid=None, exit_code=code, stopped_at=time.time())
+            self.rcon.drop(server_id)
+            self.setup_servers()  # apply configuration that changed while it ran
     
     def get_ram_config(self, server_id):
         """Get RAM configuration based on adaptive strategy"""
         base_ram = self.adaptive_config['ram_per_server']
         
         if self.adaptive_config['strategy'] == 'high-performance':
-            return {'xmx': base_ram, 'xms': 2}
+            return {'xmx': base_ram, 'xms': base_ram}  # fully committed and pre-touched
         elif self.adaptive_config['strategy'] == 'balanced':
             return {'xmx': base_ram, 'xms': 1}
         else:  # single-node or fallback
-            return {'xmx': 6, 'xms': 2}
+            return {'xmx': base_ram, 'xms': 2}
     
     def download_server(self, server_dir):
-        """Download Minecraft server"""
-        server_jar = f"{server_dir}/minecraft_server.jar"
-        if not os.path.exists(server_jar):
-            print(f"📥 Downloading Minecraft {self.version}...")
-            try:
-                subprocess.run([
-                    "wget", "-O", server_jar,
-                    "https://piston-data.mojang.com/v1/objects/7b40b8b0c3b6b3d8b0b8b0c3b6b3d8b0b8b0c3b6/minecraft_server.1.21.10.jar"
-                ], check=True, capture_output=True)
-            except:
-                # Try alternative URL
-                subprocess.run([
-                    "wget", "-O", server_jar,
-                    "https://piston-data.mojang.com/v1/objects/7b40b8b0c3b6b3d8b0b8b0c3b6b3d8b0b8b0c3b6/server.jar"
-                ], capture_output=True)
+        """Link the cached, checksum-verified server jar into server_dir (one download per version)"""
+        try:
+            linked = self.jars.install(self.version, f"{server_dir}/minecraft_server.jar", self.jar_wait)
+        except FutureTimeout:
+            raise JarError(f"Minecraft {self.version} is still downloading, try again shortly")
+        if linked:
+            print(f"🔗 Linked Minecraft {self.version} jar into {server_dir}")
         
         # Auto-accept EULA
         eula_file = f"{server_dir}/eula.txt"
@@ -95,11 +442,13 @@ class AdaptiveMinecraft:
             return available_gb >= (server_ram + 1)  # Extra buffer
     
     def start_server(self, server_id):
-        if not self.update_config():
-            return {"success": False, "error": "Failed to get adaptive configuration"}
-            
         if server_id not in self.servers:
             return {"success": False, "error": f"Server {server_id} not available"}
+        if self.supervisor.get(server_id):
+            return {"success": False, "error": f"Server {server_id} is already running"}
+        if self.servers[server_id]['node'] != self.node_id:
+            return {"success": False,
+                    "error": f"Server {server_id} is placed on node {self.servers[server_id]['node']}, not {self.node_id}"}
             
         if not self.can_start_server(server_id):
             memory = psutil.virtual_memory()
@@ -112,6 +461,7 @@ class AdaptiveMinecraft:
                 "adaptive_config": self.adaptive_config
             }
         
+        self.release_port(server_id)  # a hibernated server's listener gives the port back
         try:
             server_data = self.servers[server_id]
             server_dir = server_data['directory']
@@ -119,6 +469,10 @@ class AdaptiveMinecraft:
             
             # Download server
             self.download_server(server_dir)
+            ensure_rcon(server_dir, server_data['rcon_port'])
+            jvm_args, launch = launch_args(
+                server_data['strategy'], int(server_data['memory_xmx'][:-1]), int(server_data['memory_xms'][:-1]),
+                self.jars.sha1(self.version), f"{server_dir}/.cds", zgc_min_heap_gb=self.zgc_min_heap)
             
             # Create adaptive start script
             start_script = f"{server_dir}/start.sh"
@@ -127,23 +481,24 @@ class AdaptiveMinecraft:
 cd {server_dir}
 echo "🎮 Adaptive Minecraft Server {server_id}"
 echo "💾 RAM: {server_data['memory_xmx']} (Auto-configured)"
-echo "⚡ Strategy: {server_data['strategy']}"
+echo "⚡ Strategy: {server_data['strategy']} (JVM profile {launch['profile']}, {launch['gc']}, CDS {launch['cds']})"
 echo "🌐 Port: {server_data['port']}"
-java -Xmx{server_data['memory_xmx']} -Xms{server_data['memory_xms']} -jar minecraft_server.jar nogui
+exec java {shlex.join(jvm_args)} -jar minecraft_server.jar nogui
 """)
             os.chmod(start_script, 0o755)
             
-            # Start server
-            subprocess.run([
-                "screen", "-dmS", server_data['screen_session'], "bash", start_script
-            ], check=True)
-            
-            self.servers[server_id]['status'] = 'running'
+            # Start server as a supervised child (exec makes the JVM the tracked PID)
+            label = f"{launch['profile']}/{launch['gc']}/cds-{launch['cds']}"
+            self.server_log(server_id).launched(time.time(), label=label)  # skip the previous run's log
+            self.supervisor.launch(server_id, ["bash", start_script], server_dir)
+            with self.lock:
+                server_data['launch'] = launch
+            self.mark_running(server_id)
             
             return {
                 "success": True,
                 "message": f"Minecraft Server {server_id} started (Adaptive Mode)",
-                "server": server_data,
+                "server": self.servers[server_id],
                 "adaptive_config": self.adaptive_config
             }
             
@@ -151,46 +506,64 @@ java -Xmx{server_data['memory_xmx']} -Xms{server_data['memory_xms']} -jar minecr
             return {"success": False, "error": str(e)}
     
     def stop_server(self, server_id):
-        if server_id in self.servers:
+        if server_id not in self.servers:
+            return {"success": False, "error": "Server not found"}
+        if self.release_port(server_id):
+            return {"success": True, "message": f"Server {server_id} stopped (was hibernating)"}
+        if not self.supervisor.get(server_id):
+            return {"success": False, "error": f"Server {server_id} is not running"}
+        started = time.time()
+        client = self.rcon_client(server_id)
+        code = self.supervisor.stop(server_id, self.stop_timeout, client and (lambda: client.command('stop')))
+        if self.supervisor.get(server_id):
+            return {"success": False, "error": "Failed to stop server"}
+        return {"success": True, "message": f"Server {server_id} stopped",
+                "exit_code": code, "seconds": round(time.time() - started, 2)}
+    
+    def send_console(self, server_id, commands):
+        """Run commands over RCON and return the responses; the console pipe is the fallback
+        while RCON is not up yet (it carries no responses)"""
+        if server_id not in self.servers:
+            return {"success": False, "error": f"Server {server_id} not available"}
+        client = self.rcon_client(server_id) if self.supervisor.get(server_id) else None
+        if client:
             try:
-                screen_session = self.servers[server_id]['screen_session']
-                subprocess.run([
-                    "screen", "-S", screen_session, "-X", "stuff", "stop\\n"
-                ], capture_output=True)
-                time.sleep(5)
-                subprocess.run([
-                    "screen", "-S", screen_session, "-X", "quit"
-                ], capture_output=True)
-                self.servers[server_id]['status'] = 'stopped'
-                return {"success": True, "message": f"Server {server_id} stopped"}
-            except:
-                return {"success": False, "error": "Failed to stop server"}
-        return {"success": False, "error": "Server not found"}
+                return {"success": True, "via": "rcon", "responses": client.batch(commands)}
+            except RconError as e:
+                print(f"⚠️  RCON to server {server_id} failed ({e}), using the console pipe")
+        try:
+            self.supervisor.send(server_id, *commands)
+        except KeyError:
+            return {"success": False, "error": f"Server {server_id} is not running"}
+        except (RuntimeError, OSError) as e:
+            return {"success": False, "error": str(e)}
+        return {"success": True, "via": "console", "sent": len(commands)}
+    
+    def launch_timing_stats(self):
+        with self.timings_lock:
+            return {label: histogram.to_dict() for label, histogram in self.launch_timings.items()}
     
     def get_status(self):
-        self.update_config()
-        memory = psutil.virtual_memory()
-        
-        # Check server status
-        for server_id in self.servers:
-            result = subprocess.run(["screen", "-ls"], capture_output=True, text=True)
-            if self.servers[server_id]['screen_session'] in result.stdout:
-                self.servers[server_id]['status'] = 'running'
-            else:
-                self.servers[server_id]['status'] = 'stopped'
+        """Answered from memory: no subprocesses, no HTTP calls"""
+        now = time.time()
+        with self.lock:
+            servers = {server_id: dict(server, uptime_seconds=round(now - server['started_at'], 1)
+                                       if server['status'] == 'running' else None)
+                       for server_id, server in self.servers.items()}
+            logs = {server_id: self.logs[server_id] for server_id in servers if server_id in self.logs}
+        for server_id, log in logs.items():
+            servers[server_id]['health'] = log.snapshot()
         
         return {
             "adaptive_system": {
                 "enabled": True,
                 "config": self.adaptive_config,
-                "server_count": len(self.servers)
+                "server_count": len(servers)
             },
-            "resources": {
-                "available_ram_gb": round(memory.available / (1024**3), 2),
-                "total_ram_gb": round(memory.total / (1024**3), 2),
-                "ram_percent": memory.percent
-            },
-            "servers": self.servers,
+            "resources": self.resources,
+            "servers": servers,
+            "jars": self.jars.stats(),
+            "launch_timings": self.launch_timing_stats(),
             "version": self.version
         }
 
@@ -216,8 +589,19 @@ def start_minecraft(server_id):
 def stop_minecraft(server_id):
     return jsonify(mc_manager.stop_server(server_id))
 
+@app.route('/minecraft/console/<server_id>', methods=['POST'])
+def minecraft_console(server_id):
+    """Send console commands: {"command": "say hi"} or {"commands": ["save-off", "save-all flush"]}"""
+    data = request.get_json(silent=True) or {}
+    commands = data.get('commands') or ([data['command']] if data.get('command') else [])
+    if not commands:
+        return jsonify({"success": False, "error": "command or commands is required"}), 400
+    result = mc_manager.send_console(server_id, commands)
+    return jsonify(result), 200 if result['success'] else 409
+
 if __name__ == '__main__':
     print("🎮 Adaptive Minecraft Manager Started")
     print("⚡ Auto-combining mode: ACTIVE")
-    mc_manager.update_config()
+    threading.Thread(target=mc_manager.background_refresh, daemon=True).start()
+    threading.Thread(target=mc_manager.log_loop, daemon=True).start()
     app.run(host='0.0.0.0', port=5002, threaded=True)
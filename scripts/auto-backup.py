@@ -1,12 +1,1588 @@
 #!/usr/bin/env python3
 import os
+import bz2
+import fcntl
 import json
+import lzma
 import time
+import zlib
+import queue
+import argparse
+import struct
+import sqlite3
+import hashlib
 import zipfile
+import shutil
+import tempfile
+import psutil
+import requests
 import datetime
 import subprocess
 import threading
 from pathlib import Path
+from contextlib import contextmanager
+from collections import namedtuple, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from rcon import RconError, RconPool, rcon_settings
+
+# Gear table for content-defined chunking. Derived from sha256 so chunk
+# boundaries (and therefore dedup) stay stable across runs and machines.
+GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], 'big') for i in range(256)]
+# One hash bit per byte value (exactly half are 1), for bytes.translate: the cut search
+# runs in C, not per byte in Python
+GEAR_BITS = bytes(g >= sorted(GEAR)[128] for g in GEAR)
+
+# One scanned file: everything a backup run needs without another stat()
+FileEntry = namedtuple('FileEntry', 'path arcname size mtime_ns inode mode')
+
+# Formats that are already compressed; deflating them again only burns CPU
+COMPRESSED_EXTENSIONS = {
+    '.mca', '.mcc', '.zip', '.jar', '.gz', '.tgz', '.xz', '.bz2', '.zst', '.7z',
+    '.png', '.jpg', '.jpeg', '.webp', '.ogg', '.mp3', '.mp4'
+}
+ZIP_MANIFEST_NAME = '.backup-manifest.json'
+CODEC_TAGS = {'store': b'n', 'deflate': b'z', 'bzip2': b'b', 'lzma': b'x'}
+ZIP_METHODS = {'store': zipfile.ZIP_STORED, 'deflate': zipfile.ZIP_DEFLATED,
+               'bzip2': zipfile.ZIP_BZIP2, 'lzma': zipfile.ZIP_LZMA}
+
+def looks_incompressible(path, data):
+    """Detect already-compressed data by extension or a fast entropy sample"""
+    if os.path.splitext(path)[1].lower() in COMPRESSED_EXTENSIONS:
+        return True
+    sample = data[:64 * 1024]
+    if len(sample) < 4096:
+        return False
+    return len(zlib.compress(sample, 1)) > len(sample) * 0.95
+
+def encode_chunk(data, codec='deflate', level=6, compressible=True):
+    """Encode a chunk as a one-byte codec tag followed by the (maybe compressed) body"""
+    if compressible and codec != 'store':
+        if codec == 'bzip2':
+            body = bz2.compress(data, max(level, 1))
+        elif codec == 'lzma':
+            body = lzma.compress(data, preset=level)
+        else:
+            body = zlib.compress(data, level)
+        if len(body) < len(data):
+            return CODEC_TAGS[codec] + body
+    return b'n' + data
+
+def decode_chunk(payload):
+    codec, body = payload[:1], payload[1:]
+    if codec == b'z':
+        return zlib.decompress(body)
+    if codec == b'b':
+        return bz2.decompress(body)
+    if codec == b'x':
+        return lzma.decompress(body)
+    return body
+
+def write_chunk_file(path, payload):
+    """Atomically write a chunk file, safe against concurrent writers of the same chunk"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return len(payload)
+
+def store_file_chunks(path, chunk_dir, chunking, codec, level):
+    """Pool worker: chunk a file and write its missing chunks into the store"""
+    chunker = ContentChunker(*chunking)
+    hasher = hashlib.sha256()
+    chunks = []
+    try:
+        with open(path, 'rb') as f:
+            for data in chunker.chunks(f):
+                hasher.update(data)
+                chunk_hash = hashlib.sha256(data).hexdigest()
+                chunk_path = os.path.join(chunk_dir, chunk_hash[:2], chunk_hash)
+                stored = 0
+                if not os.path.exists(chunk_path):
+                    payload = encode_chunk(data, codec, level, not looks_incompressible(path, data))
+                    stored = write_chunk_file(chunk_path, payload)
+                chunks.append((chunk_hash, len(data), stored))
+    except OSError as e:
+        return {'error': str(e)}
+    return {'sha256': hasher.hexdigest(), 'chunks': chunks, 'bytes_read': sum(c[1] for c in chunks)}
+
+REGION_SECTOR = 4096
+REGION_MARKER = 'region'  # sha256 placeholder for region files in the file index
+
+def store_region_chunks(path, chunk_dir, previous, previous_mtime_ns):
+    """Pool worker: store only the region-file chunks whose timestamps changed.
+    
+    previous is the last snapshot's table of [timestamp, hash] (or None) per
+    chunk slot. A slot is reused when its timestamp is unchanged and older than
+    the second in which the file was last read; everything else is re-read.
+    """
+    cutoff = previous_mtime_ns // 1_000_000_000 if previous else 0
+    table = [None] * 1024
+    chunks = []
+    bytes_read = 0
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(2 * REGION_SECTOR)
+            if len(header) < 2 * REGION_SECTOR:
+                return {'fallback': True}
+            bytes_read += len(header)
+            
+            for i in range(1024):
+                location = int.from_bytes(header[i * 4:i * 4 + 4], 'big')
+                offset, sectors = location >> 8, location & 0xFF
+                if offset == 0 and sectors == 0:
+                    continue
+                timestamp = int.from_bytes(header[REGION_SECTOR + i * 4:REGION_SECTOR + i * 4 + 4], 'big')
+                
+                old = previous[i] if previous else None
+                if old and old[0] == timestamp and timestamp < cutoff:
+                    table[i] = old
+                    continue
+                
+                f.seek(offset * REGION_SECTOR)
+                length = int.from_bytes(f.read(4), 'big')
+                if offset < 2 or length < 1 or length + 4 > sectors * REGION_SECTOR:
+                    return {'fallback': True}
+                payload = f.read(length)  # compression type byte + compressed chunk
+                if len(payload) != length:
+                    return {'fallback': True}
+                bytes_read += length + 4
+                
+                chunk_hash = hashlib.sha256(payload).hexdigest()
+                chunk_path = os.path.join(chunk_dir, chunk_hash[:2], chunk_hash)
+                stored = 0
+                if not os.path.exists(chunk_path):
+                    stored = write_chunk_file(chunk_path, encode_chunk(payload, compressible=False))
+                chunks.append((chunk_hash, length, stored))
+                table[i] = [timestamp, chunk_hash]
+    except OSError as e:
+        return {'error': str(e)}
+    return {'region': table, 'chunks': chunks, 'bytes_read': bytes_read}
+
+def build_region_file(table, get_chunk, fileobj):
+    """Write a valid region file from a [timestamp, hash] table"""
+    locations = bytearray(REGION_SECTOR)
+    timestamps = bytearray(REGION_SECTOR)
+    body = bytearray()
+    sector = 2
+    for i, slot in enumerate(table):
+        if not slot:
+            continue
+        timestamp, chunk_hash = slot
+        payload = get_chunk(chunk_hash)
+        data = len(payload).to_bytes(4, 'big') + payload
+        data += bytes(-len(data) % REGION_SECTOR)
+        count = len(data) // REGION_SECTOR
+        locations[i * 4:i * 4 + 4] = ((sector << 8) | min(count, 0xFF)).to_bytes(4, 'big')
+        timestamps[i * 4:i * 4 + 4] = timestamp.to_bytes(4, 'big')
+        body += data
+        sector += count
+    fileobj.write(locations)
+    fileobj.write(timestamps)
+    fileobj.write(body)
+
+def file_chunk_hashes(file_meta):
+    """All chunk hashes a manifest file entry references"""
+    if 'region' in file_meta:
+        return [slot[1] for slot in file_meta['region'] if slot]
+    return file_meta['chunks']
+
+def materialize_file(file_meta, get_chunk, fileobj):
+    """Rebuild one manifest file entry into fileobj"""
+    if 'region' in file_meta:
+        build_region_file(file_meta['region'], get_chunk, fileobj)
+    else:
+        for chunk_hash in file_meta['chunks']:
+            fileobj.write(get_chunk(chunk_hash))
+
+MEMBER_BLOCK = 1024 * 1024  # zip members are read and compressed in blocks of this size
+SPOOL_THRESHOLD = 4 * MEMBER_BLOCK  # larger bodies go back to the writer through a spool file
+
+def member_compressor(codec, level):
+    if codec == 'bzip2':
+        return bz2.BZ2Compressor(max(level, 1))
+    if codec == 'lzma':
+        return zipfile.LZMACompressor()
+    return zlib.compressobj(level, zlib.DEFLATED, -15)
+
+class MemberBody:
+    """Compressed member body: in memory until it outgrows SPOOL_THRESHOLD, then a spool file"""
+    def __init__(self, spool_dir):
+        self.spool_dir = spool_dir
+        self.buffer = bytearray()
+        self.file = None
+        self.path = None
+        self.size = 0
+    
+    def write(self, data):
+        if not data:
+            return
+        self.size += len(data)
+        if self.file is None:
+            self.buffer += data
+            if self.spool_dir is None or len(self.buffer) <= SPOOL_THRESHOLD:
+                return
+            fd, self.path = tempfile.mkstemp(dir=self.spool_dir, prefix='member-')
+            self.file = os.fdopen(fd, 'wb')
+            data, self.buffer = bytes(self.buffer), bytearray()
+        self.file.write(data)
+    
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+            os.unlink(self.path)
+    
+    def result(self):
+        """'data' or 'spool' for the member dict"""
+        if self.file is None:
+            return {'data': bytes(self.buffer)}
+        self.file.close()
+        return {'spool': self.path}
+
+def compress_member(path, codec, level, spool_dir=None):
+    """Pool worker: compress one file for a zip archive, reading it in MEMBER_BLOCK blocks.
+    
+    Small bodies come back in 'data'; larger ones in a 'spool' file under spool_dir that
+    ZipStreamWriter.add copies into the archive and removes.
+    """
+    crc, size, sha256 = 0, 0, hashlib.sha256()
+    body = MemberBody(spool_dir)
+    try:
+        with open(path, 'rb') as f:
+            block = f.read(MEMBER_BLOCK)
+            compressor = None
+            if codec != 'store' and not looks_incompressible(path, block):
+                compressor = member_compressor(codec, level)
+            while block:
+                crc = zlib.crc32(block, crc)
+                size += len(block)
+                sha256.update(block)
+                body.write(compressor.compress(block) if compressor else block)
+                block = f.read(MEMBER_BLOCK)
+            if compressor:
+                body.write(compressor.flush())
+            if compressor and body.size >= size:
+                # Compression did not pay off: store the file as it is (it must not have changed)
+                body.discard()
+                body, stored_crc = MemberBody(spool_dir), 0
+                f.seek(0)
+                for block in iter(lambda: f.read(MEMBER_BLOCK), b''):
+                    stored_crc = zlib.crc32(block, stored_crc)
+                    body.write(block)
+                if stored_crc != crc or body.size != size:
+                    body.discard()
+                    return {'error': 'file changed while it was being read'}
+                compressor = None
+    except OSError as e:
+        body.discard()
+        return {'error': str(e)}
+    
+    return {
+        'crc': crc,
+        'size': size,
+        'csize': body.size,
+        'sha256': sha256.hexdigest(),
+        'method': ZIP_METHODS[codec] if compressor else zipfile.ZIP_STORED,
+        **body.result()
+    }
+
+def lower_priority(niceness=10, idle_io=True):
+    """Pool initializer: keep backup workers behind the game servers for CPU and disk"""
+    try:
+        process = psutil.Process()
+        process.nice(niceness)
+        if idle_io and hasattr(psutil, 'IOPRIO_CLASS_IDLE'):
+            process.ionice(psutil.IOPRIO_CLASS_IDLE)
+    except (psutil.Error, OSError):
+        pass
+
+class BackupCancelled(BaseException):
+    """Raised inside a running backup when it is cancelled.
+    
+    A BaseException so the many `except Exception` handlers that report and
+    swallow ordinary failures let it through to whoever started the backup.
+    """
+
+class BackupThrottle:
+    """Adaptive token bucket that paces backup reads against disk, CPU and tick health.
+    
+    The allowed read rate is cut in half whenever the host looks overloaded and
+    recovers gradually (AIMD). If the run falls behind what is needed to finish
+    before its deadline, the budget is raised to whatever rate meets it.
+    """
+    
+    def __init__(self, settings, health_check=None):
+        self.enabled = settings.get('enabled', True)
+        self.rate = settings.get('max_read_mb_s', 20) * 1024 * 1024
+        self.max_cpu_percent = settings.get('max_cpu_percent', 70)
+        self.max_disk_busy_percent = settings.get('max_disk_busy_percent', 60)
+        self.max_pause = settings.get('max_pause_seconds', 30)
+        self.niceness = settings.get('niceness', 10)
+        self.idle_io = settings.get('idle_io_priority', True)
+        self.health_check = health_check
+        self.factor = 1.0
+        self.tokens = 0.0
+        self.last_refill = time.monotonic()
+        self.last_sample = 0.0
+        self.last_disk = None
+        self.overloaded = False
+        self.lagging = False
+        self.deadline = None
+        self.remaining = 0
+        self.throttled_seconds = 0.0
+        self.cancel_event = None
+    
+    def sleep(self, seconds):
+        """Sleep, waking early (and raising BackupCancelled) if the backup is cancelled"""
+        self.throttled_seconds += seconds
+        if self.cancel_event is None:
+            time.sleep(seconds)
+        elif self.cancel_event.wait(seconds):
+            raise BackupCancelled()
+    
+    def start(self, deadline):
+        self.deadline = deadline
+        self.remaining = 0
+        self.throttled_seconds = 0.0
+        psutil.cpu_percent(None)  # prime the CPU sampler
+    
+    def plan(self, nbytes):
+        """Announce bytes that are about to be read, for deadline tracking"""
+        self.remaining += nbytes
+    
+    def sample(self):
+        now = time.monotonic()
+        elapsed = now - self.last_sample
+        if elapsed < 1:
+            return
+        cpu = psutil.cpu_percent(None)
+        disk = psutil.disk_io_counters()
+        busy = 0
+        if disk is not None and self.last_disk is not None and hasattr(disk, 'busy_time'):
+            busy = (disk.busy_time - self.last_disk.busy_time) / (elapsed * 10)
+        self.last_disk = disk
+        self.last_sample = now
+        
+        self.lagging = bool(self.health_check and self.health_check())
+        self.overloaded = (cpu > self.max_cpu_percent or busy > self.max_disk_busy_percent
+                           or self.lagging)
+        if self.overloaded:
+            self.factor = max(self.factor / 2, 0.05)
+        else:
+            self.factor = min(self.factor + 0.1, 1.0)
+    
+    def required_rate(self):
+        """Bytes per second needed to finish the remaining work before the deadline"""
+        if self.deadline is None:
+            return 0
+        time_left = self.deadline - time.time()
+        if time_left <= 0:
+            return float('inf')
+        return self.remaining / time_left
+    
+    def consume(self, nbytes):
+        """Block until nbytes may be read under the current budget"""
+        self.remaining = max(self.remaining - nbytes, 0)
+        if not self.enabled:
+            return
+        self.sample()
+        
+        # Pause outright while the servers are lagging, unless the deadline is at risk
+        paused_until = time.monotonic() + self.max_pause
+        while (self.lagging and time.monotonic() < paused_until
+               and self.required_rate() < self.rate):
+            self.sleep(1)
+            self.sample()
+        
+        rate = max(self.rate * self.factor, self.required_rate())
+        if rate == float('inf'):
+            return
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self.last_refill) * rate, rate)
+        self.last_refill = now
+        self.tokens -= nbytes
+        if self.tokens < 0:
+            self.sleep(-self.tokens / rate)
+
+class BackupProgress:
+    """Thread-safe counters describing the backup that is currently running"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.phase = 'idle'
+            self.files = 0
+            self.bytes_read = 0
+            self.bytes_compressed = 0
+            self.expected_bytes = 0
+    
+    def set_phase(self, phase):
+        with self.lock:
+            self.phase = phase
+    
+    def plan(self, nbytes):
+        with self.lock:
+            self.expected_bytes += nbytes
+    
+    def add(self, files=0, bytes_read=0, bytes_compressed=0):
+        with self.lock:
+            self.files += files
+            self.bytes_read += bytes_read
+            self.bytes_compressed += bytes_compressed
+    
+    def snapshot(self):
+        with self.lock:
+            elapsed = max(time.time() - self.started, 0.001)
+            throughput = self.bytes_read / elapsed
+            remaining = max(self.expected_bytes - self.bytes_read, 0)
+            return {
+                'phase': self.phase,
+                'files': self.files,
+                'bytes_read': self.bytes_read,
+                'bytes_compressed': self.bytes_compressed,
+                'expected_bytes': self.expected_bytes,
+                'elapsed_seconds': round(elapsed, 1),
+                'throughput_mb_s': round(throughput / (1024 * 1024), 2),
+                'eta_seconds': round(remaining / throughput, 1) if throughput > 0 else None
+            }
+
+class BackupLock:
+    """Cross-process lock so the backup loop and manual backups never overlap"""
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.fd = None
+    
+    def acquire(self, blocking=False, cancel_event=None):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                os.ftruncate(fd, 0)
+                os.write(fd, str(os.getpid()).encode())
+                self.fd = fd
+                return True
+            except BlockingIOError:
+                if not blocking or (cancel_event and cancel_event.is_set()):
+                    os.close(fd)
+                    return False
+                time.sleep(1)
+    
+    def release(self):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+    
+    def holder(self):
+        """PID of the process holding the lock, or None"""
+        if self.fd is not None:
+            return os.getpid()
+        try:
+            with open(self.path, 'r+') as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                    return None
+                except BlockingIOError:
+                    return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+class CompressionPool:
+    """Run compression jobs on a process pool with a bounded number in flight"""
+    
+    def __init__(self, workers=0, throttle=None, progress=None, cancel_event=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.throttle = throttle
+        self.progress = progress
+        self.cancel_event = cancel_event
+    
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise BackupCancelled()
+    
+    def map(self, items, task_for, cost_for=None):
+        """Run task_for(item) -> (fn, *args) for each item, yielding (item, result) in input order"""
+        throttle = self.throttle if cost_for else None
+        if cost_for:
+            items = list(items)
+            planned = sum(cost_for(item) for item in items)
+            if throttle:
+                throttle.plan(planned)
+            if self.progress:
+                self.progress.plan(planned)
+        
+        if self.workers <= 1:
+            for item in items:
+                self.check_cancelled()
+                if throttle:
+                    throttle.consume(cost_for(item))
+                fn, *args = task_for(item)
+                yield item, fn(*args)
+            return
+        
+        initargs = (throttle.niceness, throttle.idle_io) if throttle else (0, False)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=lower_priority,
+                                 initargs=initargs) as executor:
+            pending = deque()
+            for item in items:
+                self.check_cancelled()
+                if throttle:
+                    throttle.consume(cost_for(item))
+                pending.append((item, executor.submit(*task_for(item))))
+                if len(pending) >= self.workers * 2:
+                    item, future = pending.popleft()
+                    yield item, future.result()
+            while pending:
+                item, future = pending.popleft()
+                yield item, future.result()
+
+class ZipStreamWriter:
+    """Sequential zip writer for members compressed ahead of time (zip64 aware)"""
+    
+    def __init__(self, fileobj):
+        self.fp = fileobj
+        self.offset = 0
+        self.members = []
+        self.hasher = hashlib.sha256()  # checksum of the archive as written
+    
+    def write(self, data):
+        self.fp.write(data)
+        self.hasher.update(data)
+        self.offset += len(data)
+    
+    def add(self, arcname, member, mtime_ns, mode):
+        name = arcname.encode('utf-8')
+        t = time.localtime(mtime_ns / 1e9)
+        dostime = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+        dosdate = (max(t.tm_year, 1980) - 1980) << 9 | (t.tm_mon << 5) | t.tm_mday
+        version = {zipfile.ZIP_BZIP2: 46, zipfile.ZIP_LZMA: 63}.get(member['method'], 20)
+        csize = member['csize'] if 'csize' in member else len(member['data'])
+        
+        header_offset = self.offset
+        self.write(struct.pack(
+            '<4s5H3L2H', b'PK\x03\x04', version, 0x800, member['method'], dostime, dosdate,
+            member['crc'], csize, member['size'], len(name), 0
+        ) + name)
+        if 'spool' in member:
+            try:
+                with open(member['spool'], 'rb') as f:
+                    for block in iter(lambda: f.read(MEMBER_BLOCK), b''):
+                        self.write(block)
+            finally:
+                os.unlink(member['spool'])
+        else:
+            self.write(member['data'])
+        self.members.append((name, version, member['method'], dostime, dosdate,
+                             member['crc'], csize, member['size'], header_offset, mode))
+    
+    def close(self):
+        cd_start = self.offset
+        for name, version, method, dostime, dosdate, crc, csize, size, header_offset, mode in self.members:
+            extra = b''
+            if header_offset >= 0xFFFFFFFF:
+                extra = struct.pack('<HHQ', 1, 8, header_offset)
+                header_offset = 0xFFFFFFFF
+                version = max(version, 45)
+            self.write(struct.pack(
+                '<4s6H3L5H2L', b'PK\x01\x02', 0x300 | version, version, 0x800, method, dostime, dosdate,
+                crc, csize, size, len(name), len(extra), 0, 0, 0, (0o100000 | mode) << 16, header_offset
+            ) + name + extra)
+        
+        count = len(self.members)
+        cd_size = self.offset - cd_start
+        if count >= 0xFFFF or cd_start >= 0xFFFFFFFF or cd_size >= 0xFFFFFFFF:
+            zip64_offset = self.offset
+            self.write(struct.pack('<4sQ2H2L4Q', b'PK\x06\x06', 44, 45, 45, 0, 0,
+                                   count, count, cd_size, cd_start))
+            self.write(struct.pack('<4sLQL', b'PK\x06\x07', 0, zip64_offset, 1))
+        self.write(struct.pack('<4s4H2LH', b'PK\x05\x06', 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                               min(cd_size, 0xFFFFFFFF), min(cd_start, 0xFFFFFFFF), 0))
+
+class ContentChunker:
+    def __init__(self, min_size=256 * 1024, avg_size=1024 * 1024, max_size=4 * 1024 * 1024):
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        # Cut after the bytes whose GEAR_BITS spell this pattern (~1/avg_size chance per byte);
+        # it mixes 0s and 1s, so long runs of one byte value do not cut at every min_size
+        bits = max(avg_size.bit_length() - 1, 1)
+        self.pattern = bytes((GEAR[i] >> 62) & 1 for i in range(bits))
+    
+    def find_cut(self, buf, start, end):
+        """Return the end offset of the chunk starting at start"""
+        if end - start <= self.min_size:
+            return end
+        base = start + self.min_size
+        limit = min(end, start + self.max_size)
+        found = buf[base:limit].translate(GEAR_BITS).find(self.pattern)
+        return limit if found < 0 else base + found + len(self.pattern)
+    
+    def chunks(self, f):
+        """Yield content-defined chunks read from a binary file object"""
+        buf = b''
+        eof = False
+        while True:
+            while not eof and len(buf) < self.max_size:
+                data = f.read(self.max_size)
+                if not data:
+                    eof = True
+                    break
+                buf += data
+            if not buf:
+                return
+            cut = self.find_cut(buf, 0, len(buf)) if (eof or len(buf) >= self.max_size) else len(buf)
+            yield buf[:cut]
+            buf = buf[cut:]
+
+class ChunkStore:
+    def __init__(self, root, codec='deflate', level=6):
+        self.root = Path(root)
+        self.codec = codec
+        self.level = level
+        self.chunk_dir = self.root / 'chunks'
+        self.manifest_dir = self.root / 'manifests'
+        self.chunk_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.root / 'index.db'), check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute("""CREATE TABLE IF NOT EXISTS chunks (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            stored_size INTEGER NOT NULL,
+            refs INTEGER NOT NULL DEFAULT 0
+        )""")
+        # Chunks whose reference count dropped to zero, waiting for the sweep
+        self.db.execute("""CREATE TABLE IF NOT EXISTS garbage (
+            hash TEXT PRIMARY KEY
+        )""")
+        self.db.commit()
+        self.lock = threading.Lock()
+    
+    def chunk_path(self, chunk_hash):
+        return self.chunk_dir / chunk_hash[:2] / chunk_hash
+    
+    def has_chunk(self, chunk_hash):
+        with self.lock:
+            row = self.db.execute('SELECT 1 FROM chunks WHERE hash = ?', (chunk_hash,)).fetchone()
+        return row is not None
+    
+    def put_chunk(self, data):
+        """Store a chunk if it is new. Returns (hash, stored_bytes)"""
+        chunk_hash = hashlib.sha256(data).hexdigest()
+        if self.has_chunk(chunk_hash):
+            return chunk_hash, 0
+        
+        payload = encode_chunk(data, self.codec, self.level)
+        write_chunk_file(str(self.chunk_path(chunk_hash)), payload)
+        self.register(chunk_hash, len(data), len(payload))
+        return chunk_hash, len(payload)
+    
+    def register(self, chunk_hash, size, stored_size):
+        """Record a chunk file written by a pool worker"""
+        with self.lock:
+            self.db.execute('INSERT OR IGNORE INTO chunks (hash, size, stored_size) VALUES (?, ?, ?)',
+                            (chunk_hash, size, stored_size))
+    
+    def get_chunk(self, chunk_hash):
+        """Read and decode a chunk"""
+        with open(self.chunk_path(chunk_hash), 'rb') as f:
+            return decode_chunk(f.read())
+    
+    def commit(self):
+        with self.lock:
+            self.db.commit()
+    
+    def write_manifest(self, manifest):
+        path = self.manifest_dir / f"{manifest['generation']}.json"
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+        return path
+    
+    def load_manifest(self, generation):
+        with open(self.manifest_dir / f'{generation}.json', 'r') as f:
+            return json.load(f)
+    
+    def list_generations(self):
+        return sorted(p.stem for p in self.manifest_dir.glob('*.json'))
+    
+    @staticmethod
+    def manifest_chunks(manifest):
+        """Distinct chunk hashes a manifest references"""
+        hashes = set()
+        for file_meta in manifest['files']:
+            hashes.update(file_chunk_hashes(file_meta))
+        return hashes
+    
+    def add_refs(self, hashes, delta):
+        """Adjust reference counts (one reference per generation); chunks that
+        drop to zero are queued for the sweep"""
+        hashes = list(hashes)
+        with self.lock:
+            self.db.executemany('UPDATE chunks SET refs = refs + ? WHERE hash = ?',
+                                [(delta, h) for h in hashes])
+            if delta < 0:
+                for i in range(0, len(hashes), 500):
+                    batch = hashes[i:i + 500]
+                    self.db.execute(
+                        f"INSERT OR IGNORE INTO garbage SELECT hash FROM chunks "
+                        f"WHERE refs <= 0 AND hash IN ({', '.join('?' * len(batch))})", batch)
+    
+    def missing(self, hashes):
+        """The subset of hashes that are not in the store"""
+        hashes = list(hashes)
+        present = set()
+        with self.lock:
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                present.update(h for (h,) in self.db.execute(
+                    f"SELECT hash FROM chunks WHERE hash IN ({', '.join('?' * len(batch))})", batch))
+        return set(hashes) - present
+    
+    def delete_generation(self, generation):
+        """Drop a snapshot manifest and release its chunk references"""
+        manifest = self.load_manifest(generation)
+        self.add_refs(self.manifest_chunks(manifest), -1)
+        self.commit()
+        (self.manifest_dir / f'{generation}.json').unlink()
+    
+    def sweep(self, limit):
+        """Delete up to limit unreferenced chunks. Only the garbage list is
+        visited, never the whole store. Returns (deleted hashes, bytes freed)"""
+        deleted = []
+        freed = 0
+        with self.lock:
+            candidates = [h for (h,) in self.db.execute('SELECT hash FROM garbage LIMIT ?', (limit,))]
+        for chunk_hash in candidates:
+            with self.lock:
+                row = self.db.execute('SELECT refs, stored_size FROM chunks WHERE hash = ?',
+                                      (chunk_hash,)).fetchone()
+                if row and row[0] <= 0:
+                    # Row first: a crash then leaves an orphan file, never a dangling row
+                    self.db.execute('DELETE FROM chunks WHERE hash = ?', (chunk_hash,))
+                    deleted.append(chunk_hash)
+                    freed += row[1]
+                self.db.execute('DELETE FROM garbage WHERE hash = ?', (chunk_hash,))
+                self.db.commit()
+            if row and row[0] <= 0:
+                self.chunk_path(chunk_hash).unlink(missing_ok=True)
+        return deleted, freed
+
+class FileIndex:
+    """Persistent path -> (size, mtime_ns, inode, hash, chunks) index"""
+    
+    def __init__(self, store):
+        self.db = store.db
+        self.lock = store.lock
+        with self.lock:
+            self.db.execute("""CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                mode INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                chunks TEXT NOT NULL
+            )""")
+            self.db.commit()
+    
+    def load(self, root):
+        """Return {path: row} for every indexed file under root"""
+        root = str(root)
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT path, size, mtime_ns, inode, mode, sha256, chunks FROM files '
+                'WHERE path = ? OR (path >= ? AND path < ?)',
+                (root, root + '/', root + '0')
+            ).fetchall()
+        return {row[0]: row for row in rows}
+    
+    def update(self, entry, sha256, chunks):
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, mode, sha256, chunks) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (entry.path, entry.size, entry.mtime_ns, entry.inode, entry.mode, sha256, json.dumps(chunks))
+            )
+    
+    def remove(self, paths):
+        with self.lock:
+            self.db.executemany('DELETE FROM files WHERE path = ?', [(p,) for p in paths])
+    
+    @staticmethod
+    def unchanged(row, entry):
+        return row is not None and row[1:4] == (entry.size, entry.mtime_ns, entry.inode)
+
+class DirtyWatcher:
+    """Collect changed paths from inotifywait so backup runs can skip the tree walk"""
+    
+    def __init__(self, roots):
+        self.roots = [str(r) for r in roots]
+        self.process = None
+        self.dirty = {}  # consumer -> set of changed paths since its last run
+        self.lock = threading.Lock()
+    
+    def start(self):
+        if not self.roots or not shutil.which('inotifywait'):
+            return False
+        
+        self.process = subprocess.Popen([
+            'inotifywait', '-m', '-r',
+            '-e', 'close_write,create,delete,moved_to,moved_from,attrib',
+            '--format', '%e|%w%f', *self.roots
+        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        
+        # Events before the watches exist would be lost, so wait for them
+        for line in self.process.stderr:
+            if 'Watches established' in line:
+                break
+        
+        threading.Thread(target=self.read_events, daemon=True).start()
+        print(f"👀 Watching {len(self.roots)} backup paths for changes")
+        return self.process.poll() is None
+    
+    def read_events(self):
+        for line in self.process.stdout:
+            events, _, path = line.rstrip('\n').partition('|')
+            with self.lock:
+                if 'Q_OVERFLOW' in events:
+                    # Lost events: every consumer has to walk again
+                    self.dirty.clear()
+                else:
+                    for changed in self.dirty.values():
+                        changed.add(path)
+        
+        with self.lock:
+            self.dirty.clear()
+    
+    def take(self, consumer):
+        """Return paths changed since the consumer's last call, or None if a full walk is needed"""
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                return None
+            changed = self.dirty.get(consumer)
+            self.dirty[consumer] = set()
+            return changed
+    
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+
+class RcloneRcatSink:
+    """Writable sink that streams into `rclone rcat` (works with any rclone backend)"""
+    
+    def __init__(self, remote_path, extra_args=()):
+        self.remote_path = remote_path
+        # A file, not a pipe: rclone must never block on stderr while we feed its stdin
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            ['rclone', 'rcat', remote_path, *extra_args],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.stderr
+        )
+    
+    def write(self, data):
+        self.process.stdin.write(data)
+    
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        returncode = self.process.wait()
+        self.stderr.seek(0)
+        stderr = self.stderr.read().decode(errors='replace')
+        self.stderr.close()
+        if returncode != 0:
+            raise RuntimeError(f"rclone rcat failed: {stderr.strip()[-2000:]}")
+    
+    def abort(self):
+        """Kill rclone so a partial archive is never committed remotely"""
+        self.process.kill()
+        self.process.wait()
+        self.stderr.close()
+
+class StreamingSink:
+    """Bounded in-memory buffer in front of one or more writable sinks"""
+    
+    def __init__(self, sinks, buffer_bytes=16 * 1024 * 1024, block_size=1024 * 1024):
+        self.sinks = sinks
+        self.block_size = block_size
+        self.blocks = queue.Queue(maxsize=max(buffer_bytes // block_size, 1))
+        self.pending = bytearray()
+        self.bytes_written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.drain, daemon=True)
+        self.thread.start()
+    
+    def write(self, data):
+        if self.error:
+            raise self.error
+        self.pending += data
+        while len(self.pending) >= self.block_size:
+            # Blocks when the buffer is full, pacing the producer to the upload
+            self.blocks.put(bytes(self.pending[:self.block_size]))
+            del self.pending[:self.block_size]
+        return len(data)
+    
+    def drain(self):
+        while True:
+            block = self.blocks.get()
+            if block is None:
+                return
+            if self.error:
+                continue  # keep consuming so the producer never deadlocks
+            try:
+                for sink in self.sinks:
+                    sink.write(block)
+                self.bytes_written += len(block)
+            except Exception as e:
+                self.error = e
+    
+    def close(self):
+        if self.pending and not self.error:
+            self.blocks.put(bytes(self.pending))
+            self.pending = bytearray()
+        self.blocks.put(None)
+        self.thread.join()
+        
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                self.error = self.error or e
+        if self.error:
+            raise self.error
+        return self.bytes_written
+    
+    def abort(self):
+        self.error = self.error or RuntimeError('stream aborted')
+        for sink in self.sinks:
+            if hasattr(sink, 'abort'):
+                sink.abort()
+        self.blocks.put(None)
+        self.thread.join()
+        for sink in self.sinks:
+            if not hasattr(sink, 'abort'):
+                sink.close()
+
+FICLONE = 0x40049409  # ioctl to share extents copy-on-write (btrfs, xfs, ...)
+
+# Minecraft replaces these via temp file + rename, so a hardlink stays frozen
+HARDLINK_SAFE_SUFFIXES = {'.dat'}
+
+class SnapshotStager:
+    """Freeze files into a staging directory with reflinks, hardlinks or fast copies"""
+    
+    def __init__(self, staging_dir):
+        self.staging_dir = Path(staging_dir)
+        self.reflink_ok = True
+        self.counts = {'reflink': 0, 'hardlink': 0, 'copy': 0}
+    
+    def reflink(self, src, dst):
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    
+    def stage_file(self, src, dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if self.reflink_ok:
+            try:
+                self.reflink(src, dst)
+                self.counts['reflink'] += 1
+                return
+            except OSError:
+                # Not supported by this filesystem: stop trying for the rest of the run
+                self.reflink_ok = False
+        if os.path.splitext(src)[1] in HARDLINK_SAFE_SUFFIXES:
+            try:
+                if os.path.exists(dst):
+                    os.unlink(dst)
+                os.link(src, dst)
+                self.counts['hardlink'] += 1
+                return
+            except OSError:
+                pass
+        shutil.copyfile(src, dst)  # sendfile() on Linux
+        self.counts['copy'] += 1
+    
+    def stage(self, entries):
+        """Stage entries, returning {live path: staged path}"""
+        sources = {}
+        for entry in entries:
+            dst = str(self.staging_dir / entry.arcname)
+            try:
+                self.stage_file(entry.path, dst)
+            except OSError as e:
+                print(f"⚠️  Could not stage {entry.arcname}: {e}")
+                continue
+            sources[entry.path] = dst
+        return sources
+    
+    def cleanup(self):
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+# Upload states of generations that have a remote copy ('unknown': found on disk when the
+# catalog was first built, from before uploads were tracked)
+ON_REMOTE = ('uploaded', 'unknown')
+
+class BackupCatalog:
+    """SQLite index of every backup generation, kept current by the backup engine"""
+    
+    COLUMNS = ('name', 'kind', 'format', 'created', 'size', 'stored_size', 'file_count',
+               'duration', 'checksum', 'location', 'upload_state', 'uploaded')
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute("""CREATE TABLE IF NOT EXISTS generations (
+            name TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            format TEXT NOT NULL,
+            created REAL NOT NULL,
+            size INTEGER NOT NULL,
+            stored_size INTEGER NOT NULL,
+            file_count INTEGER NOT NULL,
+            duration REAL,
+            checksum TEXT,
+            location TEXT,
+            upload_state TEXT NOT NULL,
+            uploaded REAL
+        )""")
+        self.db.execute('CREATE INDEX IF NOT EXISTS generations_created ON generations (created)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS generations_kind ON generations (kind, created)')
+        self.db.commit()
+        self.lock = threading.Lock()
+        self.writes = 0
+    
+    @staticmethod
+    def kind_of(name):
+        return 'minecraft' if name.startswith('minecraft_') else 'cluster'
+    
+    def record(self, name, format, created, size, stored_size, file_count, duration=None,
+               checksum=None, location=None, upload_state='pending'):
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO generations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)',
+                (name, self.kind_of(name), format, created, size, stored_size, file_count,
+                 duration, checksum, location, upload_state))
+            self.db.commit()
+            self.writes += 1
+    
+    def set_upload_state(self, name, state):
+        with self.lock:
+            self.db.execute('UPDATE generations SET upload_state = ?, uploaded = ? WHERE name = ?',
+                            (state, time.time() if state == 'uploaded' else None, name))
+            self.db.commit()
+            self.writes += 1
+    
+    def remove(self, names):
+        with self.lock:
+            self.db.executemany('DELETE FROM generations WHERE name = ?', [(n,) for n in names])
+            self.db.commit()
+            self.writes += 1
+    
+    def upload_states(self, names):
+        with self.lock:
+            return {name: state for name, state in self.db.execute(
+                f"SELECT name, upload_state FROM generations WHERE name IN ({', '.join('?' * len(names))})",
+                list(names))}
+    
+    def local_removed(self, names, remote):
+        """Point uploaded generations at their remote copy and forget the rest"""
+        with self.lock:
+            for name in names:
+                self.db.execute("UPDATE generations SET location = ? WHERE name = ? AND upload_state = 'uploaded'",
+                                (f'{remote}/{name}', name))
+                self.db.execute("DELETE FROM generations WHERE name = ? AND upload_state != 'uploaded'", (name,))
+            self.db.commit()
+            self.writes += 1
+    
+    def version(self):
+        """Changes whenever this or any other connection commits to the catalog"""
+        with self.lock:
+            data_version = self.db.execute('PRAGMA data_version').fetchone()[0]
+        return data_version, self.writes
+    
+    def query(self, kind=None, format=None, upload_state=None, limit=50, offset=0):
+        """Return (total matching, [generation dicts]) newest first"""
+        where, params = [], []
+        for column, value in (('kind', kind), ('format', format), ('upload_state', upload_state)):
+            if value:
+                where.append(f'{column} = ?')
+                params.append(value)
+        clause = f" WHERE {' AND '.join(where)}" if where else ''
+        with self.lock:
+            total = self.db.execute(f'SELECT COUNT(*) FROM generations{clause}', params).fetchone()[0]
+            rows = self.db.execute(
+                f'SELECT * FROM generations{clause} ORDER BY created DESC LIMIT ? OFFSET ?',
+                params + [limit, offset]).fetchall()
+        return total, [dict(zip(self.COLUMNS, row)) for row in rows]
+    
+    def summary(self, latest=5):
+        """Per-kind counts and sizes plus the newest generation names"""
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT kind, COUNT(*), COALESCE(SUM(stored_size), 0), MAX(created), '
+                "SUM(upload_state NOT IN ('uploaded', 'unknown')) FROM generations GROUP BY kind").fetchall()
+            summary = {kind: {'count': count, 'stored_bytes': stored, 'last_created': last,
+                              'not_uploaded': not_uploaded or 0}
+                       for kind, count, stored, last, not_uploaded in rows}
+            for kind in summary:
+                summary[kind]['latest'] = [name for (name,) in self.db.execute(
+                    'SELECT name FROM generations WHERE kind = ? ORDER BY created DESC LIMIT ?',
+                    (kind, latest))]
+        return summary
+    
+    def is_empty(self):
+        with self.lock:
+            return self.db.execute('SELECT 1 FROM generations LIMIT 1').fetchone() is None
+    
+    def import_existing(self, backup_dir, store=None):
+        """One-time backfill from backups made before the catalog existed"""
+        backup_dir = Path(backup_dir)
+        for zip_file in list(backup_dir.glob('cluster_backup_*.zip')) + \
+                list((backup_dir / 'minecraft').glob('minecraft_*.zip')):
+            try:
+                st = zip_file.stat()
+                with zipfile.ZipFile(zip_file) as zf:
+                    infos = [i for i in zf.infolist() if i.filename != ZIP_MANIFEST_NAME]
+                self.record(zip_file.name, 'zip', st.st_mtime, sum(i.file_size for i in infos),
+                            st.st_size, len(infos), location=str(zip_file), upload_state='unknown')
+            except (OSError, zipfile.BadZipFile):
+                continue
+        if store is not None:
+            for generation in store.list_generations():
+                path = store.manifest_dir / f'{generation}.json'
+                try:
+                    data = path.read_bytes()
+                    manifest = json.loads(data)
+                except (OSError, ValueError):
+                    continue
+                self.record(generation, 'chunked', manifest.get('created', path.stat().st_mtime),
+                            sum(f['size'] for f in manifest['files']), manifest.get('bytes_written', 0),
+                            len(manifest['files']), checksum=hashlib.sha256(data).hexdigest(),
+                            location=str(path), upload_state='unknown')
+
+class RetentionPolicy:
+    """Grandfather-father-son selection of generations to keep"""
+    
+    DEFAULT_TIERS = [
+        {'every_minutes': 5, 'for_hours': 1},
+        {'every_minutes': 60, 'for_hours': 24},
+        {'every_minutes': 1440, 'for_hours': 336}
+    ]
+    
+    def __init__(self, tiers, min_keep=3):
+        self.tiers = [(tier['every_minutes'] * 60, tier['for_hours'] * 3600) for tier in tiers]
+        self.min_keep = max(1, min_keep)
+    
+    def select(self, generations, now=None):
+        """Return the names to keep from [(name, created)]"""
+        now = now or time.time()
+        ordered = sorted(generations, key=lambda g: g[1], reverse=True)
+        keep = {name for name, _ in ordered[:self.min_keep]}
+        for every, span in self.tiers:
+            buckets = {}
+            for name, created in ordered:
+                if now - created <= span:
+                    # Newest first, so each bucket ends up with its oldest generation,
+                    # which stays put as newer backups arrive
+                    buckets[int(created // every)] = name
+            keep.update(buckets.values())
+        return keep
+
+class UploadQueue:
+    """Persistent rclone upload queue with parallel workers, backoff retries and resumption
+    
+    Jobs live in the catalog database, so uploads queued before a restart (or
+    left running by a process that died) are picked up again. Any rclone remote
+    works, including a plain local path for testing.
+    """
+    
+    COLUMNS = ('id', 'action', 'generation', 'source', 'dest', 'bytes', 'state', 'attempts', 'next_attempt',
+               'last_error', 'created', 'started', 'finished', 'seconds', 'mb_per_second')
+    
+    def __init__(self, catalog, settings):
+        self.catalog = catalog
+        self.db = catalog.db
+        self.lock = catalog.lock
+        self.workers = max(1, settings.get('workers', 2))
+        self.transfers = settings.get('transfers', 4)
+        self.bwlimit = settings.get('bwlimit', '')
+        self.max_attempts = settings.get('max_attempts', 8)
+        self.retry_base = settings.get('retry_base_seconds', 30)
+        self.retry_max = settings.get('retry_max_seconds', 3600)
+        self.wake = threading.Event()
+        self.threads = []
+        with self.lock:
+            self.db.execute("""CREATE TABLE IF NOT EXISTS uploads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                generation TEXT NOT NULL,
+                source TEXT NOT NULL,
+                dest TEXT NOT NULL,
+                files TEXT,
+                bytes INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                next_attempt REAL NOT NULL,
+                owner INTEGER,
+                last_error TEXT,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                seconds REAL,
+                mb_per_second REAL,
+                action TEXT NOT NULL DEFAULT 'copy'
+            )""")
+            self.db.execute('CREATE INDEX IF NOT EXISTS uploads_state ON uploads (state, next_attempt)')
+            self.db.commit()
+    
+    def enqueue(self, generation, source, dest, size, files=None):
+        """Queue source for upload into dest. files (relative to source) selects a subset;
+        the last one is copied only after all others succeeded"""
+        self.add_job('copy', generation, str(source), dest, size, files)
+        self.catalog.set_upload_state(generation, 'queued')
+    
+    def enqueue_delete(self, generation, dest, files=None):
+        """Queue removal of dest (a remote file) or of files relative to dest (a remote directory)"""
+        self.add_job('delete', generation, '', dest, 0, files)
+    
+    def add_job(self, action, generation, source, dest, size, files):
+        with self.lock:
+            self.db.execute(
+                'INSERT INTO uploads (action, generation, source, dest, files, bytes, state, attempts, '
+                "next_attempt, created) VALUES (?, ?, ?, ?, ?, ?, 'queued', 0, ?, ?)",
+                (action, generation, source, dest, json.dumps(files) if files is not None else None,
+                 size, time.time(), time.time()))
+            self.db.commit()
+        self.wake.set()
+    
+    def recover(self):
+        """Requeue jobs left running by a process that no longer exists"""
+        with self.lock:
+            rows = self.db.execute("SELECT id, owner FROM uploads WHERE state = 'running'").fetchall()
+            stale = [(job_id,) for job_id, owner in rows if not owner or not psutil.pid_exists(owner)]
+            self.db.executemany("UPDATE uploads SET state = 'queued', owner = NULL WHERE id = ?", stale)
+            self.db.commit()
+        return len(stale)
+    
+    def claim(self):
+        """Take the oldest due job, or None. Chunk store jobs go in order so a
+        manifest never reaches the remote before the chunks of older snapshots"""
+        now = time.time()
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, files IS NOT NULL, state, next_attempt FROM uploads "
+                "WHERE state IN ('queued', 'running') ORDER BY id").fetchall()
+            store_busy = False
+            for job_id, is_store, state, next_attempt in rows:
+                if is_store and store_busy:
+                    continue
+                if state == 'queued' and next_attempt <= now:
+                    cursor = self.db.execute(
+                        "UPDATE uploads SET state = 'running', owner = ?, started = ? "
+                        "WHERE id = ? AND state = 'queued'", (os.getpid(), now, job_id))
+                    self.db.commit()
+                    if cursor.rowcount:
+                        columns = ('id', 'action', 'generation', 'source', 'dest', 'files', 'bytes', 'attempts')
+                        row = self.db.execute(f"SELECT {', '.join(columns)} FROM uploads WHERE id = ?",
+                                              (job_id,)).fetchone()
+                        return dict(zip(columns, row))
+                if is_store:
+                    store_busy = True
+        return None
+    
+    def rclone(self, *args, files_from=None):
+        cmd = ['rclone', *args, '--retries', '1']
+        if args[0] == 'copy':
+            cmd += ['--transfers', str(self.transfers)]
+            if self.bwlimit:
+                cmd += ['--bwlimit', str(self.bwlimit)]
+        if files_from:
+            cmd += ['--files-from-raw', files_from, '--no-traverse']
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            lines = result.stderr.strip().splitlines()
+            if args[0] != 'copy' and lines and 'not found' in lines[-1]:
+                return  # already gone
+            raise RuntimeError(lines[-1] if lines else f'rclone exited with {result.returncode}')
+    
+    def transfer(self, job):
+        if job['files'] is None:
+            if job['action'] == 'delete':
+                self.rclone('deletefile', job['dest'])
+            else:
+                self.rclone('copy', job['source'], job['dest'])
+            return
+        files = json.loads(job['files'])
+        files_from = self.catalog.path.parent / f".upload-{job['id']}-{os.getpid()}.tmp"
+        try:
+            if job['action'] == 'delete':
+                files_from.write_text(''.join(f'{f}\n' for f in files))
+                self.rclone('delete', job['dest'], files_from=str(files_from))
+                return
+            *files, last = files
+            if files:
+                files_from.write_text(''.join(f'{f}\n' for f in files))
+                self.rclone('copy', job['source'], job['dest'], files_from=str(files_from))
+            files_from.write_text(f'{last}\n')
+            self.rclone('copy', job['source'], job['dest'], files_from=str(files_from))
+        finally:
+            files_from.unlink(missing_ok=True)
+    
+    def process(self, job):
+        started = time.time()
+        upload = job['action'] == 'copy'
+        what = f"Upload of {job['generation']}" if upload else f"Remote delete of {job['generation']}"
+        if upload:
+            self.catalog.set_upload_state(job['generation'], 'uploading')
+            print(f"☁️  Uploading {job['generation']} (attempt {job['attempts'] + 1})...")
+        try:
+            self.transfer(job)
+        except (OSError, RuntimeError, subprocess.SubprocessError) as e:
+            attempts = job['attempts'] + 1
+            if attempts >= self.max_attempts:
+                state, delay = 'failed', 0
+                print(f"❌ {what} failed permanently: {e}")
+            else:
+                state, delay = 'queued', min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+                print(f"⚠️  {what} failed ({e}), retrying in {delay}s")
+            with self.lock:
+                self.db.execute(
+                    'UPDATE uploads SET state = ?, attempts = ?, next_attempt = ?, owner = NULL, '
+                    'last_error = ? WHERE id = ?', (state, attempts, time.time() + delay, str(e), job['id']))
+                self.db.commit()
+            if upload:
+                self.catalog.set_upload_state(job['generation'], 'failed' if state == 'failed' else 'retrying')
+            return False
+        
+        seconds = max(time.time() - started, 0.001)
+        with self.lock:
+            self.db.execute(
+                "UPDATE uploads SET state = 'done', attempts = attempts + 1, owner = NULL, last_error = NULL, "
+                'finished = ?, seconds = ?, mb_per_second = ? WHERE id = ?',
+                (time.time(), round(seconds, 3), round(job['bytes'] / (1024 * 1024) / seconds, 2), job['id']))
+            self.db.commit()
+        if upload:
+            self.catalog.set_upload_state(job['generation'], 'uploaded')
+            print(f"✅ Uploaded {job['generation']} ({job['bytes'] / (1024 * 1024):.2f} MB "
+                  f"in {seconds:.1f}s)")
+        return True
+    
+    def worker(self):
+        while True:
+            job = self.claim()
+            if job is None:
+                self.wake.wait(timeout=5)
+                self.wake.clear()
+                continue
+            self.process(job)
+    
+    def start(self):
+        """Start the upload workers (once per process)"""
+        if self.threads:
+            return
+        recovered = self.recover()
+        if recovered:
+            print(f"🔁 Resuming {recovered} interrupted uploads")
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self.worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+    
+    def drain(self):
+        """Process every job that is due now in the calling thread"""
+        self.recover()
+        processed = 0
+        while (job := self.claim()) is not None:
+            self.process(job)
+            processed += 1
+        return processed
+    
+    def retry_failed(self):
+        with self.lock:
+            rows = self.db.execute("SELECT action, generation FROM uploads WHERE state = 'failed'").fetchall()
+            self.db.execute("UPDATE uploads SET state = 'queued', attempts = 0, next_attempt = ? "
+                            "WHERE state = 'failed'", (time.time(),))
+            self.db.commit()
+        for action, generation in rows:
+            if action == 'copy':
+                self.catalog.set_upload_state(generation, 'queued')
+        self.wake.set()
+        return len(rows)
+    
+    def status(self, limit=20):
+        """Job counts per state plus the most recent jobs with their throughput"""
+        columns = ', '.join(self.COLUMNS)
+        with self.lock:
+            counts = dict(self.db.execute('SELECT state, COUNT(*) FROM uploads GROUP BY state').fetchall())
+            rows = self.db.execute(f'SELECT {columns} FROM uploads ORDER BY id DESC LIMIT ?',
+                                   (limit,)).fetchall()
+        return {'counts': counts, 'jobs': [dict(zip(self.COLUMNS, row)) for row in rows]}
+
+class RestoreEngine:
+    """Restore files from any backup generation (chunked snapshot or zip) with verification"""
+    
+    def __init__(self, backup_dir, store=None, workers=0):
+        self.backup_dir = Path(backup_dir)
+        self.store = store
+        self.workers = workers or min(8, (os.cpu_count() or 1) * 2)
+        self.history_file = self.backup_dir / 'restore_history.jsonl'
+    
+    def list_generations(self):
+        """Return {generation: 'chunked' | path to zip}"""
+        generations = {}
+        for zip_file in list(self.backup_dir.glob('cluster_backup_*.zip')) + \
+                list((self.backup_dir / 'minecraft').glob('minecraft_*.zip')):
+            generations[zip_file.name] = str(zip_file)
+        if self.store is not None:
+            for generation in self.store.list_generations():
+                generations[generation] = 'chunked'
+        return dict(sorted(generations.items()))
+    
+    @staticmethod
+    def selected(name, paths):
+        if not paths:
+            return True
+        for path in paths:
+            path = path.rstrip('/')
+            if name == path or name.startswith(path + '/'):
+                return True
+        return False
+    
+    def get_chunk_verified(self, chunk_hash):
+        data = self.store.get_chunk(chunk_hash)
+        if hashlib.sha256(data).hexdigest() != chunk_hash:
+            raise ValueError(f'chunk {chunk_hash[:12]} is corrupt')
+        return data
+    
+    def write_output(self, target, name, mode, writer):
+        """Write one restored file atomically; writer(fileobj) produces the content"""
+        root = Path(target).resolve()
+        out_path = (root / name).resolve()
+        if os.path.isabs(name) or '..' in Path(name).parts or root not in out_path.parents:
+            # Absolute names, '..' parts and symlinks out of the target would write elsewhere
+            raise ValueError(f'{name!r} is outside the restore target')
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = out_path.with_name(f'.{out_path.name}.restore')
+        try:
+            with open(tmp_path, 'wb') as f:
+                writer(f)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        if mode:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, out_path)
+        return out_path
+    
+    def restore_chunked_file(self, file_meta, target, verify):
+        get_chunk = self.get_chunk_verified if verify else self.store.get_chunk
+        
+        def writer(f):
+            hasher = hashlib.sha256()
+            if 'region' in file_meta:
+                # Chunk hashes are verified individually; the rebuilt layout is new
+                build_region_file(file_meta['region'], get_chunk, f)
+                return
+            for chunk_hash in file_meta['chunks']:
+                data = get_chunk(chunk_hash)
+                hasher.update(data)
+                f.write(data)
+            if verify and hasher.hexdigest() != file_meta['sha256']:
+                raise ValueError('sha256 mismatch')
+        
+        out_path = self.write_output(target, file_meta['path'], file_meta.get('mode'), writer)
+        if 'mtime_ns' in file_meta:
+            os.utime(out_path, ns=(file_meta['mtime_ns'], file_meta['mtime_ns']))
+        return out_path.stat().st_size
+    
+    def restore_zip_file(self, zip_path, info, expected, target, verify, local):
+        # One ZipFile handle per thread so members decompress in parallel
+        if not hasattr(local, 'zipf'):
+            local.zipf = zipfile.ZipFile(zip_path)
+        
+        def writer(f):
+            hasher = hashlib.sha256()
+            with local.zipf.open(info) as member:  # CRC is checked by zipfile
+                while True:
+                    data = member.read(1024 * 1024)
+                    if not data:
+                        break
+                    hasher.update(data)
+                    f.write(data)
+            if verify and expected and hasher.hexdigest() != expected:
+                raise ValueError('sha256 mismatch')
+        
+        mode = (info.external_attr >> 16) & 0o7777
+        out_path = self.write_output(target, info.filename, mode, writer)
+        mtime = time.mktime(info.date_time + (0, 0, -1))
+        os.utime(out_path, (mtime, mtime))
+        return info.file_size
+    
+    def restore(self, generation, paths=None, target=None, verify=True):
+        """Restore the selected paths of a generation into target. Returns a report"""
+        generations = self.list_generations()
+        if generation not in generations:
+            raise KeyError(f'Unknown backup generation: {generation}')
+        target = Path(target or Path('~/restores').expanduser() / generation).expanduser()
+        started = time.time()
+        failed = []
+        restored_bytes = 0
+        restored_files = 0
+        
+        if generations[generation] == 'chunked':
+            manifest = self.store.load_manifest(generation)
+            files = [f for f in manifest['files'] if self.selected(f['path'], paths)]
+            tasks = [(f['path'], self.restore_chunked_file, (f, target, verify)) for f in files]
+        else:
+            zip_path = generations[generation]
+            with zipfile.ZipFile(zip_path) as zipf:
+                infos = zipf.infolist()
+                expected = {}
+                if ZIP_MANIFEST_NAME in zipf.NameToInfo:
+                    expected = json.loads(zipf.read(ZIP_MANIFEST_NAME))['sha256']
+            local = threading.local()
+            tasks = [(info.filename, self.restore_zip_file,
+                      (zip_path, info, expected.get(info.filename), target, verify, local))
+                     for info in infos
+                     if info.filename != ZIP_MANIFEST_NAME and not info.is_dir()
+                     and self.selected(info.filename, paths)]
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(fn, *args): name for name, fn, args in tasks}
+            for future in futures:
+                try:
+                    restored_bytes += future.result()
+                    restored_files += 1
+                except Exception as e:
+                    failed.append({'path': futures[future], 'error': str(e)})
+        
+        report = {
+            'generation': generation,
+            'target': str(target),
+            'files': restored_files,
+            'bytes': restored_bytes,
+            'failed': failed,
+            'verified': verify and not failed,
+            'seconds': round(time.time() - started, 3),
+            'timestamp': time.time()
+        }
+        report['mb_per_second'] = round(restored_bytes / (1024 * 1024) / max(report['seconds'], 0.001), 2)
+        
+        # Keep a history so time-to-restore can be tracked over time
+        with open(self.history_file, 'a') as f:
+            f.write(json.dumps({k: v for k, v in report.items() if k != 'failed'}) + '\n')
+        return report
 
 class AutoBackup:
     def __init__(self):
@@ -14,13 +1590,78 @@ class AutoBackup:
         self.config_file = Path('~/.config/gdrive/backup_config.json').expanduser()
         self.interval = 300  # 5 minutes in seconds
         self.load_config()
+        self.store = None
+        self.file_index = None
+        self.catalog = None
+        self.uploads = None
+        self.watcher = None
+        self.scan_counts = {}
+        self.throttle = BackupThrottle(self.config.get('throttle', {}), self.servers_lagging)
+        self.progress = BackupProgress()
+        self.cancel_event = threading.Event()
+        self.lock = BackupLock(self.backup_dir / '.backup.lock')
+        self.lag_offsets = {}
+        self.last_lag_seen = 0
+        # Persistent connections to servers with RCON enabled; a flush may take a while
+        self.rcon = RconPool(timeout=self.config.get('save_timeout_seconds', 60))
         
     def load_config(self):
         """Load backup configuration"""
         default_config = {
             'enabled': True,
             'interval_minutes': 5,
-            'keep_local_backups': 5,
+            'keep_local_backups': 5,  # only used when retention is disabled
+            'retention': {
+                'enabled': True,
+                'min_keep': 3,  # newest generations of each kind that are always kept
+                # Keep one generation per every_minutes for for_hours (grandfather-father-son)
+                'tiers': [
+                    {'every_minutes': 5, 'for_hours': 1},
+                    {'every_minutes': 60, 'for_hours': 24},
+                    {'every_minutes': 1440, 'for_hours': 336}
+                ],
+                'gc_batch': 5000  # unreferenced chunks deleted per run
+            },
+            'backup_format': 'chunked',  # 'chunked' (deduplicated store) or 'zip'
+            'remote': 'gdrive:Termux-Cluster-Backups',
+            'throttle': {
+                'enabled': True,
+                'max_read_mb_s': 20,  # read budget while the host is quiet
+                'max_cpu_percent': 70,  # back off above this system CPU load
+                'max_disk_busy_percent': 60,  # back off above this disk utilisation
+                'max_pause_seconds': 30,  # longest pause while servers report lag
+                'niceness': 10,
+                'idle_io_priority': True
+            },
+            'snapshot_staging': True,  # freeze worlds via reflink/copy, then compress off the pause
+            'save_timeout_seconds': 60,  # max wait for "Saved the game" per server
+            'minecraft_url': 'http://localhost:5002',  # adaptive-minecraft, for console commands
+            'region_delta': True,  # store only changed chunks of Minecraft .mca files
+            'watch_changes': True,  # use inotify to skip tree walks between runs
+            'full_scan_every': 12,  # runs between safety-net full walks
+            'uploads': {
+                'workers': 2,  # uploads running in parallel
+                'transfers': 4,  # rclone --transfers within one upload
+                'bwlimit': '',  # rclone --bwlimit, e.g. '2M' or '08:00,512k 23:00,off'
+                'max_attempts': 8,
+                'retry_base_seconds': 30,  # doubled after every failed attempt
+                'retry_max_seconds': 3600
+            },
+            'streaming': {
+                'enabled': False,  # pipe zip archives straight into `rclone rcat`
+                'buffer_mb': 16,
+                'tee_local': False  # also keep a local copy in ~/backups
+            },
+            'compression': {
+                'codec': 'deflate',  # deflate, bzip2, lzma or store
+                'level': 6,
+                'workers': 0  # 0 = one per CPU core
+            },
+            'chunking': {
+                'min_kb': 256,
+                'avg_kb': 1024,
+                'max_kb': 4096
+            },
             'backup_paths': [
                 '~/minecraft',
                 '~/cluster',
@@ -33,7 +1674,7 @@ class AutoBackup:
         
         if self.config_file.exists():
             with open(self.config_file, 'r') as f:
-                self.config = json.load(f)
+                self.config = {**default_config, **json.load(f)}
         else:
             self.config = default_config
             self.save_config()
@@ -51,19 +1692,14 @@ class AutoBackup:
         print(f"📦 Creating backup: {backup_file.name}")
         
         try:
-            with zipfile.ZipFile(backup_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for path_spec in self.config['backup_paths']:
-                    path = Path(path_spec).expanduser()
-                    if path.exists():
-                        if path.is_file():
-                            zipf.write(path, path.name)
-                        else:
-                            for file_path in path.rglob('*'):
-                                if file_path.is_file():
-                                    # Skip large or temporary files
-                                    if self.should_include_file(file_path):
-                                        arcname = file_path.relative_to(Path.home())
-                                        zipf.write(file_path, arcname)
+            if self.config.get('streaming', {}).get('enabled', False):
+                self.stream_zip_archive(self.iter_backup_files(), backup_file)
+                return True
+            
+            started = time.time()
+            with open(backup_file, 'wb') as f:
+                writer = self.write_zip_archive(self.iter_backup_files(), f)
+            self.catalog_zip(backup_file, writer, started, str(backup_file))
             
             # Get file size
             file_size = backup_file.stat().st_size / (1024 * 1024)  # MB
@@ -72,57 +1708,537 @@ class AutoBackup:
             # Sync to Google Drive
             self.sync_to_gdrive(backup_file)
             
-            # Clean up old backups
-            self.cleanup_old_backups()
-            
             return True
             
+        except BackupCancelled:
+            backup_file.unlink(missing_ok=True)
+            raise
         except Exception as e:
             print(f"❌ Backup failed: {e}")
             return False
     
-    def should_include_file(self, file_path):
+    def stream_zip_archive(self, entries, backup_file, sources=None):
+        """Stream a zip archive to the remote without staging it on disk"""
+        streaming = self.config.get('streaming', {})
+        remote_path = f"{self.config['remote']}/{backup_file.name}"
+        sinks = [RcloneRcatSink(remote_path)]
+        if streaming.get('tee_local', False):
+            sinks.append(open(backup_file, 'wb'))
+        
+        print(f"☁️  Streaming {backup_file.name} to {remote_path}...")
+        started = time.time()
+        sink = StreamingSink(sinks, buffer_bytes=streaming.get('buffer_mb', 16) * 1024 * 1024)
+        try:
+            writer = self.write_zip_archive(entries, sink, sources)
+        except BaseException:
+            sink.abort()
+            if len(sinks) > 1:
+                backup_file.unlink(missing_ok=True)
+            raise
+        try:
+            size = sink.close()
+        except Exception as e:
+            if len(sinks) == 1:
+                raise
+            if sink.bytes_written != writer.offset or \
+                    not backup_file.exists() or backup_file.stat().st_size != writer.offset:
+                backup_file.unlink(missing_ok=True)  # the local copy is partial too
+                raise
+            # The local copy is complete: keep it and upload it through the queue instead
+            print(f"⚠️  Streaming {backup_file.name} failed ({e}), queueing the local copy")
+            self.catalog_zip(backup_file, writer, started, str(backup_file))
+            self.sync_to_gdrive(backup_file)
+            return writer.offset
+        self.catalog_zip(backup_file, writer, started,
+                         str(backup_file) if len(sinks) > 1 else remote_path, 'uploaded')
+        
+        print(f"✅ Backup streamed: {backup_file.name} ({size / (1024 * 1024):.2f} MB)")
+        return size
+    
+    def check_streaming(self, remote=None):
+        """Stream a small test archive through rclone rcat, read it back and verify it.
+        remote defaults to a temporary directory on rclone's local backend"""
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            source = tmp / 'source'
+            source.mkdir()
+            files = {'small.txt': b'hello\n' * 1000, 'level.dat': os.urandom(3 * 1024 * 1024),
+                     'region/r.0.0.mca': b'\0' * (5 * 1024 * 1024)}
+            entries = []
+            for name, data in files.items():
+                path = source / name
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(data)
+                st = path.stat()
+                entries.append(FileEntry(str(path), name, st.st_size, st.st_mtime_ns, st.st_ino, st.st_mode))
+            
+            remote_path = f"{remote or tmp / 'remote'}/stream-check.zip"
+            sink = StreamingSink([RcloneRcatSink(remote_path)], buffer_bytes=4 * 1024 * 1024)
+            try:
+                self.write_zip_archive(entries, sink)
+            except BaseException:
+                sink.abort()
+                raise
+            size = sink.close()
+            
+            copy = tmp / 'copy.zip'
+            with open(copy, 'wb') as f:
+                subprocess.run(['rclone', 'cat', remote_path], stdout=f, check=True, timeout=300)
+            subprocess.run(['rclone', 'deletefile', remote_path], capture_output=True, timeout=300)
+            with zipfile.ZipFile(copy) as zipf:
+                bad = zipf.testzip()
+                if bad:
+                    raise ValueError(f'{bad} is corrupt in the streamed archive')
+                for name, data in files.items():
+                    if zipf.read(name) != data:
+                        raise ValueError(f'{name} differs in the streamed archive')
+            return {'remote_path': remote_path, 'bytes': size, 'files': len(files)}
+    
+    def catalog_zip(self, backup_file, writer, started, location, upload_state='pending'):
+        """Record a finished zip archive in the backup catalog"""
+        members = writer.members[:-1]  # without the hash manifest
+        self.get_catalog().record(
+            backup_file.name, 'zip', started, sum(m[7] for m in members), writer.offset, len(members),
+            round(time.time() - started, 3), writer.hasher.hexdigest(), location, upload_state)
+    
+    def get_catalog(self):
+        """Open the backup catalog, backfilling it from existing backups on first use"""
+        if self.catalog is None:
+            catalog = BackupCatalog(self.backup_dir / 'catalog.db')
+            if catalog.is_empty():
+                catalog.import_existing(self.backup_dir, self.get_store())
+            self.catalog = catalog
+        return self.catalog
+    
+    def get_uploads(self):
+        if self.uploads is None:
+            self.uploads = UploadQueue(self.get_catalog(), self.config.get('uploads', {}))
+        return self.uploads
+    
+    def get_compression(self):
+        compression = self.config.get('compression', {})
+        return compression.get('codec', 'deflate'), compression.get('level', 6)
+    
+    def get_pool(self):
+        self.throttle.cancel_event = self.cancel_event
+        return CompressionPool(self.config.get('compression', {}).get('workers', 0), self.throttle,
+                               self.progress, self.cancel_event)
+    
+    def servers_lagging(self, window=30):
+        """True if any server logged "Can't keep up!" in the last window seconds"""
+        for log_file in Path('~/minecraft/servers').expanduser().glob('*/logs/latest.log'):
+            try:
+                size = log_file.stat().st_size
+                offset = self.lag_offsets.get(log_file, size)
+                if size < offset:
+                    offset = 0  # rotated
+                if size > offset:
+                    with open(log_file, 'rb') as f:
+                        f.seek(offset)
+                        if b"Can't keep up!" in f.read(size - offset):
+                            self.last_lag_seen = time.time()
+                self.lag_offsets[log_file] = size
+            except OSError:
+                continue
+        return time.time() - self.last_lag_seen < window
+    
+    def write_zip_archive(self, entries, fileobj, sources=None):
+        """Compress entries across cores and write them as a zip to fileobj"""
+        codec, level = self.get_compression()
+        sources = sources or {}
+        writer = ZipStreamWriter(fileobj)
+        hashes = {}
+        # Large compressed members come back from the workers through files here
+        spool_dir = self.backup_dir / '.spool'
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        spool_dir.mkdir(parents=True)
+        try:
+            for entry, member in self.get_pool().map(
+                    entries, lambda e: (compress_member, sources.get(e.path, e.path), codec, level, str(spool_dir)),
+                    lambda e: e.size):
+                if 'error' in member:
+                    print(f"⚠️  Skipping {entry.arcname}: {member['error']}")
+                    continue
+                writer.add(entry.arcname, member, entry.mtime_ns, entry.mode)
+                hashes[entry.arcname] = member['sha256']
+                self.progress.add(files=1, bytes_read=member['size'], bytes_compressed=member['csize'])
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+        
+        # Hash manifest used by the restore engine to verify every file
+        manifest = json.dumps({'sha256': hashes}).encode()
+        writer.add(ZIP_MANIFEST_NAME, {
+            'crc': zlib.crc32(manifest), 'size': len(manifest), 'method': zipfile.ZIP_STORED,
+            'data': manifest
+        }, time.time_ns(), 0o644)
+        writer.close()
+        return writer
+    
+    def get_store(self):
+        """Open the content-addressed chunk store"""
+        if self.store is None:
+            codec, level = self.get_compression()
+            self.store = ChunkStore(self.backup_dir / 'store', codec, level)
+        return self.store
+    
+    def get_chunking(self):
+        chunking = self.config.get('chunking', {})
+        return (chunking.get('min_kb', 256) * 1024,
+                chunking.get('avg_kb', 1024) * 1024,
+                chunking.get('max_kb', 4096) * 1024)
+    
+    def get_file_index(self):
+        if self.file_index is None:
+            self.file_index = FileIndex(self.get_store())
+        return self.file_index
+    
+    def start_watcher(self):
+        """Start the inotify dirty-set watcher over all backup paths"""
+        if not self.config.get('watch_changes', True) or self.watcher is not None:
+            return
+        roots = [Path(p).expanduser() for p in self.config['backup_paths']]
+        watcher = DirtyWatcher([r for r in roots if r.is_dir()])
+        if watcher.start():
+            self.watcher = watcher
+    
+    def scan_tree(self, root, arcbase):
+        """Walk a tree with one os.scandir pass, yielding FileEntry for included files"""
+        stack = [str(root)]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in self.exclude_dirs:
+                                stack.append(entry.path)
+                            continue
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    if self.should_include_file(entry.path, st):
+                        yield FileEntry(entry.path, os.path.relpath(entry.path, arcbase),
+                                        st.st_size, st.st_mtime_ns, st.st_ino, st.st_mode & 0o7777)
+    
+    def stat_entry(self, path, arcbase):
+        """Build a FileEntry for a single path, or None if it is gone or excluded"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path) or not self.should_include_file(path, st):
+            return None
+        return FileEntry(path, os.path.relpath(path, arcbase),
+                         st.st_size, st.st_mtime_ns, st.st_ino, st.st_mode & 0o7777)
+    
+    def collect_files(self, consumer, roots):
+        """Return FileEntry list for (root, arcbase) pairs, using the dirty set when possible"""
+        changed = self.watcher.take(consumer) if self.watcher else None
+        runs = self.scan_counts.get(consumer, 0)
+        self.scan_counts[consumer] = runs + 1
+        full_scan = changed is None or runs % self.config.get('full_scan_every', 12) == 0
+        
+        entries = {}
+        for root, arcbase in roots:
+            root = str(root)
+            if os.path.isfile(root):
+                entry = self.stat_entry(root, arcbase)
+                if entry:
+                    entries[entry.path] = entry
+                continue
+            
+            if full_scan:
+                for entry in self.scan_tree(root, arcbase):
+                    entries[entry.path] = entry
+                continue
+            
+            # Start from the index and only look at what inotify saw change
+            for path, row in self.get_file_index().load(root).items():
+                entries[path] = FileEntry(path, os.path.relpath(path, arcbase), *row[1:5])
+            prefix = root + os.sep
+            for path in changed:
+                if not path.startswith(prefix):
+                    continue
+                for known in [p for p in entries if p == path or p.startswith(path + os.sep)]:
+                    del entries[known]
+                if os.path.isdir(path) and not os.path.islink(path):
+                    for entry in self.scan_tree(path, arcbase):
+                        entries[entry.path] = entry
+                else:
+                    entry = self.stat_entry(path, arcbase)
+                    if entry:
+                        entries[entry.path] = entry
+        
+        return list(entries.values())
+    
+    def backup_roots(self):
+        roots = []
+        for path_spec in self.config['backup_paths']:
+            path = Path(path_spec).expanduser()
+            if path.is_file():
+                roots.append((path, path.parent))
+            elif path.exists():
+                roots.append((path, Path.home()))
+        return roots
+    
+    def iter_backup_files(self):
+        """Return FileEntry for every file in the configured backup paths"""
+        return self.collect_files('cluster', self.backup_roots())
+    
+    def create_backup_snapshot(self, generation, files, roots, sources=None):
+        """Write a backup generation into the chunk store, storing only new chunks"""
+        store = self.get_store()
+        started = time.time()
+        manifest = {
+            'generation': generation,
+            'created': started,
+            'files': []
+        }
+        new_chunks = []
+        bytes_read = 0
+        bytes_written = 0
+        
+        file_index = self.get_file_index()
+        indexed = {}
+        for root, _ in roots:
+            indexed.update(file_index.load(root))
+        seen = set()
+        
+        # Unchanged files reuse their chunks without being read; the rest go to the pool
+        results = {}
+        changed = []
+        for entry in files:
+            seen.add(entry.path)
+            row = indexed.get(entry.path)
+            if FileIndex.unchanged(row, entry):
+                results[entry.path] = (row[5], json.loads(row[6]))
+            else:
+                changed.append(entry)
+        
+        # An index row must never outlive its chunks; re-read files whose chunks are gone
+        def reused_hashes(path):
+            file_sha256, chunk_hashes = results[path]
+            return file_chunk_hashes({'region': chunk_hashes} if file_sha256 == REGION_MARKER
+                                     else {'chunks': chunk_hashes})
+        missing = store.missing({h for path in results for h in reused_hashes(path)})
+        if missing:
+            stale = [entry for entry in files if entry.path in results and missing & set(reused_hashes(entry.path))]
+            for entry in stale:
+                del results[entry.path]
+                indexed.pop(entry.path)  # no region delta against missing chunks
+            changed += stale
+        
+        chunking = self.get_chunking()
+        codec, level = self.get_compression()
+        chunk_dir = str(store.chunk_dir)
+        region_delta = self.config.get('region_delta', True)
+        sources = sources or {}
+        
+        def task_for(entry):
+            row = indexed.get(entry.path)
+            source = sources.get(entry.path, entry.path)
+            if region_delta and entry.path.endswith('.mca'):
+                previous = json.loads(row[6]) if row and row[5] == REGION_MARKER else None
+                return store_region_chunks, source, chunk_dir, previous, row[2] if previous else 0
+            return store_file_chunks, source, chunk_dir, chunking, codec, level
+        
+        def read_cost(entry):
+            # Region deltas read the header plus changed chunks, not the whole file
+            if region_delta and entry.path.endswith('.mca'):
+                return min(entry.size, 2 * REGION_SECTOR + entry.size // 16)
+            return entry.size
+        
+        def fallback_task(entry):
+            return store_file_chunks, sources.get(entry.path, entry.path), chunk_dir, chunking, codec, level
+        
+        pool = self.get_pool()
+        outcomes = list(pool.map(changed, task_for, read_cost))
+        fallbacks = [entry for entry, result in outcomes if result.get('fallback')]
+        if fallbacks:
+            # Not a well-formed region file: store it like any other file
+            outcomes += list(pool.map(fallbacks, fallback_task, lambda e: e.size))
+        
+        for entry, result in outcomes:
+            if result.get('fallback'):
+                continue
+            if 'error' in result:
+                print(f"⚠️  Skipping {entry.arcname}: {result['error']}")
+                continue
+            bytes_read += result['bytes_read']
+            stored_bytes = 0
+            for chunk_hash, size, stored in result['chunks']:
+                if not store.has_chunk(chunk_hash):
+                    stored = stored or store.chunk_path(chunk_hash).stat().st_size
+                    store.register(chunk_hash, size, stored)
+                    stored_bytes += stored
+                    new_chunks.append(chunk_hash)
+            bytes_written += stored_bytes
+            self.progress.add(files=1, bytes_read=result['bytes_read'], bytes_compressed=stored_bytes)
+            if 'region' in result:
+                file_index.update(entry, REGION_MARKER, result['region'])
+                results[entry.path] = (REGION_MARKER, result['region'])
+            else:
+                chunk_hashes = [c[0] for c in result['chunks']]
+                file_index.update(entry, result['sha256'], chunk_hashes)
+                results[entry.path] = (result['sha256'], chunk_hashes)
+        
+        for entry in files:
+            if entry.path not in results:
+                continue
+            file_sha256, chunk_hashes = results[entry.path]
+            file_meta = {
+                'path': entry.arcname,
+                'size': entry.size,
+                'mtime_ns': entry.mtime_ns,
+                'mode': entry.mode
+            }
+            if file_sha256 == REGION_MARKER:
+                file_meta['region'] = chunk_hashes
+            else:
+                file_meta['sha256'] = file_sha256
+                file_meta['chunks'] = chunk_hashes
+            manifest['files'].append(file_meta)
+        
+        file_index.remove(set(indexed) - seen)
+        manifest['new_chunks'] = len(new_chunks)
+        manifest['bytes_read'] = bytes_read
+        manifest['bytes_written'] = bytes_written
+        store.commit()
+        manifest_path = store.write_manifest(manifest)
+        store.add_refs(ChunkStore.manifest_chunks(manifest), 1)
+        store.commit()
+        self.get_catalog().record(
+            generation, 'chunked', started, sum(f['size'] for f in manifest['files']), bytes_written,
+            len(manifest['files']), round(time.time() - started, 3),
+            hashlib.sha256(manifest_path.read_bytes()).hexdigest(), str(manifest_path))
+        
+        print(f"✅ Snapshot {generation}: {len(manifest['files'])} files, "
+              f"{len(new_chunks)} new chunks ({bytes_written / (1024 * 1024):.2f} MB written)")
+        return manifest_path, new_chunks
+    
+    def sync_store_to_gdrive(self, manifest_path, new_chunks):
+        """Queue the new chunks and the manifest of a snapshot for upload"""
+        store = self.get_store()
+        files = [str(store.chunk_path(h).relative_to(store.root)) for h in new_chunks]
+        files.append(str(manifest_path.relative_to(store.root)))  # uploaded last
+        size = sum((store.root / f).stat().st_size for f in files)
+        self.get_uploads().enqueue(manifest_path.stem, store.root, f"{self.config['remote']}/store",
+                                   size, files)
+        print(f"📤 Queued {len(new_chunks)} new chunks for upload")
+        return True
+    
+    def run_backup(self):
+        """Create a main backup in the configured format"""
+        if self.config.get('backup_format', 'chunked') != 'chunked':
+            return self.create_backup_zip()
+        
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        generation = f'cluster_backup_{timestamp}'
+        print(f"📦 Creating snapshot: {generation}")
+        
+        try:
+            manifest_path, new_chunks = self.create_backup_snapshot(
+                generation, self.iter_backup_files(), self.backup_roots())
+            self.sync_store_to_gdrive(manifest_path, new_chunks)
+            return True
+        except Exception as e:
+            print(f"❌ Backup failed: {e}")
+            return False
+    
+    exclude_extensions = ['.tmp', '.log', '.cache']
+    exclude_dirs = ['logs', 'cache', 'temp']
+    
+    def should_include_file(self, file_path, st=None):
         """Check if file should be included in backup"""
-        exclude_extensions = ['.tmp', '.log', '.cache']
-        exclude_dirs = ['logs', 'cache', 'temp']
+        file_path = Path(file_path)
         
-        if file_path.suffix in exclude_extensions:
+        if file_path.suffix in self.exclude_extensions:
             return False
         
-        for exclude_dir in exclude_dirs:
+        for exclude_dir in self.exclude_dirs:
             if exclude_dir in file_path.parts:
                 return False
         
         # Skip files larger than 100MB
-        if file_path.stat().st_size > 100 * 1024 * 1024:
+        size = st.st_size if st is not None else file_path.stat().st_size
+        if size > 100 * 1024 * 1024:
             return False
             
         return True
     
     def sync_to_gdrive(self, backup_file):
-        """Sync backup to Google Drive using rclone"""
+        """Queue a backup file for upload to Google Drive"""
+        self.get_uploads().enqueue(backup_file.name, backup_file, f"{self.config['remote']}/",
+                                   backup_file.stat().st_size)
+        print(f"📤 Queued {backup_file.name} for upload")
+        return True
+    
+    def cleanup_old_backups(self):
+        """Prune generations outside the retention tiers, locally and remotely, then
+        sweep chunks no generation references any more"""
+        retention = self.config.get('retention', {})
+        if not retention.get('enabled', True):
+            self.cleanup_local_zips()
+            return
+        
         try:
-            print("☁️  Syncing to Google Drive...")
+            catalog = self.get_catalog()
+            policy = RetentionPolicy(retention.get('tiers', RetentionPolicy.DEFAULT_TIERS),
+                                     retention.get('min_keep', 3))
+            groups = {}
+            for generation in catalog.query(limit=-1)[1]:
+                groups.setdefault((generation['kind'], generation['format']), []).append(generation)
             
-            # Upload to Google Drive
-            result = subprocess.run([
-                'rclone', 'copy', str(backup_file), 'gdrive:Termux-Cluster-Backups/',
-                '--progress', '-v'
-            ], capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                print("✅ Backup synced to Google Drive")
-                return True
-            else:
-                print(f"❌ Rclone error: {result.stderr}")
-                return False
+            pruned = []
+            for generations in groups.values():
+                keep = policy.select([(g['name'], g['created']) for g in generations])
+                for generation in generations:
+                    # Never drop the only copy: a backup is pruned only once it is on the remote
+                    if generation['name'] in keep or generation['upload_state'] not in ON_REMOTE:
+                        continue
+                    self.prune_generation(generation)
+                    pruned.append(generation['name'])
+            catalog.remove(pruned)
+            if pruned:
+                print(f"🗑️  Pruned {len(pruned)} backup generations")
             
+            store = self.get_store()
+            deleted, freed = store.sweep(retention.get('gc_batch', 5000))
+            if deleted:
+                self.get_uploads().enqueue_delete(
+                    'chunk-gc', f"{self.config['remote']}/store",
+                    [str(store.chunk_path(h).relative_to(store.root)) for h in deleted])
+                print(f"♻️  Reclaimed {len(deleted)} chunks ({freed / (1024 * 1024):.2f} MB)")
+        
         except Exception as e:
-            print(f"❌ Sync error: {e}")
-            return False
+            print(f"⚠️  Cleanup error: {e}")
     
-    def cleanup_old_backups(self):
-        """Remove old local backup files"""
+    def prune_generation(self, generation):
+        """Delete one generation locally and queue the removal of its remote copy"""
+        name = generation['name']
+        remote = self.config['remote']
+        on_remote = generation['upload_state'] in ON_REMOTE
+        uploads = self.get_uploads()
+        if generation['format'] == 'chunked':
+            store = self.get_store()
+            if (store.manifest_dir / f'{name}.json').exists():
+                store.delete_generation(name)
+            if on_remote:
+                uploads.enqueue_delete(name, f'{remote}/store', [f'manifests/{name}.json'])
+            return
+        
+        local_dir = self.backup_dir / 'minecraft' if generation['kind'] == 'minecraft' else self.backup_dir
+        (local_dir / name).unlink(missing_ok=True)
+        if on_remote:
+            uploads.enqueue_delete(name, f'{remote}/{name}')
+    
+    def cleanup_local_zips(self):
+        """Remove old local backup files (used when retention tiers are disabled)"""
         try:
             backup_files = sorted(
                 self.backup_dir.glob('cluster_backup_*.zip'),
@@ -132,63 +2248,275 @@ class AutoBackup:
             # Keep only the most recent backups
             keep_count = self.config.get('keep_local_backups', 5)
             if len(backup_files) > keep_count:
+                catalog = self.get_catalog()
+                states = catalog.upload_states([f.name for f in backup_files[:-keep_count]])
+                removed = []
                 for old_file in backup_files[:-keep_count]:
+                    # Never drop the only copy of a backup that has not been uploaded yet
+                    if states.get(old_file.name, 'unknown') not in ON_REMOTE:
+                        continue
                     old_file.unlink()
+                    removed.append(old_file.name)
                     print(f"🗑️  Removed old backup: {old_file.name}")
+                catalog.local_removed(removed, self.config['remote'])
                     
         except Exception as e:
             print(f"⚠️  Cleanup error: {e}")
     
+    def find_running_servers(self):
+        """Return [(name, server_dir or None)] for running Minecraft servers.
+        
+        Servers supervised by adaptive-minecraft.py leave a server.pid in their directory;
+        screen sessions started by hand are still picked up when screen is installed.
+        """
+        servers = []
+        for pid_file in sorted((Path.home() / 'minecraft' / 'servers').glob('*/server.pid')):
+            try:
+                if psutil.pid_exists(int(pid_file.read_text().strip())):
+                    servers.append((pid_file.parent.name, pid_file.parent))
+            except (OSError, ValueError):
+                continue
+        
+        if not shutil.which('screen'):
+            return servers
+        try:
+            result = subprocess.run(['screen', '-ls'], capture_output=True, text=True, timeout=5)
+        except (OSError, subprocess.SubprocessError):
+            return servers
+        for line in result.stdout.split('\n'):
+            if 'mc' not in line or 'Attached' in line or '.' not in line:
+                continue
+            servers.append((line.split('.', 1)[1].split('\t')[0], None))
+        return servers
+    
+    def send_console(self, name, *commands, server_dir=None):
+        """Run console commands on a server. Returns their responses when sent over RCON.
+        
+        RCON is used when server.properties enables it; otherwise supervised servers get
+        the commands through adaptive-minecraft and hand-started ones through screen.
+        """
+        settings = rcon_settings(server_dir) if server_dir else None
+        if settings:
+            try:
+                return self.rcon.get(str(server_dir), '127.0.0.1', *settings).batch(list(commands))
+            except RconError as e:
+                print(f"⚠️  RCON to {name} failed ({e}), using the console")
+        
+        server_dir = Path.home() / 'minecraft' / 'servers' / name
+        if (server_dir / 'server.pid').exists():
+            url = self.config.get('minecraft_url', 'http://localhost:5002')
+            response = requests.post(f"{url}/minecraft/console/{name.rsplit('-', 1)[1]}",
+                                     json={'commands': list(commands)}, timeout=5)
+            if not response.ok:
+                raise OSError(f"console refused: {response.text.strip()}")
+            return None
+        subprocess.run([
+            'screen', '-S', name, '-X', 'stuff', ''.join(f'{command}\\n' for command in commands)
+        ], capture_output=True, timeout=5)
+        return None
+    
+    def wait_for_log(self, log_file, offset, marker, timeout):
+        """Tail log_file from offset until a line contains marker. Returns True if seen"""
+        deadline = time.time() + timeout
+        buffer = ''
+        while time.time() < deadline:
+            try:
+                with open(log_file, 'r', errors='replace') as f:
+                    f.seek(0, os.SEEK_END)
+                    if f.tell() < offset:
+                        offset = 0  # log was rotated
+                    f.seek(offset)
+                    data = f.read()
+                    offset = f.tell()
+            except OSError:
+                data = ''
+            buffer += data
+            if marker in buffer:
+                return True
+            buffer = buffer[-len(marker):]
+            time.sleep(0.05)
+        return False
+    
+    def flush_server(self, name, server_dir):
+        """Disable autosave and flush one server, waiting for the save to land on disk"""
+        print(f"💾 Flushing world on {name}...")
+        log_file = server_dir / 'logs' / 'latest.log' if server_dir else None
+        offset = 0
+        if log_file and log_file.exists():
+            offset = log_file.stat().st_size
+        
+        try:
+            responses = self.send_console(name, 'save-off', 'save-all flush', server_dir=server_dir)
+        except (OSError, requests.RequestException, subprocess.SubprocessError) as e:
+            print(f"⚠️  Could not flush {name}: {e}")
+            return False
+        if responses is not None:
+            # Over RCON, save-all flush only answers once the save is on disk
+            if 'Saved the game' not in responses[1]:
+                print(f"⚠️  {name} did not confirm the save: {responses[1]!r}")
+                return False
+            return True
+        
+        if log_file is None:
+            time.sleep(2)  # No log to watch for sessions we did not start
+            return False
+        if not self.wait_for_log(log_file, offset, 'Saved the game',
+                                 self.config.get('save_timeout_seconds', 60)):
+            print(f"⚠️  {name} did not confirm the save in time")
+            return False
+        return True
+    
+    @contextmanager
+    def saves_paused(self):
+        """Flush every running server in parallel and keep autosave off until the block exits"""
+        servers = self.find_running_servers()
+        if servers:
+            started = time.time()
+            with ThreadPoolExecutor(max_workers=len(servers)) as executor:
+                confirmed = list(executor.map(lambda server: self.flush_server(*server), servers))
+            print(f"💾 {sum(confirmed)}/{len(servers)} servers flushed in {time.time() - started:.2f}s")
+        try:
+            yield servers
+        finally:
+            for name, server_dir in servers:
+                try:
+                    self.send_console(name, 'save-on', server_dir=server_dir)
+                except (OSError, requests.RequestException, subprocess.SubprocessError) as e:
+                    print(f"⚠️  Could not re-enable saving on {name}: {e}")
+    
+    def changed_entries(self, entries, roots):
+        """Entries whose size, mtime or inode differ from the file index"""
+        file_index = self.get_file_index()
+        indexed = {}
+        for root, _ in roots:
+            indexed.update(file_index.load(root))
+        return [entry for entry in entries if not FileIndex.unchanged(indexed.get(entry.path), entry)]
+    
+    @contextmanager
+    def frozen_worlds(self, minecraft_path, only_changed):
+        """Yield (entries, {live path: frozen path}) for a point-in-time view of the worlds.
+        
+        With staging on, servers only stay paused while the tree is scanned and
+        the files are reflinked (or copied); compression reads the snapshot.
+        """
+        roots = [(minecraft_path, minecraft_path)]
+        if not self.config.get('snapshot_staging', True):
+            with self.saves_paused():
+                yield self.iter_minecraft_files(minecraft_path), {}
+            return
+        
+        stager = SnapshotStager(self.backup_dir / '.staging' / f'minecraft_{os.getpid()}')
+        stager.cleanup()
+        try:
+            with self.saves_paused() as servers:
+                paused = time.time()
+                entries = self.iter_minecraft_files(minecraft_path)
+                # Unchanged files are never read again, so only changed ones need freezing
+                to_stage = self.changed_entries(entries, roots) if only_changed else entries
+                sources = stager.stage(to_stage)
+                staged = {entry.path for entry in to_stage}
+                entries = [entry for entry in entries if entry.path in sources or entry.path not in staged]
+                if servers:
+                    print(f"⏸️  Worlds paused {(time.time() - paused) * 1000:.0f} ms for snapshot "
+                          f"({stager.counts['reflink']} reflinked, {stager.counts['hardlink']} hardlinked, "
+                          f"{stager.counts['copy']} copied)")
+            yield entries, sources
+        finally:
+            stager.cleanup()
+    
     def backup_minecraft_worlds(self):
         """Special backup for Minecraft worlds"""
         try:
             print("🎮 Backup Minecraft worlds...")
             
-            # Force save on all Minecraft servers
-            result = subprocess.run(['screen', '-ls'], capture_output=True, text=True)
-            mc_servers = [line for line in result.stdout.split('\n') if 'mc' in line and 'Attached' not in line]
+            minecraft_path = Path('~/minecraft').expanduser()
+            if not minecraft_path.exists():
+                return
             
-            for server_line in mc_servers:
-                if 'mc' in server_line:
-                    try:
-                        screen_name = server_line.split('.')[1].split('\t')[0]
-                        print(f"💾 Saving world on {screen_name}...")
-                        subprocess.run([
-                            'screen', '-S', screen_name, '-X', 'stuff', 'save-all\\n'
-                        ], capture_output=True, timeout=5)
-                        time.sleep(2)  # Wait for save to complete
-                    except:
-                        continue
+            timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+            
+            if self.config.get('backup_format', 'chunked') == 'chunked':
+                with self.frozen_worlds(minecraft_path, only_changed=True) as (entries, sources):
+                    manifest_path, new_chunks = self.create_backup_snapshot(
+                        f'minecraft_{timestamp}', entries, [(minecraft_path, minecraft_path)], sources)
+                self.sync_store_to_gdrive(manifest_path, new_chunks)
+                return
             
             # Create Minecraft-specific backup
             minecraft_backup_dir = self.backup_dir / 'minecraft'
             minecraft_backup_dir.mkdir(exist_ok=True)
-            
-            timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
             minecraft_zip = minecraft_backup_dir / f'minecraft_{timestamp}.zip'
             
-            minecraft_path = Path('~/minecraft').expanduser()
-            if minecraft_path.exists():
-                with zipfile.ZipFile(minecraft_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for server_dir in minecraft_path.glob('*'):
-                        if server_dir.is_dir():
-                            for world_file in server_dir.rglob('*'):
-                                if world_file.is_file() and self.should_include_file(world_file):
-                                    arcname = world_file.relative_to(minecraft_path)
-                                    zipf.write(world_file, arcname)
+            with self.frozen_worlds(minecraft_path, only_changed=False) as (entries, sources):
+                if self.config.get('streaming', {}).get('enabled', False):
+                    self.stream_zip_archive(entries, minecraft_zip, sources)
+                    return
                 
-                print(f"✅ Minecraft backup: {minecraft_zip.name}")
-                
-                # Sync Minecraft backup
-                self.sync_to_gdrive(minecraft_zip)
+                started = time.time()
+                try:
+                    with open(minecraft_zip, 'wb') as f:
+                        writer = self.write_zip_archive(entries, f, sources)
+                except BackupCancelled:
+                    minecraft_zip.unlink(missing_ok=True)
+                    raise
+                self.catalog_zip(minecraft_zip, writer, started, str(minecraft_zip))
+            
+            print(f"✅ Minecraft backup: {minecraft_zip.name}")
+            
+            # Sync Minecraft backup
+            self.sync_to_gdrive(minecraft_zip)
             
         except Exception as e:
             print(f"❌ Minecraft backup failed: {e}")
     
+    def iter_minecraft_files(self, minecraft_path):
+        """Return FileEntry for every world file in the server directories under ~/minecraft"""
+        entries = self.collect_files('minecraft', [(minecraft_path, minecraft_path)])
+        return [entry for entry in entries if os.sep in entry.arcname]
+    
+    def get_restore_engine(self):
+        return RestoreEngine(self.backup_dir, self.get_store())
+    
+    def run_full_backup(self, kinds=('cluster', 'minecraft'), deadline=None, throttled=True):
+        """Run one backup of the given kinds. The caller must hold self.lock.
+        
+        Set self.cancel_event beforehand to make the run cancellable; a set
+        event makes it raise BackupCancelled at the next file.
+        """
+        self.progress.reset()
+        # Pace the run so it still finishes before the next one is due
+        self.throttle.start(deadline or time.time() + self.interval * 0.9)
+        throttle_enabled = self.throttle.enabled
+        self.throttle.enabled = throttle_enabled and throttled
+        
+        try:
+            if 'cluster' in kinds:
+                self.progress.set_phase('cluster')
+                self.run_backup()
+            
+            if 'minecraft' in kinds:
+                self.progress.set_phase('minecraft')
+                self.backup_minecraft_worlds()
+            
+            self.progress.set_phase('retention')
+            self.cleanup_old_backups()
+            
+            self.progress.set_phase('done')
+        except BackupCancelled:
+            self.progress.set_phase('cancelled')
+            raise
+        finally:
+            self.throttle.enabled = throttle_enabled
+        
+        if self.throttle.throttled_seconds:
+            print(f"🐢 Throttled for {self.throttle.throttled_seconds:.1f}s to protect the servers")
+    
     def start_auto_backup(self):
         """Start automatic backup loop"""
         print(f"🔄 Auto-backup started (every {self.interval} seconds)")
         print(f"📁 Backup paths: {self.config['backup_paths']}")
+        self.start_watcher()
+        self.get_uploads().start()
         
         backup_count = 0
         
@@ -199,13 +2527,16 @@ class AutoBackup:
                     current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     print(f"\n🕒 Backup #{backup_count} at {current_time}")
                     
-                    # Create main backup
-                    self.create_backup_zip()
-                    
-                    # Create Minecraft worlds backup
-                    self.backup_minecraft_worlds()
-                    
-                    print(f"✅ Backup #{backup_count} completed")
+                    if self.lock.acquire():
+                        try:
+                            self.run_full_backup()
+                            print(f"✅ Backup #{backup_count} completed")
+                        finally:
+                            self.lock.release()
+                    else:
+                        # A manual backup from backup-manager is already covering this slot
+                        print(f"⏭️  Backup #{backup_count} skipped: another backup is running "
+                              f"(pid {self.lock.holder()})")
                     print(f"⏰ Next backup in {self.interval} seconds...")
                 
                 time.sleep(self.interval)
@@ -220,6 +2551,60 @@ class AutoBackup:
 # Global instance
 backup_manager = AutoBackup()
 
+def main():
+    parser = argparse.ArgumentParser(description='Termux cluster auto-backup')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('run', help='run the automatic backup loop (default)')
+    subparsers.add_parser('list', help='list backup generations')
+    restore_parser = subparsers.add_parser('restore', help='restore files from a backup generation')
+    restore_parser.add_argument('generation')
+    restore_parser.add_argument('paths', nargs='*', help='files or directories inside the backup (default: all)')
+    restore_parser.add_argument('--target', help='output directory (default: ~/restores/<generation>)')
+    restore_parser.add_argument('--workers', type=int, default=0)
+    restore_parser.add_argument('--no-verify', action='store_true')
+    uploads_parser = subparsers.add_parser('uploads', help='show or process the upload queue')
+    uploads_parser.add_argument('--drain', action='store_true', help='upload every due job now')
+    uploads_parser.add_argument('--retry-failed', action='store_true', help='requeue failed uploads')
+    check_parser = subparsers.add_parser('stream-check', help='stream a test archive through rclone rcat and verify it')
+    check_parser.add_argument('--remote', help='rclone remote directory (default: a temp dir, local backend)')
+    args = parser.parse_args()
+    
+    if args.command == 'list':
+        for generation, location in backup_manager.get_restore_engine().list_generations().items():
+            print(f"{generation}\t{location}")
+    elif args.command == 'restore':
+        engine = backup_manager.get_restore_engine()
+        if args.workers:
+            engine.workers = args.workers
+        print(f"♻️  Restoring {args.generation}...")
+        report = engine.restore(args.generation, args.paths, args.target, verify=not args.no_verify)
+        for failure in report['failed']:
+            print(f"❌ {failure['path']}: {failure['error']}")
+        icon = '⚠️ ' if report['failed'] else '✅'
+        print(f"{icon} Restored {report['files']} files ({report['bytes'] / (1024 * 1024):.2f} MB) "
+              f"to {report['target']} in {report['seconds']}s ({report['mb_per_second']} MB/s)")
+        raise SystemExit(1 if report['failed'] else 0)
+    elif args.command == 'stream-check':
+        try:
+            result = backup_manager.check_streaming(args.remote)
+        except (OSError, RuntimeError, ValueError, zipfile.BadZipFile, subprocess.SubprocessError) as e:
+            print(f"❌ Streaming check failed: {e}")
+            raise SystemExit(1)
+        print(f"✅ Streamed and verified {result['files']} files ({result['bytes']} bytes) via {result['remote_path']}")
+    elif args.command == 'uploads':
+        uploads = backup_manager.get_uploads()
+        if args.retry_failed:
+            print(f"🔁 Requeued {uploads.retry_failed()} failed uploads")
+        if args.drain:
+            uploads.drain()
+        status = uploads.status()
+        print(' '.join(f"{state}={count}" for state, count in sorted(status['counts'].items())) or 'empty')
+        for job in status['jobs']:
+            rate = f"{job['mb_per_second']} MB/s" if job['mb_per_second'] is not None else job['last_error'] or ''
+            print(f"{job['id']}\t{job['state']}\t{job['generation']}\t{job['attempts']}\t{rate}")
+    else:
+        print("🔄 Auto-Backup System Starting...")
+        backup_manager.start_auto_backup()
+
 if __name__ == '__main__':
-    print("🔄 Auto-Backup System Starting...")
-    backup_manager.start_auto_backup()
+    main()
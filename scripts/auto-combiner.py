@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
 import os
 import json
+import hashlib
 import psutil
 import requests
-from flask import Flask, jsonify
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from flask import Flask, Response, jsonify, redirect, request
+from gossip import GossipNode
+from jobs import stream_batch, validate as validate_jobs
+from storage import HashRing, is_chunk_hash
+from placement import PlacementEngine
 import threading
+import queue
 import time
 
 app = Flask(__name__)
@@ -14,57 +23,374 @@ class AutoCombiner:
         self.discovered_nodes = []
         self.resource_pool = {}
         self.adaptive_config = {}
-        self.update_interval = 30
+        self.update_interval = float(os.environ.get('HEARTBEAT_INTERVAL', 5))
+        self.probe_timeout = float(os.environ.get('PROBE_TIMEOUT', 1.0))
+        self.suspect_after = int(os.environ.get('SUSPECT_AFTER', 1))  # missed heartbeats
+        self.dead_after = int(os.environ.get('DEAD_AFTER', 3))
+        self.reap_after = float(os.environ.get('REAP_AFTER', 600))  # seconds dead before removal
+        self.seeds = [normalize_address(a) for a in os.environ.get('CLUSTER_SEEDS', '').split(',') if a.strip()]
         
-    def discover_nodes(self):
-        """Discover available nodes and combine resources"""
-        nodes = []
+        # Membership table: address -> member, changed in place by heartbeats and joins
+        self.members = {}
+        self.lock = threading.Lock()
+        self.version = 0
+        self.pool_version = -1
+        
+        # Keep-alive connections to every worker, shared by the probe threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=64, pool_maxsize=64, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=int(os.environ.get('PROBE_WORKERS', 16)))
+        
+        # With GOSSIP_PORT set, membership comes from the gossip protocol instead of polling
+        self.gossip = None
+        if os.environ.get('GOSSIP_PORT'):
+            self.gossip = GossipNode(f"{os.environ.get('NODE_ID', 'main-node')}-combiner",
+                                     int(os.environ['GOSSIP_PORT']),
+                                     advertise=os.environ.get('GOSSIP_ADVERTISE'), meta={'role': 'combiner'},
+                                     period=float(os.environ.get('GOSSIP_PERIOD', 1.0)))
+        
+        # Batch jobs fan out over the compute workers, least loaded first
+        self.inflight = {}  # address -> jobs dispatched by us and not yet returned
+        self.job_attempts = int(os.environ.get('JOB_ATTEMPTS', 3))
+        
+        # Chunks live on STORAGE_REPLICAS workers chosen by a consistent-hash ring of storage nodes
+        self.replicas = int(os.environ.get('STORAGE_REPLICAS', 2))
+        self.write_quorum = int(os.environ.get('STORAGE_WRITE_QUORUM', self.replicas // 2 + 1))
+        self.ring = HashRing()
+        self.ring_version = -1
+        self.reads = {}  # address -> chunk reads we are proxying right now
         
-        # Main node (this container)
+        # Minecraft servers are bin-packed onto nodes; placements stick across rebalances
+        self.placement = PlacementEngine(servers=int(os.environ.get('MC_SERVERS', 3)),
+                                         heap_gb=int(os.environ.get('MC_HEAP_GB', 6)),
+                                         min_heap_gb=int(os.environ.get('MC_MIN_HEAP_GB', 2)),
+                                         reserve_gb=float(os.environ.get('NODE_RESERVE_GB', 1.0)),
+                                         cores_per_server=float(os.environ.get('MC_SERVER_CORES', 1.0)))
+        self.placements = {}  # server id -> node id from the last plan
+        
+        # Versioned status snapshot, rebuilt by the background loop and served to every poller
+        self.snapshot = None  # {'version', 'etag', 'status', 'body'}
+        self.snapshot_cond = threading.Condition()
+        self.snapshot_version = 0
+        self.snapshot_epoch = format(int(time.time()), 'x')  # keeps ETags unique across restarts
+        self.deltas = deque(maxlen=256)  # (version, delta) for long-poll and SSE clients
+        self.ram_step = float(os.environ.get('STATUS_RAM_STEP', 0.25))  # GB change that counts
+        
+    def local_node(self):
+        """This container's own entry"""
         service_type = os.environ.get('SERVICE_TYPE', 'main')
         node_id = os.environ.get('NODE_ID', 'main-node')
         
         if service_type == 'main':
-            nodes.append({
+            return {
                 'id': node_id,
                 'type': 'main',
-                'ram_gb': int(os.environ.get('TOTAL_RAM', 8)),
+                'ram_gb': round(float(os.environ.get('TOTAL_RAM', 0)) or total_ram_gb()),
                 'cpu_cores': os.cpu_count(),
                 'status': 'active',
                 'services': ['web-terminal', 'minecraft', 'storage', 'monitor'],
                 'port': 10000
-            })
-        else:
-            # Worker node
-            nodes.append({
-                'id': node_id,
+            }
+        return {
+            'id': node_id,
+            'type': 'worker',
+            'ram_gb': round(psutil.virtual_memory().available / (1024**3)),  # as workers report it
+            'cpu_cores': os.cpu_count() or 1,
+            'status': 'active',
+            'services': ['compute', 'storage'] + (['minecraft'] if os.environ.get('MC_HOST') == '1' else []),
+            'port': 5000
+        }
+    
+    def probe(self, address):
+        """Fetch a worker's /combine report. Returns (report, rtt_ms)"""
+        started = time.perf_counter()
+        response = self.session.get(f'http://{address}/combine',
+                                    timeout=(self.probe_timeout, self.probe_timeout))
+        response.raise_for_status()
+        return response.json(), round((time.perf_counter() - started) * 1000, 1)
+    
+    def record_alive(self, address, report, rtt_ms):
+        now = time.time()
+        with self.lock:
+            member = self.members.get(address)
+            changed = member is None or member['status'] != 'active'
+            if member is None:
+                member = self.members[address] = {'address': address, 'joined': now}
+                print(f"➕ Node joined: {report.get('node_id', address)} ({address})")
+            resources = {
+                'id': report.get('node_id', address),
                 'type': 'worker',
-                'ram_gb': 2,  # Workers contribute 2GB each
-                'cpu_cores': 1,
-                'status': 'active',
-                'services': ['compute', 'storage'],
-                'port': 5000
-            })
-        
-        # Check for additional nodes via environment
-        additional_nodes = int(os.environ.get('ADDITIONAL_NODES', 0))
-        for i in range(additional_nodes):
-            nodes.append({
-                'id': f'extra-node-{i+1}',
-                'type': 'extra',
-                'ram_gb': 1,
-                'cpu_cores': 1,
-                'status': 'simulated',
-                'services': ['compute'],
-                'port': 5001 + i
-            })
-        
-        self.discovered_nodes = nodes
-        self.calculate_combined_resources()
-        return nodes
+                'ram_gb': round(report.get('available_ram_gb', 0)),  # whole GB, so noise is not a change
+                'cpu_cores': report.get('cpu_cores', 1),
+                'services': report.get('services', []),
+                'port': int(address.rsplit(':', 1)[1])
+            }
+            changed = changed or any(member.get(k) != v for k, v in resources.items())
+            member.update(resources, status='active', missed=0, last_seen=now, rtt_ms=rtt_ms,
+                          load=report.get('load', {}), jobs=report.get('jobs', {}),
+                          storage=report.get('storage', {}))
+            if changed:
+                self.version += 1
+            return dict(member)
+    
+    def record_missed(self, address, error):
+        with self.lock:
+            member = self.members.get(address)
+            if member is None:
+                return
+            member['missed'] += 1
+            status = member['status']
+            if member['missed'] >= self.dead_after:
+                status = 'dead'
+            elif member['missed'] >= self.suspect_after:
+                status = 'suspect'
+            self.set_status(member, status, error)
+    
+    def set_status(self, member, status, error):
+        """Caller holds self.lock"""
+        member['error'] = str(error)
+        if status != member['status']:
+            print(f"{'💀' if status == 'dead' else '⚠️ '} Node {member['id']} is {status}: {error}")
+            member['status'] = status
+            self.version += 1
+    
+    def sync_gossip(self):
+        """Mirror the gossip view of the workers into the membership table (no probes)"""
+        for peer in self.gossip.snapshot():
+            meta = peer['meta']
+            if meta.get('role') != 'worker' or not meta.get('http'):
+                continue
+            address = normalize_address(meta['http'])
+            if peer['status'] == 'alive':
+                self.record_alive(address, meta, None)
+                continue
+            with self.lock:
+                member = self.members.get(address)
+                if member:
+                    self.set_status(member, peer['status'], f"gossip reports {peer['status']}")
+        return self.discover_nodes()
+    
+    def heartbeat(self):
+        """Probe every known member and any seed not yet in the table, concurrently"""
+        with self.lock:
+            now = time.time()
+            for address, member in list(self.members.items()):
+                if member['status'] == 'dead' and now - member['last_seen'] > self.reap_after:
+                    del self.members[address]
+                    self.version += 1
+        if self.gossip:
+            return self.sync_gossip()
+        
+        with self.lock:
+            addresses = list(self.members) + [a for a in self.seeds if a not in self.members]
+        
+        futures = {address: self.executor.submit(self.probe, address) for address in addresses}
+        for address, future in futures.items():
+            try:
+                self.record_alive(address, *future.result())
+            except (requests.RequestException, ValueError) as e:
+                self.record_missed(address, e)
+        return self.discover_nodes()
+    
+    def join(self, address):
+        """Add one node with a single probe. Returns the member or raises"""
+        address = normalize_address(address)
+        return self.record_alive(address, *self.probe(address))
+    
+    def discover_nodes(self):
+        """Current members (this node plus every worker not yet declared dead)"""
+        local = self.local_node()
+        with self.lock:
+            if self.pool_version == self.version and self.discovered_nodes:
+                return self.discovered_nodes
+            workers = [dict(m) for m in self.members.values() if m['status'] != 'dead']
+            self.discovered_nodes = [local] + sorted(workers, key=lambda m: m['id'])
+            self.calculate_combined_resources()
+            self.pool_version = self.version
+            return self.discovered_nodes
+    
+    def compute_workers(self):
+        with self.lock:
+            return {address: dict(m) for address, m in self.members.items()
+                    if m['status'] == 'active' and 'compute' in m.get('services', [])}
+    
+    def job_score(self, address, member, extra=0):
+        """Lower is less loaded: queued jobs per pool slot plus CPU use. Caller holds self.lock"""
+        reported = member.get('jobs') or {}
+        slots = reported.get('workers') or member.get('cpu_cores') or 1
+        # The worker's last reported queue already counts some of our in-flight jobs
+        queued = max(reported.get('pending', 0), self.inflight.get(address, 0)) + extra
+        return queued / slots + (member.get('load') or {}).get('cpu_percent', 0) / 100
+    
+    def plan_jobs(self, batch, exclude=()):
+        """Split jobs over the compute workers' free queue slots, each to the lowest score.
+        
+        Returns (plan {address: jobs}, jobs that found no free slot)
+        """
+        workers = {a: m for a, m in self.compute_workers().items() if a not in exclude}
+        plan, waiting = {}, []
+        with self.lock:
+            extra = dict.fromkeys(workers, 0)
+            for job in batch:
+                free = [a for a, m in workers.items()
+                        if self.inflight.get(a, 0) + extra[a] < (m.get('jobs') or {}).get('capacity', m['cpu_cores'] * 4)]
+                if not free:
+                    waiting.append(job)
+                    continue
+                address = min(free, key=lambda a: self.job_score(a, workers[a], extra[a]))
+                extra[address] += 1
+                plan.setdefault(address, []).append(job)
+        return plan, waiting
+    
+    def dispatch_jobs(self, address, batch, results):
+        """Stream one sub-batch from a worker into results, then report what is left over"""
+        with self.lock:
+            self.inflight[address] = self.inflight.get(address, 0) + len(batch)
+        done, error, retry_after = set(), None, 0
+        try:
+            for line in stream_batch(self.session, f'http://{address}', batch):
+                done.add(line['id'])
+                with self.lock:
+                    self.inflight[address] -= 1
+                results.put(('result', dict(line, address=address)))
+        except requests.HTTPError as e:
+            error = e
+            if e.response is not None and e.response.status_code == 429:
+                retry_after = int(e.response.headers.get('Retry-After', 1))
+        except (requests.RequestException, ValueError) as e:
+            error = e
+        finally:
+            with self.lock:
+                self.inflight[address] -= len(batch) - len(done)
+        results.put(('leftover', address, [job for job in batch if job['id'] not in done], error, retry_after))
+    
+    def run_jobs(self, batch):
+        """Fan a batch out over the workers and yield result lines as they complete.
+        
+        Jobs beyond the workers' free queue slots wait here and go out as slots free up.
+        A worker answering 429 is skipped until its Retry-After passes; jobs lost to
+        connection errors are re-planned up to JOB_ATTEMPTS times. Op failures are
+        returned as they are, not retried.
+        """
+        waiting = [dict(job, id=str(job.get('id', i))) for i, job in enumerate(batch)]
+        results = queue.Queue()
+        attempts = {}
+        backoff = {}  # address -> time it may be used again
+        active = 0
+        
+        def launch():
+            nonlocal active, waiting
+            now = time.time()
+            plan, waiting = self.plan_jobs(waiting, [a for a, until in backoff.items() if until > now])
+            for address, sub_batch in plan.items():
+                active += 1
+                threading.Thread(target=self.dispatch_jobs, args=(address, sub_batch, results), daemon=True).start()
+        
+        def give_up(jobs_left, error):
+            for job in jobs_left:
+                yield {'id': job['id'], 'op': job['op'], 'ok': False, 'error': f'not run: {error}'}
+        
+        launch()
+        while active or waiting:
+            if not active:
+                if not self.compute_workers():
+                    yield from give_up(waiting, 'no compute workers')
+                    return
+                # Everyone is busy or backing off: wait for the first worker to accept work again
+                time.sleep(min(max(min(backoff.values(), default=0) - time.time(), 0.5), 30))
+                launch()
+                continue
+            
+            message = results.get()
+            if message[0] == 'result':
+                yield message[1]
+                continue
+            active -= 1
+            _, address, leftover, error, retry_after = message
+            if retry_after:
+                backoff[address] = time.time() + retry_after
+                waiting.extend(leftover)
+            elif leftover:
+                backoff[address] = time.time() + self.update_interval
+                for job in leftover:
+                    attempts[job['id']] = attempts.get(job['id'], 0) + 1
+                    if attempts[job['id']] >= self.job_attempts:
+                        yield from give_up([job], f"{attempts[job['id']]} attempts, last error: {error}")
+                    else:
+                        waiting.append(job)
+            launch()
+    
+    def storage_nodes(self):
+        with self.lock:
+            return {address: dict(m) for address, m in self.members.items()
+                    if m['status'] == 'active' and 'storage' in m.get('services', [])}
+    
+    def chunk_owners(self, chunk_hash):
+        """The workers a chunk belongs on; the ring is rebuilt only when membership changed"""
+        nodes = self.storage_nodes()
+        with self.lock:
+            if self.ring_version != self.version:
+                for address in self.ring.nodes - set(nodes):
+                    self.ring.remove(address)
+                for address in nodes:
+                    self.ring.add(address)
+                self.ring_version = self.version
+            return self.ring.owners(chunk_hash, self.replicas)
+    
+    def read_order(self, chunk_hash):
+        """Owners sorted by reads in progress, then round-trip time"""
+        owners = self.chunk_owners(chunk_hash)
+        with self.lock:
+            def cost(address):
+                member = self.members.get(address, {})
+                busy = (member.get('storage') or {}).get('reads', 0) + self.reads.get(address, 0)
+                return busy, member.get('rtt_ms') or 0
+            return sorted(owners, key=cost)
+    
+    def put_chunk(self, chunk_hash, data):
+        """Write a chunk to all its owners in parallel. Returns (stored on, errors by address)"""
+        owners = self.chunk_owners(chunk_hash)
+        futures = {a: self.executor.submit(self.session.put, f'http://{a}/chunks/{chunk_hash}', data=data,
+                                           timeout=(self.probe_timeout, 30)) for a in owners}
+        stored, errors = [], {}
+        for address, future in futures.items():
+            try:
+                future.result().raise_for_status()
+                stored.append(address)
+            except requests.RequestException as e:
+                errors[address] = str(e)
+        return stored, errors
+    
+    def get_chunk(self, chunk_hash):
+        """Fetch and verify a chunk from the cheapest replica that has it.
+        
+        Owners found without the chunk (a node that joined after the write) are repaired
+        in the background. Returns (data, address) or (None, None).
+        """
+        missing = []
+        for address in self.read_order(chunk_hash):
+            with self.lock:
+                self.reads[address] = self.reads.get(address, 0) + 1
+            try:
+                response = self.session.get(f'http://{address}/chunks/{chunk_hash}', timeout=(self.probe_timeout, 30))
+            except requests.RequestException:
+                continue
+            finally:
+                with self.lock:
+                    self.reads[address] -= 1
+            if response.status_code == 404:
+                missing.append(address)
+            elif response.ok and hashlib.sha256(response.content).hexdigest() == chunk_hash:
+                for target in missing:
+                    self.executor.submit(self.session.put, f'http://{target}/chunks/{chunk_hash}',
+                                         data=response.content, timeout=(self.probe_timeout, 30))
+                return response.content, address
+        return None, None
     
     def calculate_combined_resources(self):
-        """Calculate total combined resources"""
+        """Calculate total combined resources. Caller holds self.lock"""
         total_ram = 0
         total_cores = 0
         total_nodes = len(self.discovered_nodes)
@@ -84,32 +410,33 @@ class AutoCombiner:
         self.update_adaptive_config()
     
     def update_adaptive_config(self):
-        """Update adaptive configuration based on available resources"""
-        total_ram = self.resource_pool['total_ram_gb']
+        """Update adaptive configuration by packing servers onto the nodes' measured capacity"""
         node_count = self.resource_pool['total_nodes']
+        plan = self.placement.plan(self.discovered_nodes, self.placements)
+        for server_id, move in plan['moves'].items():
+            print(f"🔀 Rebalance: server {server_id} moves {move['from']} -> {move['to']}")
+        self.placements = plan['placements']
+        count, heap = plan['servers'], plan['heap_gb']
+        used_nodes = len(set(plan['placements'].values()))
         
         # Adaptive Minecraft configuration
-        if node_count >= 4:
-            minecraft_config = {
-                'max_servers': 3,
-                'ram_per_server': 6,
-                'strategy': 'high-performance',
-                'recommendation': 'All servers can run simultaneously'
-            }
-        elif node_count >= 2:
-            minecraft_config = {
-                'max_servers': 2,
-                'ram_per_server': 4,
-                'strategy': 'balanced',
-                'recommendation': 'Run 2 servers simultaneously'
-            }
+        if count >= self.placement.servers and heap == self.placement.heap_gb and count > 1:
+            strategy = 'high-performance'
+        elif count > 1:
+            strategy = 'balanced'
+        elif count == 1:
+            strategy = 'single-node'
         else:
-            minecraft_config = {
-                'max_servers': 1,
-                'ram_per_server': 6,
-                'strategy': 'single-node',
-                'recommendation': 'Run one server at a time'
-            }
+            strategy = 'insufficient-resources'
+        minecraft_config = {
+            'max_servers': count,
+            'ram_per_server': heap,
+            'strategy': strategy,
+            'recommendation': f"Run {count} server{'s' if count != 1 else ''} at {heap}GB across "
+                              f"{used_nodes} node{'s' if used_nodes != 1 else ''}" if count else
+                              'Not enough free RAM for a server',
+            'placements': plan['placements']
+        }
         
         self.adaptive_config = {
             'minecraft': minecraft_config,
@@ -122,6 +449,10 @@ class AutoCombiner:
                 'load_balancing': node_count > 1,
                 'resource_pooling': True,
                 'adaptive_alloc': True
+            },
+            'placement': {
+                'moves': plan['moves'],
+                'nodes': plan['nodes']
             }
         }
     
@@ -129,12 +460,18 @@ class AutoCombiner:
         """Get comprehensive cluster status"""
         self.discover_nodes()
         system_ram = psutil.virtual_memory()
+        with self.lock:
+            states = {}
+            for member in self.members.values():
+                states[member['status']] = states.get(member['status'], 0) + 1
         
         return {
             'auto_combining': {
                 'enabled': True,
                 'status': 'active',
                 'discovered_nodes': len(self.discovered_nodes),
+                'membership': states,
+                'seeds': self.seeds,
                 'last_update': time.time()
             },
             'resource_pool': self.resource_pool,
@@ -147,6 +484,55 @@ class AutoCombiner:
             'nodes': self.discovered_nodes
         }
     
+    def refresh_snapshot(self):
+        """Rebuild the cached status; the version only moves when membership or resources change"""
+        status = self.get_cluster_status()
+        with self.snapshot_cond:
+            previous = self.snapshot['status'] if self.snapshot else {}
+            old_metrics = previous.get('system_metrics')
+            if old_metrics and abs(old_metrics['available_ram_gb'] -
+                                   status['system_metrics']['available_ram_gb']) < self.ram_step:
+                status['system_metrics'] = old_metrics  # ignore RAM noise below the step
+            status['auto_combining']['last_update'] = previous.get('auto_combining', {}).get('last_update')
+            delta = status_delta(previous, status)
+            if self.snapshot and not delta:
+                return self.snapshot
+            
+            self.snapshot_version += 1
+            status['auto_combining']['last_update'] = time.time()
+            delta['auto_combining'] = status['auto_combining']
+            self.snapshot = {
+                'version': self.snapshot_version,
+                'etag': f'{self.snapshot_epoch}-{self.snapshot_version}',
+                'status': status,
+                'body': json.dumps(status)
+            }
+            self.deltas.append((self.snapshot_version, delta))
+            self.snapshot_cond.notify_all()
+            return self.snapshot
+    
+    def current_snapshot(self):
+        with self.snapshot_cond:
+            snapshot = self.snapshot
+        return snapshot or self.refresh_snapshot()
+    
+    def changes_since(self, since, timeout):
+        """Wait up to timeout for a version newer than since.
+        
+        Returns None on timeout, {'version', 'delta'} when the missed deltas are still
+        buffered, or {'version', 'status'} with the full snapshot when they are not.
+        """
+        self.current_snapshot()
+        with self.snapshot_cond:
+            if not self.snapshot_cond.wait_for(lambda: self.snapshot_version != since, timeout):
+                return None
+            version = self.snapshot_version
+            missed = [delta for v, delta in self.deltas if v > since]
+            complete = 0 <= since < version and self.deltas and self.deltas[0][0] <= since + 1
+            if not complete:
+                return {'version': version, 'status': self.snapshot['status']}
+        return {'version': version, 'delta': merge_deltas(missed)}
+    
     def auto_scale_services(self):
         """Auto-scale services based on available resources"""
         status = self.get_cluster_status()
@@ -158,6 +544,58 @@ class AutoCombiner:
         print(f"⚡ Strategy: {status['adaptive_config']['minecraft']['strategy']}")
         print(f"💡 {status['adaptive_config']['minecraft']['recommendation']}")
 
+def total_ram_gb():
+    """RAM this container may use: physical memory, capped by a cgroup limit if there is one.
+    Total rather than available, since this node's own Minecraft servers use it up"""
+    total = psutil.virtual_memory().total
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                limit = f.read().strip()
+        except OSError:
+            continue
+        if limit.isdigit():
+            total = min(total, int(limit))
+        break
+    return total / (1024**3)
+
+def normalize_address(address):
+    """'http://host:port/' or 'host' -> 'host:port'"""
+    address = address.strip().split('://', 1)[-1].rstrip('/')
+    return address if ':' in address else f'{address}:5000'
+
+def status_delta(old, new):
+    """Top-level sections that differ between two status dicts, with nodes diffed by id"""
+    delta = {key: value for key, value in new.items() if key != 'nodes' and old.get(key) != value}
+    old_nodes = {node['id']: node for node in old.get('nodes', [])}
+    new_nodes = {node['id']: node for node in new.get('nodes', [])}
+    changed = [node for node_id, node in new_nodes.items() if old_nodes.get(node_id) != node]
+    removed = [node_id for node_id in old_nodes if node_id not in new_nodes]
+    if changed:
+        delta['nodes_changed'] = changed
+    if removed:
+        delta['nodes_removed'] = removed
+    return delta
+
+def merge_deltas(deltas):
+    """Fold consecutive deltas into one, later values winning"""
+    merged, nodes, removed = {}, {}, set()
+    for delta in deltas:
+        for key, value in delta.items():
+            if key not in ('nodes_changed', 'nodes_removed'):
+                merged[key] = value
+        for node in delta.get('nodes_changed', []):
+            nodes[node['id']] = node
+            removed.discard(node['id'])
+        for node_id in delta.get('nodes_removed', []):
+            nodes.pop(node_id, None)
+            removed.add(node_id)
+    if nodes:
+        merged['nodes_changed'] = list(nodes.values())
+    if removed:
+        merged['nodes_removed'] = sorted(removed)
+    return merged
+
 # Global instance
 combiner = AutoCombiner()
 
@@ -169,22 +607,145 @@ def home():
         "status": "active"
     })
 
+def conditional_json(body, etag):
+    """JSON response with an ETag; answers 304 when the client's If-None-Match matches"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/cluster/status')
 def cluster_status():
-    return jsonify(combiner.get_cluster_status())
+    snapshot = combiner.current_snapshot()
+    return conditional_json(snapshot['body'], snapshot['etag'])
+
+@app.route('/cluster/changes')
+def cluster_changes():
+    """Long-poll: ?since=<version>&timeout=<seconds>. 204 when nothing changed in time"""
+    since = request.args.get('since', -1, type=int)
+    timeout = min(max(request.args.get('timeout', 30, type=float), 0), 120)
+    result = combiner.changes_since(since, timeout)
+    if result is None:
+        return '', 204
+    return jsonify(result)
+
+@app.route('/cluster/events')
+def cluster_events():
+    """Server-Sent Events: the full status once, then a delta event per change"""
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    
+    def stream():
+        since = -1 if last_id is None else last_id
+        while True:
+            result = combiner.changes_since(since, 15)
+            if result is None:
+                yield ': keepalive\n\n'
+                continue
+            since = result['version']
+            event = 'delta' if 'delta' in result else 'status'
+            yield f"id: {since}\nevent: {event}\ndata: {json.dumps(result[event])}\n\n"
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/nodes/discover')
 def discover_nodes():
-    nodes = combiner.discover_nodes()
+    nodes = combiner.heartbeat()
+    combiner.refresh_snapshot()
     return jsonify({
         'discovered_nodes': nodes,
         'total_count': len(nodes),
         'resource_pool': combiner.resource_pool
     })
 
+@app.route('/nodes/join', methods=['POST'])
+def join_node():
+    """Add a worker to the membership table: {"address": "host:port"}"""
+    data = request.get_json(silent=True) or {}
+    if not data.get('address'):
+        return jsonify({'success': False, 'error': 'address is required'}), 400
+    try:
+        member = combiner.join(data['address'])
+    except (requests.RequestException, ValueError) as e:
+        return jsonify({'success': False, 'error': f'probe failed: {e}'}), 502
+    combiner.refresh_snapshot()
+    return jsonify({'success': True, 'node': member, 'resource_pool': combiner.resource_pool})
+
 @app.route('/resources/adaptive')
 def adaptive_resources():
-    return jsonify(combiner.adaptive_config)
+    snapshot = combiner.current_snapshot()
+    return conditional_json(json.dumps(snapshot['status']['adaptive_config']), snapshot['etag'])
+
+@app.route('/jobs/batch', methods=['POST'])
+def run_jobs():
+    """Run {"jobs": [{"op", "args", "id"?}]} across the workers; results stream back as NDJSON"""
+    data = request.get_json(silent=True) or {}
+    try:
+        validate_jobs(data.get('jobs'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not combiner.compute_workers():
+        return jsonify({'error': 'no compute workers available'}), 503
+    lines = (json.dumps(line) + '\n' for line in combiner.run_jobs(data['jobs']))
+    return Response(lines, mimetype='application/x-ndjson')
+
+@app.route('/jobs/workers')
+def job_workers():
+    """Compute workers in scheduling order"""
+    workers = combiner.compute_workers()
+    with combiner.lock:
+        rows = [{'address': a, 'id': m['id'], 'score': round(combiner.job_score(a, m), 3),
+                 'inflight': combiner.inflight.get(a, 0), 'jobs': m.get('jobs', {}), 'load': m.get('load', {})}
+                for a, m in workers.items()]
+    return jsonify({'workers': sorted(rows, key=lambda row: row['score'])})
+
+@app.route('/storage/chunks/<chunk_hash>', methods=['PUT'])
+def storage_put(chunk_hash):
+    """Store a chunk on its replicas; 201 once the write quorum has it"""
+    data = request.get_data()
+    if not is_chunk_hash(chunk_hash) or hashlib.sha256(data).hexdigest() != chunk_hash:
+        return jsonify({'error': 'chunk name must be the sha256 of the body'}), 400
+    stored, errors = combiner.put_chunk(chunk_hash, data)
+    needed = min(combiner.write_quorum, len(stored) + len(errors))
+    body = {'hash': chunk_hash, 'replicas': stored, 'errors': errors}
+    return jsonify(body), 201 if stored and len(stored) >= needed else 503
+
+@app.route('/storage/chunks/<chunk_hash>')
+def storage_get(chunk_hash):
+    """Chunk bytes from the least-busy replica (?redirect=1 sends the client there instead)"""
+    if not is_chunk_hash(chunk_hash):
+        return jsonify({'error': 'chunk name must be a lowercase sha256'}), 400
+    if request.args.get('redirect') in ('1', 'true'):
+        order = combiner.read_order(chunk_hash)
+        if not order:
+            return jsonify({'error': 'no storage nodes'}), 503
+        return redirect(f'http://{order[0]}/chunks/{chunk_hash}', code=307)
+    data, address = combiner.get_chunk(chunk_hash)
+    if data is None:
+        return jsonify({'error': 'chunk not found on any replica'}), 404
+    response = Response(data, mimetype='application/octet-stream')
+    response.set_etag(chunk_hash)
+    response.headers['X-Replica'] = address
+    return response
+
+@app.route('/storage/locate/<chunk_hash>')
+def storage_locate(chunk_hash):
+    """Replica URLs in preferred read order, for clients that read directly and in parallel"""
+    if not is_chunk_hash(chunk_hash):
+        return jsonify({'error': 'chunk name must be a lowercase sha256'}), 400
+    order = combiner.read_order(chunk_hash)
+    return jsonify({'hash': chunk_hash, 'replicas': [f'http://{a}/chunks/{chunk_hash}' for a in order]})
+
+@app.route('/storage')
+def storage_status():
+    nodes = combiner.storage_nodes()
+    return jsonify({
+        'replicas': combiner.replicas,
+        'write_quorum': combiner.write_quorum,
+        'nodes': {a: dict(m.get('storage', {}), id=m['id']) for a, m in nodes.items()},
+        'total_bytes': sum(m.get('storage', {}).get('bytes', 0) for m in nodes.values()),
+        'free_bytes': sum(m.get('storage', {}).get('free_bytes', 0) for m in nodes.values())
+    })
 
 @app.route('/auto-scale')
 def auto_scale():
@@ -195,16 +756,21 @@ def auto_scale():
     })
 
 def background_discovery():
-    """Background node discovery"""
+    """Background heartbeats against every member and seed, then a snapshot rebuild"""
     while True:
         try:
-            combiner.discover_nodes()
+            combiner.heartbeat()
+            combiner.refresh_snapshot()
             time.sleep(combiner.update_interval)
         except Exception as e:
             print(f"Background discovery error: {e}")
             time.sleep(60)
 
 if __name__ == '__main__':
+    if combiner.gossip:
+        combiner.gossip.start([s for s in os.environ.get('GOSSIP_SEEDS', '').split(',') if s.strip()])
+        print(f"🗣️  Membership via gossip on UDP port {combiner.gossip.addr[1]}")
+    
     # Start background discovery
     discovery_thread = threading.Thread(target=background_discovery, daemon=True)
     discovery_thread.start()
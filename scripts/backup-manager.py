@@ -1,14 +1,43 @@
 #!/usr/bin/env python3
 from flask import Flask, jsonify, request
 import threading
+import importlib.util
+import sys
 import time
+import itertools
 import datetime
-import os
+import shutil
+import subprocess
 from pathlib import Path
+from collections import deque
 
 app = Flask(__name__)
 
+_auto_backup = None
+
+# Restores may only write below these directories
+RESTORE_ROOTS = [Path('~/restores').expanduser(), Path('~/minecraft/servers').expanduser()]
+
+def restore_target_allowed(target):
+    """True if target, with symlinks and '..' resolved, lies inside one of RESTORE_ROOTS"""
+    real = Path(target).expanduser().resolve()
+    return any(real == root.resolve() or root.resolve() in real.parents for root in RESTORE_ROOTS)
+
+def load_auto_backup():
+    """Load auto-backup.py as a module (its hyphenated file name cannot be imported)"""
+    global _auto_backup
+    if _auto_backup is None:
+        spec = importlib.util.spec_from_file_location('auto_backup', Path(__file__).with_name('auto-backup.py'))
+        module = importlib.util.module_from_spec(spec)
+        # Registered so compression pool workers can unpickle its functions
+        sys.modules['auto_backup'] = module
+        spec.loader.exec_module(module)
+        _auto_backup = module
+    return _auto_backup
+
 class BackupManager:
+    CHECK_TTL = 60  # seconds between re-running the setup checks
+    
     def __init__(self):
         self.backup_dir = Path('~/backups').expanduser()
         self.status = {
@@ -16,20 +45,210 @@ class BackupManager:
             'backup_count': 0,
             'enabled': True
         }
+        self.cache_lock = threading.Lock()
+        self.info_cache = (None, None)  # (catalog version, info)
+        self.checks_cache = (0, None)  # (expires, checks)
+    
+    def get_catalog(self):
+        return load_auto_backup().backup_manager.get_catalog()
     
     def get_backup_info(self):
-        """Get information about backups"""
-        backups = list(self.backup_dir.glob('cluster_backup_*.zip'))
-        minecraft_backups = list((self.backup_dir / 'minecraft').glob('*.zip'))
+        """Get information about backups (recomputed only when the catalog changes)"""
+        catalog = self.get_catalog()
+        version = catalog.version()
+        with self.cache_lock:
+            if self.info_cache[0] == version:
+                return self.info_cache[1]
         
+        summary = catalog.summary()
+        cluster = summary.get('cluster', {})
+        minecraft = summary.get('minecraft', {})
+        info = {
+            'total_backups': cluster.get('count', 0),
+            'total_minecraft_backups': minecraft.get('count', 0),
+            'backup_files': cluster.get('latest', []),
+            'minecraft_backups': minecraft.get('latest', []),
+            'stored_bytes': sum(kind['stored_bytes'] for kind in summary.values()),
+            'not_uploaded': sum(kind['not_uploaded'] for kind in summary.values()),
+            'last_backup': max((kind['last_created'] for kind in summary.values()), default=None)
+        }
+        with self.cache_lock:
+            self.info_cache = (version, info)
+        return info
+    
+    def setup_checks(self, refresh=False):
+        """Environment checks, cached for CHECK_TTL seconds"""
+        with self.cache_lock:
+            expires, checks = self.checks_cache
+            if checks is not None and not refresh and time.time() < expires:
+                return checks
+        
+        rclone = shutil.which('rclone')
+        gdrive_configured = False
+        if rclone:
+            try:
+                result = subprocess.run([rclone, 'listremotes'], capture_output=True, text=True, timeout=10)
+                gdrive_configured = result.returncode == 0 and 'gdrive' in result.stdout
+            except (OSError, subprocess.SubprocessError):
+                pass
+        checks = {
+            'backup_directory': self.backup_dir.is_dir(),
+            'rclone_installed': rclone is not None,
+            'gdrive_configured': gdrive_configured,
+            'auto_backup_running': True  # Assuming it's running if we can reach this
+        }
+        with self.cache_lock:
+            self.checks_cache = (time.time() + self.CHECK_TTL, checks)
+        return checks
+
+PRIORITIES = {'low': 0, 'normal': 1, 'high': 2}
+BACKUP_KINDS = ('cluster', 'minecraft')
+
+class BackupJob:
+    def __init__(self, job_id, kinds, priority):
+        self.id = job_id
+        self.kinds = set(kinds)
+        self.priority = priority
+        self.state = 'queued'
+        self.triggers = 1
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.progress = None
+        self.cancel_event = threading.Event()
+    
+    def to_dict(self):
         return {
-            'total_backups': len(backups),
-            'total_minecraft_backups': len(minecraft_backups),
-            'backup_files': [b.name for b in sorted(backups, reverse=True)[:5]],
-            'minecraft_backups': [b.name for b in sorted(minecraft_backups, reverse=True)[:5]]
+            'id': self.id,
+            'kinds': sorted(self.kinds),
+            'priority': self.priority,
+            'state': self.state,
+            'triggers': self.triggers,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'error': self.error,
+            'progress': self.progress
         }
 
+class BackupScheduler:
+    """Single-flight backup queue: one job runs at a time and overlapping triggers merge"""
+    
+    def __init__(self, manager):
+        self.manager = manager
+        self.condition = threading.Condition()
+        self.queue = []
+        self.current = None
+        self.history = deque(maxlen=20)
+        self.ids = itertools.count(1)
+        self.thread = None
+    
+    def submit(self, kinds=BACKUP_KINDS, priority='normal'):
+        """Queue a backup, merging it into a running or queued job that covers it.
+        Returns (job, merged)"""
+        kinds = set(kinds)
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            
+            current = self.current
+            if current and kinds <= current.kinds and not current.cancel_event.is_set():
+                current.triggers += 1
+                return current, True
+            
+            for job in self.queue:
+                if job.kinds & kinds:
+                    job.kinds |= kinds
+                    job.triggers += 1
+                    if PRIORITIES[priority] > PRIORITIES[job.priority]:
+                        job.priority = priority
+                    return job, True
+            
+            job = BackupJob(next(self.ids), kinds, priority)
+            self.queue.append(job)
+            self.condition.notify()
+            return job, False
+    
+    def cancel(self, job_id=None):
+        """Cancel a queued job or the running one (job_id None = running job)"""
+        with self.condition:
+            for job in list(self.queue):
+                if job.id == job_id:
+                    self.queue.remove(job)
+                    job.state = 'cancelled'
+                    job.finished = time.time()
+                    self.history.appendleft(job)
+                    return job
+            if self.current and job_id in (None, self.current.id):
+                self.current.cancel_event.set()
+                return self.current
+        return None
+    
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                self.queue.sort(key=lambda job: (-PRIORITIES[job.priority], job.created))
+                job = self.current = self.queue.pop(0)
+                job.state = 'waiting'
+            
+            try:
+                self.run_job(job)
+            finally:
+                with self.condition:
+                    job.finished = time.time()
+                    self.history.appendleft(job)
+                    self.current = None
+    
+    def run_job(self, job):
+        engine = load_auto_backup()
+        backup = engine.backup_manager
+        
+        # Wait for the 5-minute loop in auto-backup.py if it is mid-run
+        if not backup.lock.acquire(blocking=True, cancel_event=job.cancel_event):
+            job.state = 'cancelled'
+            return
+        
+        job.state = 'running'
+        job.started = time.time()
+        backup.cancel_event = job.cancel_event
+        backup.get_uploads().start()
+        try:
+            backup.run_full_backup(
+                kinds=[kind for kind in BACKUP_KINDS if kind in job.kinds],
+                throttled=job.priority != 'high'
+            )
+            job.state = 'done'
+            self.manager.status['last_backup'] = datetime.datetime.now().isoformat()
+            self.manager.status['backup_count'] += 1
+        except engine.BackupCancelled:
+            job.state = 'cancelled'
+            print(f"🛑 Backup job {job.id} cancelled")
+        except Exception as e:
+            job.state = 'failed'
+            job.error = str(e)
+            print(f"Manual backup error: {e}")
+        finally:
+            job.progress = backup.progress.snapshot()
+            backup.lock.release()
+    
+    def status(self):
+        with self.condition:
+            current = self.current
+            status = {
+                'job': current.to_dict() if current else None,
+                'queue': [job.to_dict() for job in self.queue],
+                'last_job': self.history[0].to_dict() if self.history else None
+            }
+        if current and current.state == 'running':
+            status['job']['progress'] = load_auto_backup().backup_manager.progress.snapshot()
+        return status
+
 backup_mgr = BackupManager()
+scheduler = BackupScheduler(backup_mgr)
 
 @app.route('/backup/status')
 def backup_status():
@@ -40,49 +259,117 @@ def backup_status():
         'auto_backup': 'running',
         'interval': '5 minutes',
         'backup_info': info,
+        'jobs': scheduler.status(),
         'timestamp': datetime.datetime.now().isoformat()
     })
 
 @app.route('/backup/now', methods=['POST'])
 def backup_now():
-    """Trigger immediate backup"""
-    def run_backup():
-        try:
-            # Import and run backup
-            from auto_backup import AutoBackup
-            backup_system = AutoBackup()
-            backup_system.create_backup_zip()
-            backup_system.backup_minecraft_worlds()
-            backup_mgr.status['last_backup'] = datetime.datetime.now().isoformat()
-            backup_mgr.status['backup_count'] += 1
-        except Exception as e:
-            print(f"Manual backup error: {e}")
+    """Trigger immediate backup (merged with any backup already pending)"""
+    data = request.get_json(silent=True) or {}
+    kinds = data.get('kinds', list(BACKUP_KINDS))
+    priority = data.get('priority', 'normal')
+    if priority not in PRIORITIES or not kinds or not set(kinds) <= set(BACKUP_KINDS):
+        return jsonify({'success': False, 'error': 'invalid kinds or priority'}), 400
     
-    thread = threading.Thread(target=run_backup)
-    thread.daemon = True
-    thread.start()
+    job, merged = scheduler.submit(kinds, priority)
     
     return jsonify({
         'success': True,
-        'message': 'Manual backup started',
+        'message': 'Merged into existing backup job' if merged else 'Manual backup started',
+        'job': job.to_dict(),
         'timestamp': datetime.datetime.now().isoformat()
     })
 
+@app.route('/backup/cancel', methods=['POST'])
+def backup_cancel():
+    """Cancel the running backup job, or a queued one by id"""
+    data = request.get_json(silent=True) or {}
+    job = scheduler.cancel(data.get('job_id'))
+    if job is None:
+        return jsonify({'success': False, 'error': 'No matching backup job'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/backup/jobs')
+def backup_jobs():
+    """Running and queued backup jobs plus recent history"""
+    status = scheduler.status()
+    with scheduler.condition:
+        status['history'] = [job.to_dict() for job in scheduler.history]
+    return jsonify(status)
+
 @app.route('/backup/list')
 def backup_list():
-    """List all backups"""
-    info = backup_mgr.get_backup_info()
-    return jsonify(info)
+    """List backup generations from the catalog, newest first
+    
+    Query: limit (default 50, max 500), offset, kind, format, upload_state
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit and offset must be integers'}), 400
+    
+    total, generations = backup_mgr.get_catalog().query(
+        kind=request.args.get('kind'), format=request.args.get('format'),
+        upload_state=request.args.get('upload_state'), limit=limit, offset=offset)
+    return jsonify({
+        **backup_mgr.get_backup_info(),
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'generations': generations
+    })
+
+@app.route('/backup/uploads')
+def backup_uploads():
+    """Upload queue state and per-upload throughput"""
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify(load_auto_backup().backup_manager.get_uploads().status(limit=min(max(limit, 1), 500)))
+
+@app.route('/backup/uploads/retry', methods=['POST'])
+def backup_uploads_retry():
+    """Requeue uploads that exhausted their retries"""
+    uploads = load_auto_backup().backup_manager.get_uploads()
+    requeued = uploads.retry_failed()
+    uploads.start()
+    return jsonify({'success': True, 'requeued': requeued})
+
+@app.route('/backup/restore', methods=['POST'])
+def backup_restore():
+    """Restore files or directories from a backup generation"""
+    data = request.get_json(silent=True) or {}
+    if 'generation' not in data:
+        return jsonify({'success': False, 'error': 'generation is required'}), 400
+    if data.get('target') and not restore_target_allowed(data['target']):
+        return jsonify({'success': False, 'error': 'target must be inside one of: ' +
+                        ', '.join(str(root) for root in RESTORE_ROOTS)}), 400
+    
+    auto_backup = load_auto_backup()
+    backup = auto_backup.backup_manager
+    # Own lock handle on the shared lock file: a restore never runs alongside a backup
+    lock = auto_backup.BackupLock(backup.lock.path)
+    if not lock.acquire():
+        return jsonify({'success': False, 'error': 'a backup is running, try again when it has finished',
+                        'holder_pid': lock.holder()}), 409
+    try:
+        report = backup.get_restore_engine().restore(data['generation'], data.get('paths'), data.get('target'),
+                                                     verify=data.get('verify', True))
+    except KeyError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    finally:
+        lock.release()
+    
+    return jsonify({
+        'success': not report['failed'],
+        'report': report,
+        'timestamp': datetime.datetime.now().isoformat()
+    })
 
 @app.route('/backup/setup-check')
 def setup_check():
-    """Check if backup system is properly set up"""
-    checks = {
-        'backup_directory': os.path.exists(Path('~/backups').expanduser()),
-        'rclone_installed': os.system('which rclone > /dev/null') == 0,
-        'gdrive_configured': os.system('rclone listremotes | grep -q gdrive') == 0,
-        'auto_backup_running': True  # Assuming it's running if we can reach this
-    }
+    """Check if backup system is properly set up (?refresh=1 bypasses the cache)"""
+    checks = backup_mgr.setup_checks(refresh=request.args.get('refresh') == '1')
     
     return jsonify({
         'checks': checks,
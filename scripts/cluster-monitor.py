@@ -8,6 +8,17 @@ class ClusterMonitor:
     def __init__(self):
         self.combiner_url = "http://localhost:5001"
         self.minecraft_url = "http://localhost:5002"
+        self.cluster_status = None
+        self.cluster_etag = None
+        
+    def get_cluster_status(self):
+        """Cluster status, re-downloaded only when the combiner's ETag changed"""
+        headers = {'If-None-Match': self.cluster_etag} if self.cluster_etag else {}
+        response = requests.get(f"{self.combiner_url}/cluster/status", headers=headers, timeout=10)
+        if response.status_code != 304:
+            self.cluster_status = response.json()
+            self.cluster_etag = response.headers.get('ETag')
+        return self.cluster_status
         
     def get_system_stats(self):
         """Get system statistics"""
@@ -37,7 +48,7 @@ class ClusterMonitor:
         while True:
             try:
                 # Get cluster status
-                cluster_status = requests.get(f"{self.combiner_url}/cluster/status").json()
+                cluster_status = self.get_cluster_status()
                 minecraft_status = requests.get(f"{self.minecraft_url}/minecraft/status").json()
                 system_stats = self.get_system_stats()
                 
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Local multi-process simulation of the gossip membership protocol.
+
+Starts N gossip nodes spread over several processes on localhost and reports
+join convergence time, crash detection time, the false-positive rate (live
+nodes wrongly suspected or declared dead) and per-node traffic.
+
+    python3 gossip-sim.py --nodes 200 --processes 8 --period 0.2 --loss 0.05
+"""
+import argparse
+import json
+import random
+import time
+import multiprocessing as mp
+from gossip import GossipNode, ALIVE, DEAD
+
+def host_nodes(ids, base_port, options, conn):
+    """Run a slice of the simulated cluster and answer the coordinator's queries"""
+    nodes = {i: GossipNode(f'node-{i}', base_port + i, host='127.0.0.1', **options) for i in ids}
+    for node in nodes.values():
+        node.start([('127.0.0.1', base_port)])
+
+    while True:
+        command, arg = conn.recv()
+        if command == 'view':
+            alive_ids, dead_ids = arg
+            converged = 0
+            for node in nodes.values():
+                if not node.running:
+                    continue
+                view = {m['id']: m['status'] for m in node.snapshot()}
+                converged += all(view.get(m) == ALIVE for m in alive_ids if m != node.id) and \
+                    all(view.get(m) == DEAD for m in dead_ids)
+            conn.send(converged)
+        elif command == 'kill':
+            for i in arg:
+                nodes[i].stop()
+            conn.send(True)
+        elif command == 'stats':
+            conn.send([dict(node.stats) for node in nodes.values() if node.running])
+        elif command == 'exit':
+            for node in nodes.values():
+                if node.running:
+                    node.stop()
+            conn.send(True)
+            return
+
+class Simulation:
+    def __init__(self, args):
+        self.args = args
+        self.pipes = []
+        self.processes = []
+        self.owner = {}  # node index -> pipe
+        options = {'period': args.period, 'loss': args.loss}
+
+        for p in range(args.processes):
+            ids = list(range(p, args.nodes, args.processes))
+            parent, child = mp.Pipe()
+            process = mp.Process(target=host_nodes, args=(ids, args.base_port, options, child), daemon=True)
+            process.start()
+            self.pipes.append(parent)
+            self.processes.append(process)
+            for i in ids:
+                self.owner[i] = parent
+
+    def ask(self, command, arg=None, pipes=None):
+        pipes = pipes or self.pipes
+        for pipe in pipes:
+            pipe.send((command, arg))
+        return [pipe.recv() for pipe in pipes]
+
+    def wait_converged(self, alive, dead, timeout):
+        """Seconds until every live node sees alive as alive and dead as dead (None on timeout)"""
+        started = time.time()
+        alive_ids = [f'node-{i}' for i in alive]
+        dead_ids = [f'node-{i}' for i in dead]
+        while time.time() - started < timeout:
+            if sum(self.ask('view', (alive_ids, dead_ids))) == len(alive):
+                return round(time.time() - started, 2)
+            time.sleep(self.args.period / 2)
+        return None
+
+    def totals(self):
+        totals = {}
+        for stats in self.ask('stats'):
+            for node_stats in stats:
+                for key, value in node_stats.items():
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def run(self):
+        args = self.args
+        everyone = list(range(args.nodes))
+        report = {'nodes': args.nodes, 'processes': args.processes, 'period': args.period, 'loss': args.loss}
+
+        report['join_convergence_seconds'] = self.wait_converged(everyone, [], args.timeout)
+
+        # Steady state: nobody fails, so every suspicion or death is a false positive
+        before = self.totals()
+        time.sleep(args.steady)
+        after = self.totals()
+        steady = {key: after.get(key, 0) - before.get(key, 0) for key in after}
+        pings = max(steady.get('pings', 0), 1)
+        report['false_suspicion_rate'] = round(steady.get('suspicions', 0) / pings, 5)
+        report['false_positive_rate'] = round(steady.get('deaths', 0) / pings, 5)
+        report['refutes'] = steady.get('refutes', 0)
+        report['per_node_messages_per_second'] = round(steady['messages_sent'] / args.nodes / args.steady, 2)
+        report['per_node_bytes_per_second'] = round(steady['bytes_sent'] / args.nodes / args.steady, 1)
+
+        # Crash some nodes and time how long the rest take to declare them dead
+        killed = random.sample(everyone[1:], min(args.kill, args.nodes - 2))
+        by_pipe = {}
+        for i in killed:
+            by_pipe.setdefault(self.owner[i], []).append(i)
+        for pipe, ids in by_pipe.items():
+            self.ask('kill', ids, [pipe])
+        survivors = [i for i in everyone if i not in killed]
+        report['killed'] = len(killed)
+        report['failure_detection_seconds'] = self.wait_converged(survivors, killed, args.timeout)
+
+        self.ask('exit')
+        for process in self.processes:
+            process.join(timeout=5)
+        return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate gossip membership on localhost')
+    parser.add_argument('--nodes', type=int, default=50)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--period', type=float, default=0.2, help='protocol period in seconds')
+    parser.add_argument('--loss', type=float, default=0.0, help='share of datagrams to drop')
+    parser.add_argument('--steady', type=float, default=10, help='seconds of failure-free running')
+    parser.add_argument('--kill', type=int, default=3, help='nodes to crash')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--base-port', type=int, default=17000)
+    args = parser.parse_args()
+
+    print(f"🧪 Simulating {args.nodes} gossip nodes in {args.processes} processes...")
+    print(json.dumps(Simulation(args).run(), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""SWIM-style gossip membership over UDP, shared by worker.py and auto-combiner.py.
+
+Every protocol period a node pings one member (round-robin over a shuffled
+list). If no ack arrives it asks a few random members to ping the target on
+its behalf (ping-req). Members that stay silent become suspect, and dead once
+the suspicion times out unless they refute it with a higher incarnation
+number. Membership changes ride piggybacked on the ping/ack traffic, so a
+node's network and CPU cost per period stays constant however large the
+cluster grows.
+"""
+import json
+import math
+import random
+import socket
+import threading
+import time
+
+ALIVE, SUSPECT, DEAD = 'alive', 'suspect', 'dead'
+MAX_DATAGRAM = 60000
+SYNC_BATCH = 40  # member records per sync datagram
+
+def parse_address(address, default_port=7946):
+    """'host:port' or ('host', port) -> ('host', port)"""
+    if isinstance(address, (tuple, list)):
+        return address[0], int(address[1])
+    host, _, port = address.strip().rpartition(':')
+    return (host, int(port)) if host else (address.strip(), default_port)
+
+class GossipNode:
+    def __init__(self, node_id, port=7946, host='0.0.0.0', advertise=None, meta=None,
+                 period=1.0, ping_timeout=None, indirect_probes=3, suspicion_mult=4,
+                 retransmit_mult=3, max_updates=16, sync_every=30, dead_retention=300, loss=0.0):
+        self.id = node_id
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.5)
+        bound_port = self.sock.getsockname()[1]
+        self.addr = parse_address(advertise) if advertise else \
+            (host if host != '0.0.0.0' else '127.0.0.1', bound_port)
+        self.incarnation = 0
+        self.meta = meta or {}
+        self.period = period
+        self.ping_timeout = ping_timeout or period * 0.3
+        self.indirect_probes = indirect_probes
+        self.suspicion_mult = suspicion_mult
+        self.retransmit_mult = retransmit_mult
+        self.max_updates = max_updates
+        self.sync_every = sync_every
+        self.dead_retention = dead_retention
+        self.loss = loss  # drop this share of outgoing datagrams (simulation only)
+
+        self.members = {}  # id -> {'addr', 'inc', 'status', 'meta', 'since'}
+        self.updates = {}  # id -> [record, transmissions left]
+        self.pending = {}  # seq -> Event for our own pings
+        self.forwards = {}  # seq -> (requester addr, requester seq) for ping-req
+        self.seq = 0
+        self.probe_order = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.threads = []
+        self.on_change = None  # callback(member_id, status, record)
+        self.stats = {'messages_sent': 0, 'bytes_sent': 0, 'pings': 0, 'ping_reqs': 0,
+                      'suspicions': 0, 'deaths': 0, 'refutes': 0}
+
+    # Membership state
+
+    def record(self):
+        return {'id': self.id, 'addr': list(self.addr), 'inc': self.incarnation,
+                'status': ALIVE, 'meta': self.meta}
+
+    def queue_update(self, record):
+        limit = self.retransmit_mult * max(1, math.ceil(math.log2(len(self.members) + 2)))
+        self.updates[record['id']] = [record, limit]
+
+    def apply(self, record, gossip=True):
+        """Merge one membership record using SWIM precedence rules. Caller holds the lock"""
+        member_id, inc, status = record['id'], record['inc'], record['status']
+        if member_id == self.id:
+            if status != ALIVE and inc >= self.incarnation:
+                # Someone thinks we are suspect or dead: refute with a newer incarnation
+                self.incarnation = inc + 1
+                self.stats['refutes'] += 1
+                self.queue_update(self.record())
+            return
+
+        current = self.members.get(member_id)
+        if current is not None and status == ALIVE and inc == current['inc'] and \
+                record.get('meta') and not current['meta']:
+            current['meta'] = record['meta']  # first full record after an implicit add
+            return
+        if current is None:
+            accept = True
+        elif status == ALIVE:
+            accept = inc > current['inc']
+        elif status == SUSPECT:
+            accept = (current['status'] == ALIVE and inc >= current['inc']) or \
+                (current['status'] == SUSPECT and inc > current['inc'])
+        else:
+            accept = current['status'] != DEAD and inc >= current['inc']
+        if not accept:
+            return
+
+        previous = current['status'] if current else None
+        meta = record.get('meta')
+        if meta is None and current:
+            meta = current['meta']
+        self.members[member_id] = {'addr': tuple(record['addr']), 'inc': inc, 'status': status,
+                                   'meta': meta or {}, 'since': time.time()}
+        if gossip:
+            self.queue_update(dict(record, meta=meta or {}) if status == ALIVE else
+                              {'id': member_id, 'addr': record['addr'], 'inc': inc, 'status': status})
+        if status != previous and self.on_change:
+            self.on_change(member_id, status, self.members[member_id])
+
+    def update_meta(self, meta):
+        """Publish new metadata (for example current resources) to the cluster"""
+        with self.lock:
+            self.meta = meta
+            self.incarnation += 1
+            self.queue_update(self.record())
+
+    def snapshot(self):
+        """[{'id', 'addr', 'inc', 'status', 'meta'}] for every known member except this one"""
+        with self.lock:
+            return [{'id': member_id, 'addr': list(m['addr']), 'inc': m['inc'], 'status': m['status'],
+                     'meta': m['meta']} for member_id, m in self.members.items()]
+
+    # Network
+
+    def piggyback(self):
+        """Take the updates that have been gossiped least so far. Caller holds the lock"""
+        chosen = sorted(self.updates.items(), key=lambda item: -item[1][1])[:self.max_updates]
+        records = []
+        for member_id, entry in chosen:
+            records.append(entry[0])
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self.updates[member_id]
+        return records
+
+    def send(self, addr, message, piggyback=True):
+        with self.lock:
+            message['from'] = self.id
+            message['inc'] = self.incarnation
+            message['addr'] = list(self.addr)
+            if piggyback:
+                message['updates'] = self.piggyback()
+        data = json.dumps(message, separators=(',', ':')).encode()
+        if len(data) > MAX_DATAGRAM or (self.loss and random.random() < self.loss):
+            return
+        try:
+            self.sock.sendto(data, tuple(addr))
+        except OSError:
+            return
+        self.stats['messages_sent'] += 1
+        self.stats['bytes_sent'] += len(data)
+
+    def next_seq(self):
+        with self.lock:
+            self.seq += 1
+            return self.seq
+
+    def send_state(self, addr, message_type):
+        """Push our full member list (push-pull anti-entropy), batched into datagrams"""
+        with self.lock:
+            records = [self.record()] + [
+                {'id': member_id, 'addr': list(m['addr']), 'inc': m['inc'], 'status': m['status'],
+                 'meta': m['meta']} for member_id, m in self.members.items()]
+        for i in range(0, len(records), SYNC_BATCH):
+            self.send(addr, {'type': message_type if i == 0 else 'sync', 'records': records[i:i + SYNC_BATCH]},
+                      piggyback=False)
+
+    def handle(self, message, source):
+        kind = message.get('type')
+        sender = message.get('from')
+        with self.lock:
+            if sender and sender != self.id:
+                known = self.members.get(sender)
+                if known is None or (known['status'] != ALIVE and message['inc'] > known['inc']):
+                    # Direct evidence the sender is alive; its full record spreads by gossip
+                    self.apply({'id': sender, 'addr': message['addr'], 'inc': message['inc'], 'status': ALIVE},
+                               gossip=False)
+            for record in message.get('updates', []) + message.get('records', []):
+                self.apply(record)
+
+        if kind == 'ping':
+            self.send(source, {'type': 'ack', 'seq': message['seq']})
+        elif kind == 'ping-req':
+            seq = self.next_seq()
+            with self.lock:
+                self.forwards[seq] = (source, message['seq'], time.time())
+            self.send(message['target'], {'type': 'ping', 'seq': seq})
+        elif kind == 'ack':
+            with self.lock:
+                event = self.pending.get(message['seq'])
+                forward = self.forwards.pop(message['seq'], None)
+            if event:
+                event.set()
+            if forward:
+                self.send(forward[0], {'type': 'ack', 'seq': forward[1]})
+        elif kind in ('join', 'push'):
+            self.send_state(source, 'sync')
+
+    def receive_loop(self):
+        while self.running:
+            try:
+                data, source = self.sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                self.handle(json.loads(data), source)
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    # Failure detection
+
+    def next_target(self):
+        with self.lock:
+            while self.probe_order:
+                member_id = self.probe_order.pop()
+                member = self.members.get(member_id)
+                if member and member['status'] != DEAD:
+                    return member_id, member['addr'], member['inc']
+            self.probe_order = [m for m, v in self.members.items() if v['status'] != DEAD]
+            random.shuffle(self.probe_order)
+        return None
+
+    def probe(self, target):
+        member_id, addr, inc = target
+        seq = self.next_seq()
+        event = threading.Event()
+        with self.lock:
+            self.pending[seq] = event
+        self.stats['pings'] += 1
+        self.send(addr, {'type': 'ping', 'seq': seq})
+        acked = event.wait(self.ping_timeout)
+
+        if not acked:
+            with self.lock:
+                helpers = [m['addr'] for other, m in self.members.items()
+                           if other != member_id and m['status'] == ALIVE]
+            for helper in random.sample(helpers, min(self.indirect_probes, len(helpers))):
+                self.stats['ping_reqs'] += 1
+                self.send(helper, {'type': 'ping-req', 'seq': seq, 'target': list(addr)})
+            acked = event.wait(max(self.period - self.ping_timeout, 0) * 0.8)
+
+        with self.lock:
+            self.pending.pop(seq, None)
+            member = self.members.get(member_id)
+            if not acked and member and member['status'] == ALIVE and member['inc'] == inc:
+                self.stats['suspicions'] += 1
+                self.apply({'id': member_id, 'addr': list(addr), 'inc': inc, 'status': SUSPECT})
+
+    def expire(self):
+        """Declare timed-out suspects dead and forget long-dead members"""
+        now = time.time()
+        with self.lock:
+            timeout = self.suspicion_mult * max(1.0, math.log10(len(self.members) + 1)) * self.period
+            for member_id, member in list(self.members.items()):
+                if member['status'] == SUSPECT and now - member['since'] > timeout:
+                    self.stats['deaths'] += 1
+                    self.apply({'id': member_id, 'addr': list(member['addr']), 'inc': member['inc'],
+                                'status': DEAD})
+                elif member['status'] == DEAD and now - member['since'] > self.dead_retention:
+                    del self.members[member_id]
+                    self.updates.pop(member_id, None)
+            for seq, forward in list(self.forwards.items()):
+                if now - forward[2] > self.period:
+                    del self.forwards[seq]
+
+    def protocol_loop(self):
+        periods = 0
+        next_sync = self.sync_every
+        while self.running:
+            started = time.time()
+            target = self.next_target()
+            if target:
+                self.probe(target)
+            self.expire()
+
+            periods += 1
+            if self.sync_every and periods >= next_sync:
+                with self.lock:
+                    alive = [m['addr'] for m in self.members.values() if m['status'] == ALIVE]
+                if alive:
+                    self.send_state(random.choice(alive), 'push')
+                # Full-state syncs get rarer as the state grows, keeping bytes per period flat
+                next_sync = periods + self.sync_every * math.ceil((len(alive) + 1) / SYNC_BATCH)
+            time.sleep(max(0, self.period - (time.time() - started)))
+
+    def start(self, seeds=()):
+        """Start gossiping and announce ourselves to the seed nodes"""
+        if self.running:
+            return
+        self.running = True
+        with self.lock:
+            self.queue_update(self.record())
+        for target in (self.receive_loop, self.protocol_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        for seed in seeds:
+            seed = parse_address(seed)
+            if seed != tuple(self.addr):
+                self.send(seed, {'type': 'join'}, piggyback=False)
+                self.send_state(seed, 'sync')
+
+    def stop(self):
+        """Stop silently, like a crash (peers find out through failure detection)"""
+        self.running = False
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.sock.close()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Stand-in listener for a hibernated Minecraft server.
+
+While a server is stopped for being empty, WakeListener holds its port. It
+answers server-list pings from the status the real server last reported, so the
+server still shows up in players' lists, and wakes the server when someone tries
+to log in (they are told to reconnect in a moment).
+
+Packets are <VarInt length, VarInt id, fields>. A connection opens with a
+handshake whose next state is 1 (status) or 2/3 (login/transfer).
+"""
+import json
+import socket
+import struct
+import threading
+
+STATUS, LOGIN, TRANSFER = 1, 2, 3
+
+def pack_varint(value):
+    value &= 0xFFFFFFFF
+    out = b''
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out += bytes([byte | 0x80])
+        else:
+            return out + bytes([byte])
+
+def unpack_varint(data, offset=0):
+    """(value, next offset)"""
+    value = 0
+    for i in range(5):
+        byte = data[offset + i]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return (value - (1 << 32) if value & 0x80000000 else value), offset + i + 1
+    raise ValueError('VarInt is too long')
+
+def pack_string(text):
+    data = text.encode('utf-8')
+    return pack_varint(len(data)) + data
+
+def unpack_string(data, offset):
+    size, offset = unpack_varint(data, offset)
+    return data[offset:offset + size].decode('utf-8', 'replace'), offset + size
+
+def packet(packet_id, payload=b''):
+    body = pack_varint(packet_id) + payload
+    return pack_varint(len(body)) + body
+
+def recv_packet(sock):
+    """(packet id, payload) of the next packet"""
+    length, shift = 0, 0
+    for _ in range(5):
+        byte = sock.recv(1)
+        if not byte:
+            raise ConnectionError('connection closed')
+        length |= (byte[0] & 0x7F) << shift
+        shift += 7
+        if not byte[0] & 0x80:
+            break
+    if not 0 < length <= 1 << 21:
+        raise ValueError(f'bad packet length {length}')
+    data = b''
+    while len(data) < length:
+        part = sock.recv(length - len(data))
+        if not part:
+            raise ConnectionError('connection closed')
+        data += part
+    packet_id, offset = unpack_varint(data)
+    return packet_id, data[offset:]
+
+def handshake(host, port, next_state, protocol=-1):
+    return packet(0x00, pack_varint(protocol) + pack_string(host) + struct.pack('>H', port) + pack_varint(next_state))
+
+def query_status(host, port, timeout=5):
+    """The server-list status JSON a server reports (version, players, description, favicon)"""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(handshake(host, port, STATUS) + packet(0x00))
+        packet_id, payload = recv_packet(sock)
+        if packet_id != 0x00:
+            raise ValueError(f'unexpected status packet {packet_id:#x}')
+        return json.loads(unpack_string(payload, 0)[0])
+
+class WakeListener:
+    """Answers pings from a cached status and calls on_wake() on the first login attempt"""
+    def __init__(self, port, status, on_wake, host='0.0.0.0', wake_message='Server is waking up, reconnect in a moment'):
+        self.status = status
+        self.on_wake = on_wake
+        self.wake_message = wake_message
+        self.woken = threading.Event()
+        self.lock = threading.Lock()
+        self.pings = 0
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        self.running = True
+
+    def status_json(self, protocol):
+        status = dict(self.status)
+        status.setdefault('version', {'name': 'sleeping', 'protocol': protocol})  # nothing cached yet
+        status['players'] = dict(status.get('players', {}), online=0, sample=[])
+        return json.dumps(status)
+
+    def handle(self, conn):
+        with conn:
+            conn.settimeout(5)
+            try:
+                packet_id, payload = recv_packet(conn)
+                if packet_id != 0x00:
+                    return  # legacy (pre-1.7) ping or garbage
+                protocol, offset = unpack_varint(payload)
+                _, offset = unpack_string(payload, offset)
+                next_state, _ = unpack_varint(payload, offset + 2)
+                if next_state == STATUS:
+                    self.answer_status(conn, protocol)
+                elif next_state in (LOGIN, TRANSFER):
+                    recv_packet(conn)  # Login Start
+                    conn.sendall(packet(0x00, pack_string(json.dumps({'text': self.wake_message}))))
+                    self.wake()
+            except (OSError, ConnectionError, ValueError, IndexError):
+                return
+
+    def answer_status(self, conn, protocol):
+        while True:
+            packet_id, payload = recv_packet(conn)
+            if packet_id == 0x00:
+                self.pings += 1
+                conn.sendall(packet(0x00, pack_string(self.status_json(protocol))))
+            elif packet_id == 0x01:
+                conn.sendall(packet(0x01, payload))  # pong echoes the client's long
+                return
+
+    def wake(self):
+        with self.lock:
+            if self.woken.is_set():
+                return
+            self.woken.set()
+        self.close()  # free the port for the real server
+        threading.Thread(target=self.on_wake, daemon=True).start()
+
+    def serve_forever(self):
+        self.sock.settimeout(0.5)
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.running = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # wakes a blocked accept() so the port is released now
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
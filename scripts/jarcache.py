@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Shared cache of Minecraft server jars, stored by content and verified on the way in.
+
+Jars live once under <root>/objects/<sha1>.jar and are hardlinked into every
+server directory, so N servers cost one download and one copy on disk. The
+expected SHA-1 comes from Mojang's version manifest; a local mirror directory
+(<version>.jar with a <version>.jar.sha1 or .sha256 file next to it) is tried
+first, which also makes the cache work offline. A mirror jar without a checksum
+file is checked against the manifest, and refused when that cannot be reached
+unless allow_unverified is set (it is then indexed as unverified).
+
+Fetches are single-flight: every caller asking for a version gets the same
+future, so one download runs per version however many servers start at once.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+MANIFEST_URL = 'https://piston-meta.mojang.com/mc/game/version_manifest_v2.json'
+
+class JarError(Exception):
+    pass
+
+def file_digests(path):
+    """(sha1, sha256) of a file, read once"""
+    sha1, sha256 = hashlib.sha1(), hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+            sha256.update(block)
+    return sha1.hexdigest(), sha256.hexdigest()
+
+class JarCache:
+    def __init__(self, root, mirror=None, session=None, workers=2, timeout=(5, 120), allow_unverified=False):
+        self.root = os.path.expanduser(root)
+        self.mirror = os.path.expanduser(mirror) if mirror else None
+        self.allow_unverified = allow_unverified
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.inflight = {}  # version -> Future
+        os.makedirs(os.path.join(self.root, 'objects'), exist_ok=True)
+        self.index_path = os.path.join(self.root, 'index.json')
+        try:
+            with open(self.index_path) as f:
+                self.index = json.load(f)  # version -> {'sha1', 'sha256', 'size', 'source', 'verified'}
+        except (OSError, ValueError):
+            self.index = {}
+
+    def object_path(self, sha1):
+        return os.path.join(self.root, 'objects', f'{sha1}.jar')
+
+    def cached(self, version):
+        """Path of the verified jar for version, or None"""
+        entry = self.index.get(version)
+        if not entry or not (entry.get('verified', True) or self.allow_unverified):
+            return None
+        if os.path.exists(self.object_path(entry['sha1'])):
+            return self.object_path(entry['sha1'])
+        return None
+
+    def sha1(self, version):
+        return self.index.get(version, {}).get('sha1')
+
+    def prefetch(self, version):
+        """Future resolving to the cached jar path; joins a fetch already in progress"""
+        with self.lock:
+            future = self.inflight.get(version)
+            if future is not None:
+                return future
+            future = self.inflight[version] = self.executor.submit(self.fetch, version)
+        future.add_done_callback(lambda _: self.forget(version, future))  # may run at once: not under the lock
+        return future
+
+    def forget(self, version, future):
+        with self.lock:
+            if self.inflight.get(version) is future:
+                del self.inflight[version]  # a failed fetch can be retried later
+
+    def get(self, version, timeout=None):
+        """Cached jar path for version, waiting for its download if needed"""
+        return self.cached(version) or self.prefetch(version).result(timeout)
+
+    def fetch(self, version):
+        path = self.cached(version)
+        if path:
+            return path
+        expected = self.mirror_jar(version)
+        if expected is None:
+            sha1, url = self.lookup(version)
+            expected = {'sha1': sha1}
+            print(f"📥 Downloading Minecraft {version} server jar...")
+            tmp = self.download(url)
+            source = url
+        else:
+            if not expected:
+                expected = self.mirror_fallback(version)
+            tmp, source = self.copy_mirror(version), 'mirror'
+            print(f"📦 Minecraft {version} server jar from mirror {self.mirror}")
+        try:
+            sha1, sha256 = file_digests(tmp)
+            for algorithm, digest in (('sha1', sha1), ('sha256', sha256)):
+                if expected.get(algorithm) and expected[algorithm] != digest:
+                    raise JarError(f'{version} jar {algorithm} mismatch: expected {expected[algorithm]}, got {digest}')
+            path = self.object_path(sha1)
+            os.chmod(tmp, 0o644)  # mkstemp creates 0600
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        with self.lock:
+            self.index[version] = {'sha1': sha1, 'sha256': sha256, 'size': os.path.getsize(path), 'source': source,
+                                   'verified': bool(expected)}
+            self.save_index()
+        return path
+
+    def mirror_jar(self, version):
+        """Expected digests of the mirror's jar for version ({} if unknown), or None if it has none"""
+        if not self.mirror or not os.path.exists(os.path.join(self.mirror, f'{version}.jar')):
+            return None
+        expected = {}
+        for algorithm in ('sha1', 'sha256'):
+            try:
+                with open(os.path.join(self.mirror, f'{version}.jar.{algorithm}')) as f:
+                    expected[algorithm] = f.read().split()[0].lower()
+            except (OSError, IndexError):
+                pass
+        return expected
+
+    def mirror_fallback(self, version):
+        """Expected digests for a mirror jar that has no checksum file: the manifest's SHA-1"""
+        try:
+            return {'sha1': self.lookup(version)[0]}
+        except JarError as e:
+            if not self.allow_unverified:
+                raise JarError(f'mirror jar for {version} has no .sha1/.sha256 file and {e}') from e
+            print(f"⚠️  Using unverified mirror jar for Minecraft {version} ({e})")
+            return {}
+
+    def copy_mirror(self, version):
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.root, 'objects'), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as out, open(os.path.join(self.mirror, f'{version}.jar'), 'rb') as src:
+            shutil.copyfileobj(src, out, 1 << 20)
+        return tmp
+
+    def lookup(self, version):
+        """(sha1, url) of the version's server jar from Mojang's manifest"""
+        try:
+            manifest = self.session.get(MANIFEST_URL, timeout=self.timeout).json()
+            entry = next((v for v in manifest['versions'] if v['id'] == version), None)
+            if entry is None:
+                raise JarError(f'Minecraft {version} is not in the version manifest')
+            server = self.session.get(entry['url'], timeout=self.timeout).json()['downloads']['server']
+        except (requests.RequestException, ValueError, KeyError) as e:
+            raise JarError(f'cannot look up Minecraft {version}: {e}') from e
+        return server['sha1'], server['url']
+
+    def download(self, url):
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.root, 'objects'), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as out, self.session.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                for block in response.iter_content(1 << 20):
+                    out.write(block)
+        except BaseException as e:
+            os.unlink(tmp)
+            if isinstance(e, requests.RequestException):
+                raise JarError(f'download of {url} failed: {e}') from e
+            raise
+        return tmp
+
+    def save_index(self):
+        """Caller holds self.lock"""
+        tmp = f'{self.index_path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def install(self, version, target, timeout=None):
+        """Hardlink the version's jar to target (copy across filesystems); no-op if already linked"""
+        path = self.get(version, timeout)
+        try:
+            if os.path.samefile(path, target):
+                return False
+        except OSError:
+            pass
+        tmp = f'{target}.tmp'
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        try:
+            os.link(path, tmp)
+        except OSError:
+            shutil.copyfile(path, tmp)
+        os.replace(tmp, target)
+        return True
+
+    def stats(self):
+        with self.lock:
+            return {'versions': dict(self.index), 'downloading': sorted(self.inflight)}
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Batch jobs that workers run for the cluster, shared by worker.py and auto-combiner.py.
+
+Only registered ops can run. Arguments and results are JSON; binary payloads
+travel base64-encoded in 'data' fields. Results stream back as NDJSON, one
+line per job in completion order.
+"""
+import base64
+import bz2
+import hashlib
+import json
+import lzma
+import struct
+import time
+import traceback
+import zlib
+
+OPS = {}
+
+def op(name):
+    """Register a function as a job op"""
+    def register(func):
+        OPS[name] = func
+        return func
+    return register
+
+def decode(args, key='data'):
+    return base64.b64decode(args.get(key, ''))
+
+def encode(data):
+    return base64.b64encode(data).decode('ascii')
+
+CODECS = {
+    'deflate': (lambda data, level: zlib.compress(data, level), zlib.decompress),
+    'bzip2': (lambda data, level: bz2.compress(data, max(level, 1)), bz2.decompress),
+    'lzma': (lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+}
+
+@op('echo')
+def echo(args):
+    """Return the arguments (smoke test); optional 'sleep' seconds"""
+    time.sleep(min(float(args.get('sleep', 0)), 60))
+    return args
+
+@op('hash')
+def hash_data(args):
+    """Digest of data with any hashlib algorithm (default sha256)"""
+    data = decode(args)
+    return {'algorithm': args.get('algorithm', 'sha256'), 'size': len(data),
+            'digest': hashlib.new(args.get('algorithm', 'sha256'), data).hexdigest(), 'crc32': zlib.crc32(data)}
+
+@op('compress')
+def compress(args):
+    """Compress data with deflate, bzip2 or lzma"""
+    data = decode(args)
+    codec = args.get('codec', 'deflate')
+    body = CODECS[codec][0](data, int(args.get('level', 6)))
+    return {'codec': codec, 'size': len(data), 'compressed_size': len(body),
+            'sha256': hashlib.sha256(data).hexdigest(), 'data': encode(body)}
+
+@op('decompress')
+def decompress(args):
+    body = CODECS[args.get('codec', 'deflate')][1](decode(args))
+    return {'size': len(body), 'data': encode(body)}
+
+@op('region-scan')
+def region_scan(args):
+    """Summarize a Minecraft .mca region file: chunk count, sizes, compression and age"""
+    data = decode(args)
+    if len(data) < 8192:
+        raise ValueError('region file is shorter than its 8KiB header')
+    chunks, sectors, codecs, newest = 0, 0, {}, 0
+    for slot in range(1024):
+        entry = struct.unpack_from('>I', data, slot * 4)[0]
+        offset, count = entry >> 8, entry & 0xFF
+        if not offset:
+            continue
+        chunks += 1
+        sectors += count
+        newest = max(newest, struct.unpack_from('>I', data, 4096 + slot * 4)[0])
+        start = offset * 4096
+        if start + 5 <= len(data):
+            codec = data[start + 4]
+            codecs[codec] = codecs.get(codec, 0) + 1
+    return {'chunks': chunks, 'sectors': sectors, 'size': len(data),
+            'wasted_bytes': len(data) - 8192 - sectors * 4096,
+            'compression': {str(k): v for k, v in codecs.items()}, 'newest_timestamp': newest}
+
+def run_op(name, args):
+    """Pool worker entry point. Never raises: errors come back in the result"""
+    started = time.perf_counter()
+    try:
+        result = {'ok': True, 'result': OPS[name](args)}
+    except Exception as e:
+        result = {'ok': False, 'error': f'{type(e).__name__}: {e}',
+                  'traceback': traceback.format_exc(limit=3)}
+    result['seconds'] = round(time.perf_counter() - started, 4)
+    return result
+
+def validate(jobs):
+    """Raise ValueError unless jobs is a list of {'op': <registered>, 'args': {...}}"""
+    if not isinstance(jobs, list) or not jobs:
+        raise ValueError('jobs must be a non-empty list')
+    for job in jobs:
+        if not isinstance(job, dict) or job.get('op') not in OPS:
+            raise ValueError(f"unknown op: {job.get('op') if isinstance(job, dict) else job!r}")
+        if not isinstance(job.get('args', {}), dict):
+            raise ValueError('args must be an object')
+
+def stream_batch(session, url, jobs, timeout=(3, 300)):
+    """POST a batch to a worker and yield its NDJSON results as they arrive.
+
+    Raises requests.HTTPError on rejection (429 when the worker is full).
+    """
+    with session.post(f'{url}/jobs/batch?stream=1', json={'jobs': jobs}, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
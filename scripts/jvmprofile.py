@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""JVM launch profiles for Minecraft servers, one per adaptive strategy.
+
+Each profile is a GC choice plus tuning for how much RAM the strategy can
+promise the server. On JDK 19+ every launch also uses an AppCDS archive of the
+server's classes: the first run with a given jar writes it on exit
+(-XX:+AutoCreateSharedArchive) and later runs map it instead of loading and
+verifying those classes again, which is most of a cold start.
+
+Flags newer than JDK 8 are only passed to a JVM that has them (MIN_JAVA): an
+unknown option stops the JVM from starting. When the java version cannot be
+determined the launch falls back to plain -Xmx/-Xms.
+"""
+import functools
+import os
+import re
+import subprocess
+
+COMMON = ['-XX:+DisableExplicitGC', '-XX:+PerfDisableSharedMem']
+
+# Options that older JVMs reject, by the JDK that introduced them
+MIN_JAVA = {'-XX:G1PeriodicGCInterval': 12, '-XX:+UseZGC': 21, '-XX:+ZGenerational': 21,
+            '-XX:+AutoCreateSharedArchive': 19, '-XX:SharedArchiveFile': 19}
+
+def supported(flag, major):
+    return major >= MIN_JAVA.get(flag.split('=', 1)[0], 8)
+
+PROFILES = {
+    # Heap committed and touched up front (Xms == Xmx), short pauses
+    'high-performance': {'gc': 'g1', 'pause_ms': 50, 'pretouch': True,
+                         'flags': ['-XX:+UnlockExperimentalVMOptions', '-XX:G1NewSizePercent=30', '-XX:G1MaxNewSizePercent=40',
+                                   '-XX:G1ReservePercent=20', '-XX:InitiatingHeapOccupancyPercent=15']},
+    # Shares the node: grow on demand and hand idle memory back to the OS
+    'balanced': {'gc': 'g1', 'pause_ms': 100, 'pretouch': False,
+                 'flags': ['-XX:G1PeriodicGCInterval=60000']},
+    'single-node': {'gc': 'g1', 'pause_ms': 100, 'pretouch': False,
+                    'flags': ['-XX:G1PeriodicGCInterval=60000']},
+    # Small heaps: the serial collector has the smallest footprint and fastest start
+    'minimal': {'gc': 'serial', 'pretouch': False, 'flags': []},
+}
+
+@functools.lru_cache(maxsize=None)
+def java_major(java='java'):
+    """Major version of the java on PATH, or None if it cannot be run"""
+    try:
+        result = subprocess.run([java, '-version'], capture_output=True, text=True, timeout=15)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    match = re.search(r'version "(\d+)(?:\.(\d+))?', result.stderr + result.stdout)
+    if not match:
+        return None
+    major = int(match.group(1))
+    return int(match.group(2)) if major == 1 else major  # "1.8.0" is Java 8
+
+def profile_for(strategy):
+    return strategy if strategy in PROFILES else 'minimal'
+
+def g1_region_mb(heap_gb):
+    """Larger regions keep huge chunk/entity arrays from becoming humongous objects"""
+    return 4 if heap_gb < 8 else 8 if heap_gb < 16 else 16
+
+def gc_flags(profile, heap_gb, major, zgc_min_heap_gb):
+    """(collector name, flags)"""
+    settings = PROFILES[profile]
+    if settings['gc'] == 'serial':
+        return 'serial', ['-XX:+UseSerialGC']
+    if major >= 21 and heap_gb >= zgc_min_heap_gb:
+        # Pauses stay under a millisecond whatever the heap size; generational from JDK 21
+        return 'zgc', ['-XX:+UseZGC'] + (['-XX:+ZGenerational'] if major < 23 else [])
+    return 'g1', ['-XX:+UseG1GC', f"-XX:MaxGCPauseMillis={settings['pause_ms']}",
+                  f'-XX:G1HeapRegionSize={g1_region_mb(heap_gb)}M', '-XX:+ParallelRefProcEnabled'] + settings['flags']
+
+def launch_args(strategy, xmx_gb, xms_gb, jar_id, archive_dir, java='java', zgc_min_heap_gb=16):
+    """(JVM arguments before -jar, launch info) for a server.
+
+    jar_id names the jar's content (its sha1); the CDS archive is kept per jar,
+    JDK and collector in archive_dir. The info says which profile and collector
+    were used and whether the archive is being created or reused.
+    """
+    profile = profile_for(strategy)
+    major = java_major(java)
+    args = [f'-Xmx{xmx_gb}G', f'-Xms{xms_gb}G']
+    if major is None:
+        return args, {'profile': 'baseline', 'gc': 'default', 'java': None, 'cds': 'off', 'archive': None}
+    gc, flags = gc_flags(profile, xmx_gb, major, zgc_min_heap_gb)
+    args += [flag for flag in flags + COMMON if supported(flag, major)]
+    if PROFILES[profile]['pretouch'] and xms_gb == xmx_gb:
+        args.append('-XX:+AlwaysPreTouch')
+    info = {'profile': profile, 'gc': gc, 'java': major, 'cds': 'off', 'archive': None}
+    if supported('-XX:+AutoCreateSharedArchive', major) and jar_id:
+        os.makedirs(archive_dir, exist_ok=True)
+        archive = os.path.join(archive_dir, f'{jar_id[:16]}-jdk{major}-{gc}.jsa')
+        args += ['-XX:+AutoCreateSharedArchive', f'-XX:SharedArchiveFile={archive}']
+        info.update(cds='reuse' if os.path.exists(archive) else 'create', archive=archive)
+    return args, info
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Benchmark the Minecraft placement engine on synthetic clusters.
+
+Generates random clusters (nodes with 2-16GB free and 1-8 cores) and random
+server mixes (2-8GB heaps), then compares best-fit decreasing with plain
+first-fit and with the old node-count thresholds that ran everything on the
+main node. It also measures rebalancing after a node leaves or joins: servers
+moved by the sticky rebalance versus a fresh repack.
+
+    python3 placement-bench.py --clusters 500 --nodes 6 --servers 10
+"""
+import argparse
+import json
+import random
+import time
+from placement import PlacementEngine, best_fit_decreasing
+
+def first_fit(items, capacities):
+    """Baseline: items in arbitrary order, each into the first node with room"""
+    free = {b: dict(c) for b, c in capacities.items()}
+    placements = {}
+    for item_id, item in items.items():
+        for b, room in free.items():
+            if room['ram_gb'] >= item['ram_gb'] and room['cores'] >= item['cores']:
+                placements[item_id] = b
+                room['ram_gb'] -= item['ram_gb']
+                room['cores'] -= item['cores']
+                break
+    return placements
+
+def threshold_rule(nodes, engine):
+    """The old update_adaptive_config: server count from node count, all on the main node"""
+    count, heap = (3, 6) if len(nodes) >= 4 else (2, 4) if len(nodes) >= 2 else (1, 6)
+    main = engine.capacities(nodes[:1])[nodes[0]['id']]
+    return min(count, int(main['ram_gb'] // (heap + engine.overhead_gb)))
+
+def random_cluster(rng, count):
+    nodes = [{'id': 'main', 'ram_gb': 8, 'cpu_cores': rng.choice([2, 4, 8]), 'status': 'active',
+              'services': ['minecraft']}]
+    for i in range(1, count):
+        nodes.append({'id': f'worker-{i}', 'ram_gb': rng.randint(2, 16), 'cpu_cores': rng.randint(1, 8),
+                      'status': 'active', 'services': ['minecraft', 'compute']})
+    return nodes
+
+def random_servers(rng, engine, count):
+    return {f's{i}': {'ram_gb': rng.choice([2, 3, 4, 6, 8]) + engine.overhead_gb, 'cores': engine.cores_per_server}
+            for i in range(count)}
+
+def moves(before, after):
+    return sum(1 for s, n in after.items() if s in before and before[s] != n)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Minecraft server placement')
+    parser.add_argument('--clusters', type=int, default=300, help='synthetic clusters to try')
+    parser.add_argument('--nodes', type=int, default=6, help='nodes per cluster (including main)')
+    parser.add_argument('--servers', type=int, default=10, help='servers per cluster')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    engine = PlacementEngine(servers=args.servers)
+    totals = {key: 0 for key in ('items', 'ram', 'bfd_placed', 'ff_placed', 'bfd_ram', 'ff_ram',
+                                 'bfd_nodes', 'ff_nodes',
+                                 'threshold_servers', 'plan_servers', 'sticky_moves', 'repack_moves',
+                                 'displaced', 'bfd_seconds')}
+
+    print(f"🧪 Packing {args.servers} servers onto {args.clusters} clusters of {args.nodes} nodes...")
+    for _ in range(args.clusters):
+        nodes = random_cluster(rng, args.nodes)
+        capacities = engine.capacities(nodes)
+        items = random_servers(rng, engine, args.servers)
+        totals['items'] += len(items)
+        totals['ram'] += sum(item['ram_gb'] for item in items.values())
+
+        started = time.perf_counter()
+        placed, _, _ = best_fit_decreasing(items, capacities)
+        totals['bfd_seconds'] += time.perf_counter() - started
+        ff = first_fit(items, capacities)
+        totals['bfd_placed'] += len(placed)
+        totals['ff_placed'] += len(ff)
+        totals['bfd_ram'] += sum(items[i]['ram_gb'] for i in placed)
+        totals['ff_ram'] += sum(items[i]['ram_gb'] for i in ff)
+        totals['bfd_nodes'] += len(set(placed.values()))
+        totals['ff_nodes'] += len(set(ff.values()))
+
+        # Uniform servers as the combiner plans them, against the old thresholds
+        plan = engine.plan(nodes)
+        totals['threshold_servers'] += threshold_rule(nodes, engine)
+        totals['plan_servers'] += plan['servers']
+
+        # A random worker leaves and a new one joins: sticky rebalance vs repacking from scratch
+        gone = rng.choice(nodes[1:]) if len(nodes) > 1 else None
+        changed = [n for n in nodes if n is not gone] + random_cluster(rng, 2)[1:]
+        changed[-1]['id'] = 'worker-new'
+        capacities = engine.capacities(changed)
+        sticky, _, _ = best_fit_decreasing(items, capacities, placed)
+        fresh, _, _ = best_fit_decreasing(items, capacities)
+        totals['displaced'] += sum(1 for n in placed.values() if gone and n == gone['id'])
+        totals['sticky_moves'] += moves(placed, sticky)
+        totals['repack_moves'] += moves(placed, fresh)
+
+    clusters = args.clusters
+    print(json.dumps({
+        'clusters': clusters,
+        'nodes': args.nodes,
+        'servers': args.servers,
+        'placed_share': {
+            'best_fit_decreasing': round(totals['bfd_placed'] / totals['items'], 4),
+            'first_fit': round(totals['ff_placed'] / totals['items'], 4)
+        },
+        'placed_ram_share': {
+            'best_fit_decreasing': round(totals['bfd_ram'] / totals['ram'], 4),
+            'first_fit': round(totals['ff_ram'] / totals['ram'], 4)
+        },
+        'nodes_used_per_cluster': {
+            'best_fit_decreasing': round(totals['bfd_nodes'] / clusters, 2),
+            'first_fit': round(totals['ff_nodes'] / clusters, 2)
+        },
+        'uniform_servers_per_cluster': {
+            'placement_engine': round(totals['plan_servers'] / clusters, 2),
+            'node_count_thresholds': round(totals['threshold_servers'] / clusters, 2)
+        },
+        'rebalance_moves_per_cluster': {
+            'displaced_by_leave': round(totals['displaced'] / clusters, 2),
+            'sticky': round(totals['sticky_moves'] / clusters, 2),
+            'fresh_repack': round(totals['repack_moves'] / clusters, 2)
+        },
+        'plan_microseconds': round(totals['bfd_seconds'] / clusters * 1e6, 1)
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
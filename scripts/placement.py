@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Placement of Minecraft servers onto cluster nodes as a bin-packing problem.
+
+Each server is an item needing heap + JVM overhead in RAM and a share of CPU
+cores. Each node is a bin whose capacity is its measured RAM (minus a reserve)
+and its cores times an overcommit factor. Items are packed best-fit decreasing:
+largest first, each into the node it leaves with the least spare capacity
+(RAM and cores, each as a share of that node's size).
+
+Only nodes that advertise the 'minecraft' service are bins: compute- and
+storage-only workers never get servers.
+
+Rebalancing is sticky: when nodes join or leave, servers stay where they are
+as long as their node is still there and has room, and only the rest move.
+"""
+
+def best_fit_decreasing(items, capacities, fixed=None):
+    """Pack items into bins.
+
+    items: {item_id: {'ram_gb', 'cores'}}
+    capacities: {bin_id: {'ram_gb', 'cores'}}
+    fixed: {item_id: bin_id} placements to keep when they still fit
+    Returns (placements {item_id: bin_id}, unplaced [item_id], free {bin_id: {'ram_gb', 'cores'}})
+    """
+    free = {b: dict(c) for b, c in capacities.items()}
+    placements = {}
+
+    def leftover(item, b):
+        # Spare capacity after placing, as a share of the node's size in each dimension
+        cap = capacities[b]
+        return ((free[b]['ram_gb'] - item['ram_gb']) / max(cap['ram_gb'], 1e-9) +
+                (free[b]['cores'] - item['cores']) / max(cap['cores'], 1e-9))
+
+    def fits(item, b):
+        return free[b]['ram_gb'] >= item['ram_gb'] - 1e-9 and free[b]['cores'] >= item['cores'] - 1e-9
+
+    def take(item_id, b):
+        placements[item_id] = b
+        free[b]['ram_gb'] -= items[item_id]['ram_gb']
+        free[b]['cores'] -= items[item_id]['cores']
+
+    for item_id, b in sorted((fixed or {}).items()):
+        if item_id in items and b in free and fits(items[item_id], b):
+            take(item_id, b)
+
+    unplaced = []
+    order = sorted((i for i in items if i not in placements),
+                   key=lambda i: (-items[i]['ram_gb'], -items[i]['cores'], i))
+    for item_id in order:
+        candidates = [b for b in free if fits(items[item_id], b)]
+        if not candidates:
+            unplaced.append(item_id)
+            continue
+        take(item_id, min(candidates, key=lambda b: (leftover(items[item_id], b), b)))
+    return placements, unplaced, free
+
+class PlacementEngine:
+    def __init__(self, servers=3, heap_gb=6, min_heap_gb=2, heap_step=2, overhead_gb=0.5,
+                 reserve_gb=1.0, cores_per_server=1.0, cpu_overcommit=2.0):
+        self.servers = servers
+        self.heap_gb = heap_gb
+        self.min_heap_gb = min_heap_gb
+        self.heap_step = heap_step
+        self.overhead_gb = overhead_gb
+        self.reserve_gb = reserve_gb
+        self.cores_per_server = cores_per_server
+        self.cpu_overcommit = cpu_overcommit
+
+    def capacities(self, nodes):
+        """Bins from discovered nodes that run Minecraft: measured RAM minus the reserve,
+        overcommitted cores"""
+        return {node['id']: {'ram_gb': max(node.get('ram_gb', 0) - self.reserve_gb, 0),
+                             'cores': node.get('cpu_cores', 1) * self.cpu_overcommit}
+                for node in nodes
+                if node.get('status', 'active') == 'active' and 'minecraft' in node.get('services', ())}
+
+    def items(self, count, heap_gb):
+        return {str(i): {'ram_gb': heap_gb + self.overhead_gb, 'cores': self.cores_per_server}
+                for i in range(1, count + 1)}
+
+    def plan(self, nodes, previous=None):
+        """Server count and heap that place the most heap in total (ties go to the larger heap).
+
+        previous is the last plan's {server_id: node_id}; servers keep those nodes when possible.
+        """
+        capacities = self.capacities(nodes)
+        heaps = list(range(self.heap_gb, self.min_heap_gb - 1, -self.heap_step)) or [self.min_heap_gb]
+        count, heap, placements, free = 0, 0, {}, capacities
+        for size in heaps:
+            for n in range(self.servers, 0, -1):
+                if n * size <= count * heap:
+                    break
+                packed, unplaced, left = best_fit_decreasing(self.items(n, size), capacities, previous)
+                if not unplaced:
+                    count, heap, placements, free = n, size, packed, left
+                    break
+
+        previous = previous or {}
+        return {
+            'servers': count,
+            'heap_gb': heap,
+            'placements': placements,
+            'moves': {s: {'from': previous[s], 'to': n} for s, n in placements.items()
+                      if s in previous and previous[s] != n},
+            'nodes': {b: {'capacity_ram_gb': round(capacities[b]['ram_gb'], 2),
+                          'free_ram_gb': round(free[b]['ram_gb'], 2),
+                          'servers': sorted(s for s, n in placements.items() if n == b)}
+                      for b in capacities}
+        }
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""A fake Minecraft RCON server for testing rcon.py, adaptive-minecraft and backups locally.
+
+It speaks the real wire protocol (login, commands, fragmented long responses
+and the "Unknown request" reply used as an end marker) and answers a few
+vanilla commands the way the server does. Like the real server it handles one
+packet per read and hangs up when a read holds more or less than one packet.
+
+    python3 rcon-fake.py --port 25575 --password secret
+    python3 rcon-fake.py --self-test
+"""
+import argparse
+import socket
+import struct
+import threading
+import time
+from rcon import RconClient, RconError, LOGIN, COMMAND, RESPONSE
+
+FRAGMENT = 4096  # the server splits responses into packets of this size
+READ_SIZE = 1460  # the server's read buffer
+
+class FakeRconServer:
+    def __init__(self, port=0, password='secret', host='127.0.0.1', on_stop=None):
+        self.password = password
+        self.on_stop = on_stop
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(8)
+        self.port = self.sock.getsockname()[1]
+        self.saving = True
+        self.commands = []
+        self.connections = 0
+        self.dropped = 0  # connections closed for sending more than one packet per read
+        self.running = True
+
+    def respond(self, command):
+        self.commands.append(command)
+        if command == 'list':
+            return 'There are 0 of a max of 20 players online: '
+        if command == 'save-off':
+            self.saving = False
+            return 'Automatic saving is now disabled'
+        if command == 'save-on':
+            self.saving = True
+            return 'Automatic saving is now enabled'
+        if command.startswith('save-all'):
+            return 'Saving the game (this may take a moment!)Saved the game'
+        if command == 'stop':
+            return 'Stopping the server'
+        if command.startswith('echo-long '):
+            return 'x' * int(command.split()[1])
+        return f'Unknown or incomplete command, see below for error{command}<--[HERE]'
+
+    def send(self, conn, request_id, packet_type, body):
+        payload = struct.pack('<ii', request_id, packet_type) + body.encode() + b'\0\0'
+        conn.sendall(struct.pack('<i', len(payload)) + payload)
+
+    def handle(self, conn):
+        self.connections += 1
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        authed = False
+        with conn:
+            while self.running:
+                try:
+                    data = conn.recv(READ_SIZE)
+                except OSError:
+                    return
+                if len(data) < 14:
+                    return
+                length = struct.unpack('<i', data[:4])[0]
+                if len(data) != 4 + length:
+                    self.dropped += 1  # the server reads one packet per read() and drops the rest
+                    return
+                request_id, packet_type = struct.unpack('<ii', data[4:12])
+                body = data[12:-2].decode()
+                if packet_type == LOGIN:
+                    authed = body == self.password
+                    self.send(conn, request_id if authed else -1, COMMAND, '')
+                elif not authed:
+                    self.send(conn, -1, COMMAND, '')
+                elif packet_type == COMMAND:
+                    text = self.respond(body)
+                    for i in range(0, max(len(text), 1), FRAGMENT):
+                        self.send(conn, request_id, RESPONSE, text[i:i + FRAGMENT])
+                    if body == 'stop':
+                        self.running = False
+                        if self.on_stop:
+                            threading.Thread(target=self.on_stop, daemon=True).start()
+                        return
+                else:
+                    self.send(conn, request_id, RESPONSE, f'Unknown request {packet_type:x}')
+
+    def serve_forever(self):
+        self.sock.settimeout(0.5)
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+        self.sock.close()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+def self_test():
+    """Exercise the client against the fake server and print the results"""
+    server = FakeRconServer().start()
+    client = RconClient('127.0.0.1', server.port, 'secret')
+    checks = {}
+    checks['command'] = client.command('list').startswith('There are 0')
+    responses = client.batch(['save-off', 'save-all flush', 'echo-long 10000', 'save-on'])
+    checks['batch_in_order'] = responses[0].endswith('disabled') and responses[3].endswith('enabled')
+    checks['save_confirmed'] = 'Saved the game' in responses[1]
+    checks['fragments_joined'] = len(responses[2]) == 10000
+    checks['one_connection'] = server.connections == 1 and server.dropped == 0
+
+    started = time.perf_counter()
+    for _ in range(200):
+        client.command('list')
+    pooled_ms = (time.perf_counter() - started) / 200 * 1000
+
+    client.sock.close()  # a dead pooled connection is replaced transparently
+    checks['reconnects'] = client.command('list').startswith('There are') and server.connections == 2
+    login = struct.pack('<iii', 16, 1, LOGIN) + b'secret\0\0'
+    with socket.create_connection(('127.0.0.1', server.port)) as raw:  # two packets in one write
+        raw.sendall(login * 2)
+        checks['drops_pipelined_packets'] = raw.recv(64) == b''
+    try:
+        RconClient('127.0.0.1', server.port, 'wrong').command('list')
+        checks['rejects_bad_password'] = False
+    except RconError:
+        checks['rejects_bad_password'] = True
+    checks['stop'] = client.command('stop') == 'Stopping the server'
+
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+    print(f"⏱️  {pooled_ms:.3f} ms per command on the pooled connection")
+    return all(checks.values())
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Minecraft RCON server')
+    parser.add_argument('--port', type=int, default=25575)
+    parser.add_argument('--password', default='secret')
+    parser.add_argument('--self-test', action='store_true', help='test rcon.py against the fake and exit')
+    args = parser.parse_args()
+    if args.self_test:
+        raise SystemExit(0 if self_test() else 1)
+    server = FakeRconServer(args.port, args.password)
+    print(f"🧪 Fake RCON server on 127.0.0.1:{server.port} (password {args.password})")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Minecraft RCON client, shared by adaptive-minecraft.py and auto-backup.py.
+
+Packets are <length, request id, type, body, 2 NUL bytes>, little-endian.
+The server handles one packet per read() and drops the connection if a read
+holds anything else, so packets are never pipelined: each command is sent on
+its own, and once its first response packet is in, a packet of an unknown type
+follows. The server answers that after the command's last fragment (long
+responses arrive split over packets), which marks the end of the response.
+"""
+import os
+import secrets
+import socket
+import struct
+import threading
+
+LOGIN, COMMAND, RESPONSE = 3, 2, 0
+END_MARKER = 200  # unknown packet type, echoed back as "Unknown request c8"
+MAX_BODY = 1446  # longest command the server accepts in one packet
+
+class RconError(Exception):
+    pass
+
+class RconClient:
+    def __init__(self, host, port, password, timeout=10):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.sock = None
+        self.next_id = 0
+        self.answered = 0  # commands of the current batch the server has answered
+        self.lock = threading.Lock()
+
+    def connect(self):
+        self.close()
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        request_id = self.send(LOGIN, self.password)
+        response_id, _, _ = self.receive()
+        if response_id == -1 or response_id != request_id:
+            self.close()
+            raise RconError('RCON authentication failed')
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+
+    def packet(self, packet_type, body):
+        """(request id, encoded packet)"""
+        self.next_id = self.next_id % 0x7FFFFFFF + 1
+        payload = struct.pack('<ii', self.next_id, packet_type) + body.encode('utf-8') + b'\0\0'
+        return self.next_id, struct.pack('<i', len(payload)) + payload
+
+    def send(self, packet_type, body):
+        request_id, data = self.packet(packet_type, body)
+        self.sock.sendall(data)
+        return request_id
+
+    def read_exact(self, size):
+        data = b''
+        while len(data) < size:
+            part = self.sock.recv(size - len(data))
+            if not part:
+                raise ConnectionError('RCON connection closed')
+            data += part
+        return data
+
+    def receive(self):
+        """(request id, type, body) of the next packet"""
+        length = struct.unpack('<i', self.read_exact(4))[0]
+        if not 10 <= length <= 1 << 20:
+            raise RconError(f'bad RCON packet length {length}')
+        payload = self.read_exact(length)
+        request_id, packet_type = struct.unpack('<ii', payload[:8])
+        return request_id, packet_type, payload[8:-2].decode('utf-8', 'replace')
+
+    def batch(self, commands):
+        """Run commands in order on one connection; returns their response texts.
+
+        Reconnects once if the pooled connection turns out to be dead before any
+        command ran; commands are never resent once one has been answered.
+        """
+        for command in commands:
+            if len(command.encode('utf-8')) > MAX_BODY:
+                raise RconError(f'command longer than {MAX_BODY} bytes')
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    self.answered = 0
+                    if self.sock is None:
+                        self.connect()
+                    return self.exchange(commands)
+                except socket.timeout as e:
+                    self.close()  # the server is slow, not gone: resending would run commands twice
+                    raise RconError(f'RCON {self.host}:{self.port} timed out') from e
+                except (OSError, ConnectionError) as e:
+                    self.close()
+                    if attempt or self.answered:
+                        raise RconError(f'RCON {self.host}:{self.port} unreachable: {e}') from e
+
+    def exchange(self, commands):
+        responses = []
+        for i, command in enumerate(commands):
+            request_id = self.send(COMMAND, command)
+            body = self.read_response(request_id)
+            self.answered += 1
+            try:
+                end = self.send(END_MARKER, '')
+                while True:
+                    response_id, _, part = self.receive()
+                    if response_id == end:
+                        break
+                    if response_id == request_id:
+                        body += part
+            except (OSError, ConnectionError):
+                if i < len(commands) - 1:
+                    raise
+                self.close()  # e.g. 'stop': the server hung up after answering
+            responses.append(body)
+        return responses
+
+    def read_response(self, request_id):
+        """Body of the first response packet to request_id"""
+        while True:
+            response_id, _, body = self.receive()
+            if response_id == request_id:
+                return body
+
+    def command(self, command):
+        return self.batch([command])[0]
+
+class RconPool:
+    """One persistent connection per server, created on first use"""
+    def __init__(self, timeout=10):
+        self.clients = {}
+        self.lock = threading.Lock()
+        self.timeout = timeout
+
+    def get(self, key, host, port, password):
+        with self.lock:
+            client = self.clients.get(key)
+            if client is None or (client.port, client.password) != (port, password):
+                if client:
+                    client.close()
+                client = self.clients[key] = RconClient(host, port, password, self.timeout)
+            return client
+
+    def drop(self, key):
+        with self.lock:
+            client = self.clients.pop(key, None)
+        if client:
+            client.close()
+
+def read_properties(path):
+    """server.properties as an ordered dict (comments dropped)"""
+    properties = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    properties[key.strip()] = value.strip()
+    except FileNotFoundError:
+        pass
+    return properties
+
+def write_properties(path, properties):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write('#Minecraft server properties\n')
+        for key, value in properties.items():
+            f.write(f'{key}={value}\n')
+    os.replace(tmp, path)
+
+def ensure_rcon(server_dir, port):
+    """Enable RCON on port in server_dir/server.properties, generating a password once.
+
+    Returns (port, password).
+    """
+    path = os.path.join(server_dir, 'server.properties')
+    properties = read_properties(path)
+    wanted = {
+        'enable-rcon': 'true',
+        'rcon.port': str(port),
+        'rcon.password': properties.get('rcon.password') or secrets.token_urlsafe(24),
+        'broadcast-rcon-to-ops': 'false'
+    }
+    if any(properties.get(key) != value for key, value in wanted.items()):
+        properties.update(wanted)
+        write_properties(path, properties)
+    return port, wanted['rcon.password']
+
+def rcon_settings(server_dir):
+    """(port, password) if server_dir's server.properties has RCON enabled, else None"""
+    properties = read_properties(os.path.join(server_dir, 'server.properties'))
+    if properties.get('enable-rcon') != 'true' or not properties.get('rcon.password'):
+        return None
+    return int(properties.get('rcon.port', 25575)), properties['rcon.password']
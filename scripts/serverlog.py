@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Incremental parsing of Minecraft server logs into health metrics.
+
+LogTailer reads logs/latest.log from the last offset only, following the file
+across rotation (new inode) and truncation. ServerLog turns the lines into
+counters and histograms: boot time, "Can't keep up!" lag, player joins and
+leaves, and crashes.
+"""
+import bisect
+import os
+import re
+import threading
+import time
+
+DONE = re.compile(r'\]: Done \((?P<seconds>[\d.]+)s\)!')
+LAG = re.compile(r"Can't keep up!.*?Running (?P<ms>\d+)ms or (?P<ticks>\d+) ticks behind")
+JOINED = re.compile(r'\]: (?P<name>[A-Za-z0-9_]{1,16}) joined the game')
+LEFT = re.compile(r'\]: (?P<name>[A-Za-z0-9_]{1,16}) left the game')
+CRASH_REPORT = re.compile(r'This crash report has been saved to: (?P<path>\S+)')
+CRASHED = ('Encountered an unexpected exception', 'Failed to start the minecraft server')
+STOPPING = ']: Stopping server'
+
+class Histogram:
+    """Cumulative bucket counts (Prometheus style) plus sum, count and max"""
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def to_dict(self):
+        buckets, running = {}, 0
+        for bound, count in zip(self.bounds + ['+Inf'], self.counts):
+            running += count
+            buckets[str(bound)] = running
+        return {'count': self.count, 'sum': round(self.sum, 3), 'max': round(self.max, 3),
+                'mean': round(self.sum / self.count, 3) if self.count else None, 'buckets': buckets}
+
+class LogTailer:
+    """Yields only the complete lines appended since the last read"""
+    def __init__(self, path, from_start=True):
+        self.path = path
+        self.inode = None
+        self.offset = 0
+        self.partial = b''
+        if not from_start:
+            self.skip_existing()
+
+    def skip_existing(self):
+        """Start after whatever the file holds now (an older run's log)"""
+        try:
+            stat = os.stat(self.path)
+            self.inode, self.offset = stat.st_ino, stat.st_size
+        except OSError:
+            self.inode, self.offset = None, 0
+        self.partial = b''
+
+    def read(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return []
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            # Rotated or truncated: the current file is new, read it from the top
+            self.inode, self.offset, self.partial = stat.st_ino, 0, b''
+        if stat.st_size == self.offset:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(stat.st_size - self.offset)
+        self.offset += len(data)
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        return [line.decode('utf-8', 'replace').rstrip('\r') for line in lines]
+
+class ServerLog:
+    """Health metrics for one server, fed from its latest.log"""
+    def __init__(self, server_dir, lag_window=300, on_ready=None):
+        self.tailer = LogTailer(os.path.join(server_dir, 'logs', 'latest.log'))
+        self.lag_window = lag_window
+        self.on_ready = on_ready  # called with (launch label, seconds) when a timed launch is Done
+        self.lock = threading.Lock()
+        self.boot_seconds = Histogram([5, 10, 20, 30, 45, 60, 90, 120, 180, 300])
+        self.launch_to_done = Histogram([5, 10, 20, 30, 45, 60, 90, 120, 180, 300])
+        self.lag_ms = Histogram([100, 250, 500, 1000, 2000, 5000, 10000, 30000, 60000])
+        self.counters = {'lines': 0, 'starts': 0, 'lag_warnings': 0, 'ticks_skipped': 0,
+                         'joins': 0, 'leaves': 0, 'crashes': 0, 'unexpected_exits': 0}
+        self.players = set()
+        self.recent_lag = []  # timestamps of lag warnings inside lag_window
+        self.launched_at = None
+        self.timed = False  # launch-to-Done is only measured for launches we watched live
+        self.label = None
+        self.ready = False
+        self.ready_at = None
+        self.empty_since = None  # while ready with nobody online
+        self.last_boot_seconds = None
+        self.last_crash_report = None
+        self.last_line_at = None
+
+    def launched(self, started_at, fresh=True, label=None):
+        """A new server process started; fresh launches skip the previous run's log.
+        label (e.g. the launch profile) is passed to on_ready with the launch-to-Done time"""
+        with self.lock:
+            self.label = label
+            if fresh:
+                self.tailer.skip_existing()
+            self.launched_at = started_at
+            self.timed = fresh
+            self.ready = False
+            self.ready_at = None
+            self.empty_since = None
+            self.players.clear()
+
+    def exited(self, unexpected):
+        with self.lock:
+            self.ready = False
+            self.empty_since = None
+            self.players.clear()
+            if unexpected:
+                self.counters['unexpected_exits'] += 1
+
+    def poll(self):
+        """Parse whatever was appended since the last poll"""
+        lines = self.tailer.read()
+        if not lines:
+            return 0
+        now = time.time()
+        with self.lock:
+            for line in lines:
+                self.parse(line, now)
+            self.counters['lines'] += len(lines)
+            self.last_line_at = now
+        return len(lines)
+
+    def parse(self, line, now):
+        """Caller holds self.lock"""
+        if "Can't keep up!" in line:
+            match = LAG.search(line)
+            self.counters['lag_warnings'] += 1
+            self.recent_lag.append(now)
+            if match:
+                self.lag_ms.observe(int(match['ms']))
+                self.counters['ticks_skipped'] += int(match['ticks'])
+        elif ' joined the game' in line:
+            match = JOINED.search(line)
+            if match:
+                self.counters['joins'] += 1
+                self.players.add(match['name'])
+                self.empty_since = None
+        elif ' left the game' in line:
+            match = LEFT.search(line)
+            if match:
+                self.counters['leaves'] += 1
+                self.players.discard(match['name'])
+                if not self.players and self.ready:
+                    self.empty_since = now
+        elif ']: Done (' in line:
+            match = DONE.search(line)
+            if match:
+                self.counters['starts'] += 1
+                self.ready, self.ready_at = True, now
+                self.empty_since = now if not self.players else None
+                self.last_boot_seconds = float(match['seconds'])
+                self.boot_seconds.observe(self.last_boot_seconds)
+                if self.timed:
+                    self.launch_to_done.observe(now - self.launched_at)
+                    if self.on_ready:
+                        self.on_ready(self.label, now - self.launched_at)
+        elif STOPPING in line:
+            self.ready = False
+            self.empty_since = None
+        elif 'crash report' in line or any(marker in line for marker in CRASHED):
+            match = CRASH_REPORT.search(line)
+            if match:
+                self.last_crash_report = match['path']
+            elif any(marker in line for marker in CRASHED):
+                self.counters['crashes'] += 1
+                self.ready = False
+                self.empty_since = None
+
+    def empty_seconds(self):
+        """How long the server has been up with nobody online, or None"""
+        with self.lock:
+            return time.time() - self.empty_since if self.empty_since else None
+
+    def snapshot(self):
+        now = time.time()
+        with self.lock:
+            self.recent_lag = [t for t in self.recent_lag if now - t < self.lag_window]
+            return {
+                'ready': self.ready,
+                'boot_seconds': self.last_boot_seconds,
+                'launch_to_done_seconds': round(self.ready_at - self.launched_at, 3)
+                if self.ready_at and self.timed else None,
+                'players_online': len(self.players),
+                'players': sorted(self.players),
+                'empty_seconds': round(now - self.empty_since, 1) if self.empty_since else None,
+                'lag_warnings_recent': len(self.recent_lag),
+                'counters': dict(self.counters),
+                'last_crash_report': self.last_crash_report,
+                'histograms': {
+                    'boot_seconds': self.boot_seconds.to_dict(),
+                    'launch_to_done_seconds': self.launch_to_done.to_dict(),
+                    'lag_ms': self.lag_ms.to_dict()
+                }
+            }
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Content-addressed chunk storage spread over the workers' disks.
+
+Each worker keeps chunks named by their sha256 under ~/cloud-storage/nodes/<node_id>.
+The combiner places every chunk on STORAGE_REPLICAS workers picked by a
+consistent-hash ring, so a node joining or leaving only moves the chunks next to
+it on the ring. Reads go to the least-loaded, lowest-latency replica that has it.
+"""
+import bisect
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+def is_chunk_hash(value):
+    return len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes"""
+    def __init__(self, nodes=(), vnodes=64):
+        self.vnodes = vnodes
+        self.points = []  # sorted [(position, node)]
+        self.nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def position(key):
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def add(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.vnodes):
+            bisect.insort(self.points, (self.position(f'{node}#{i}'), node))
+
+    def remove(self, node):
+        self.nodes.discard(node)
+        self.points = [point for point in self.points if point[1] != node]
+
+    def owners(self, key, count):
+        """The first count distinct nodes clockwise from the key's position"""
+        if not self.points:
+            return []
+        owners = []
+        start = bisect.bisect(self.points, (self.position(key), ''))
+        for i in range(len(self.points)):
+            node = self.points[(start + i) % len(self.points)][1]
+            if node not in owners:
+                owners.append(node)
+                if len(owners) == count:
+                    break
+        return owners
+
+class LocalChunkStore:
+    """Chunks as files named by sha256, fanned out as ab/cd/<hash>"""
+    def __init__(self, root, reserve_bytes=1024**3):
+        self.root = os.path.expanduser(root)
+        self.reserve_bytes = reserve_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self.lock = threading.Lock()
+        self.count = self.bytes = 0
+        self.reads = 0  # reads in flight, reported so the combiner can pick idle replicas
+        for chunk_hash in self.hashes():  # one scan at startup, then kept up to date
+            self.count += 1
+            self.bytes += self.size(chunk_hash) or 0
+
+    def path(self, chunk_hash):
+        return os.path.join(self.root, chunk_hash[:2], chunk_hash[2:4], chunk_hash)
+
+    def has(self, chunk_hash):
+        return os.path.exists(self.path(chunk_hash))
+
+    def size(self, chunk_hash):
+        try:
+            return os.path.getsize(self.path(chunk_hash))
+        except OSError:
+            return None
+
+    def read(self, chunk_hash):
+        """Chunk bytes; raises FileNotFoundError"""
+        with self.lock:
+            self.reads += 1
+        try:
+            with open(self.path(chunk_hash), 'rb') as f:
+                return f.read()
+        finally:
+            with self.lock:
+                self.reads -= 1
+
+    def free_bytes(self):
+        return shutil.disk_usage(self.root).free
+
+    def put(self, chunk_hash, data):
+        """Store data after checking its hash. Returns False if it was already stored"""
+        if hashlib.sha256(data).hexdigest() != chunk_hash:
+            raise ValueError('sha256 of the body does not match the chunk name')
+        path = self.path(chunk_hash)
+        if os.path.exists(path):
+            return False
+        if self.free_bytes() - len(data) < self.reserve_bytes:
+            raise OSError('not enough free disk space')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        with self.lock:
+            self.count += 1
+            self.bytes += len(data)
+        return True
+
+    def delete(self, chunk_hash):
+        size = self.size(chunk_hash)
+        try:
+            os.unlink(self.path(chunk_hash))
+        except FileNotFoundError:
+            return False
+        with self.lock:
+            self.count -= 1
+            self.bytes -= size or 0
+        return True
+
+    def hashes(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if is_chunk_hash(name):
+                    yield name
+
+    def stats(self):
+        with self.lock:
+            counts = {'chunks': self.count, 'bytes': self.bytes, 'reads': self.reads}
+        return dict(counts, free_bytes=self.free_bytes())
+
+class ClusterStore:
+    """Client for the combiner's /storage API. Reads go straight to a replica, in parallel"""
+    def __init__(self, combiner_url='http://localhost:5001', session=None, workers=8, timeout=30):
+        self.url = combiner_url.rstrip('/')
+        self.session = session or requests.Session()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.timeout = timeout
+
+    def put(self, data):
+        chunk_hash = hashlib.sha256(data).hexdigest()
+        response = self.session.put(f'{self.url}/storage/chunks/{chunk_hash}', data=data, timeout=self.timeout)
+        response.raise_for_status()
+        return chunk_hash
+
+    def get(self, chunk_hash):
+        """Try the replicas in the combiner's preferred order; verify what comes back"""
+        located = self.session.get(f'{self.url}/storage/locate/{chunk_hash}', timeout=self.timeout)
+        located.raise_for_status()
+        for url in located.json()['replicas']:
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except requests.RequestException:
+                continue
+            if response.ok and hashlib.sha256(response.content).hexdigest() == chunk_hash:
+                return response.content
+        raise KeyError(chunk_hash)
+
+    def get_many(self, hashes):
+        """{hash: data}, fetched concurrently"""
+        return dict(zip(hashes, self.executor.map(self.get, hashes)))
@@ -1,10 +1,117 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import os
+import json
+import math
 import time
+import queue
+import socket
+import threading
+import uuid
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import psutil
+import requests
+import jobs
+from gossip import GossipNode
+from storage import LocalChunkStore, is_chunk_hash
 
 app = Flask(__name__)
 
+PORT = int(os.environ.get('PORT', 5000))
+ADVERTISE_ADDR = os.environ.get('ADVERTISE_ADDR', f"{socket.gethostname()}:{PORT}")
+# MC_HOST=1: this node also runs adaptive-minecraft.py and takes Minecraft servers from the planner
+SERVICES = ['compute', 'storage'] + (['minecraft'] if os.environ.get('MC_HOST') == '1' else [])
+gossip = None
+
+class QueueFull(Exception):
+    pass
+
+class JobRunner:
+    """Runs registered ops in a process pool sized to this node's cores, with a bounded queue"""
+    def __init__(self, workers=None, queue_limit=None, keep=1000):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit or self.workers * 4
+        self.pool = None
+        self.lock = threading.Lock()
+        self.jobs = {}  # job id -> record, the most recent `keep` finished ones retained
+        self.finished = deque()
+        self.keep = keep
+        self.pending = 0
+        self.avg_seconds = 0.1
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+    
+    def get_pool(self):
+        """Caller holds self.lock"""
+        if self.pool is None:
+            # spawn, not fork: this process already runs Flask and gossip threads
+            self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return self.pool
+    
+    def load(self):
+        return {'pending': self.pending, 'capacity': self.queue_limit, 'workers': self.workers}
+    
+    def retry_after(self):
+        """Seconds until the queue has likely drained enough to take more work"""
+        return max(1, math.ceil(self.pending / self.workers * self.avg_seconds))
+    
+    def submit(self, batch):
+        """Queue a validated batch. Returns (job ids, Queue of result lines); raises QueueFull"""
+        jobs.validate(batch)
+        batch_id = uuid.uuid4().hex[:12]  # generated ids never collide with other batches' ids
+        ids = [str(job['id']) if 'id' in job else f'{batch_id}-{i}' for i, job in enumerate(batch)]
+        if len(set(ids)) != len(ids):
+            raise ValueError('job ids must be unique within a batch')
+        results = queue.Queue()
+        submitted = []
+        with self.lock:
+            if self.pending + len(batch) > self.queue_limit:
+                self.stats['rejected'] += len(batch)
+                raise QueueFull()
+            busy = [job_id for job_id in ids if self.jobs.get(job_id, {}).get('state') == 'queued']
+            if busy:
+                raise ValueError(f'job ids already queued: {", ".join(busy)}')
+            for job_id, job in zip(ids, batch):
+                record = {'id': job_id, 'op': job['op'], 'state': 'queued', 'submitted': time.time()}
+                self.jobs[job_id] = record
+                self.pending += 1
+                self.stats['submitted'] += 1
+                try:
+                    future = self.get_pool().submit(jobs.run_op, job['op'], job.get('args', {}))
+                except BrokenProcessPool:
+                    self.pool = None
+                    future = self.get_pool().submit(jobs.run_op, job['op'], job.get('args', {}))
+                submitted.append((record, future))
+        # Outside the lock: a future that is already done runs its callback right here,
+        # and finish() takes the lock
+        for record, future in submitted:
+            future.add_done_callback(lambda f, record=record: self.finish(record, f, results))
+        return ids, results
+    
+    def finish(self, record, future, results):
+        try:
+            outcome = future.result()
+        except Exception as e:  # the pool itself failed (worker killed)
+            outcome = {'ok': False, 'error': f'{type(e).__name__}: {e}', 'seconds': 0}
+        with self.lock:
+            self.pending -= 1
+            self.stats['completed' if outcome['ok'] else 'failed'] += 1
+            self.avg_seconds = 0.9 * self.avg_seconds + 0.1 * outcome['seconds']
+            record.update(outcome, state='done' if outcome['ok'] else 'failed', finished=time.time())
+            self.finished.append(record['id'])
+            while len(self.finished) > self.keep:
+                self.jobs.pop(self.finished.popleft(), None)
+        results.put(dict(outcome, id=record['id'], op=record['op'], node=os.environ.get('NODE_ID', 'worker')))
+
+# Opened under __main__ only: spawned job processes re-import this module as __mp_main__
+# and must not scan the chunk store or build a runner of their own
+store = None  # LocalChunkStore
+runner = None  # JobRunner
+MAX_CHUNK_BYTES = int(os.environ.get('MAX_CHUNK_MB', 64)) * 1024**2
+
 @app.route('/')
 def home():
     return {
@@ -25,13 +132,166 @@ def health():
 
 @app.route('/combine')
 def combine():
-    """Endpoint for auto-combining"""
+    """Endpoint for auto-combining: the resources this node can contribute right now"""
+    memory = psutil.virtual_memory()
     return jsonify({
-        "available_ram_gb": 2,  # Workers contribute 2GB
-        "services": ["compute", "storage"],
+        "node_id": os.environ.get('NODE_ID', 'worker'),
+        "available_ram_gb": round(memory.available / (1024**3), 2),
+        "total_ram_gb": round(memory.total / (1024**3), 2),
+        "cpu_cores": os.cpu_count(),
+        "load": {
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "ram_percent": memory.percent,
+            "load_avg": os.getloadavg()[0]
+        },
+        "jobs": runner.load(),
+        "storage": store.stats(),
+        "services": SERVICES,
         "status": "ready_to_combine"
     })
 
+@app.route('/jobs/ops')
+def job_ops():
+    return jsonify({'ops': sorted(jobs.OPS), **runner.load()})
+
+@app.route('/jobs/batch', methods=['POST'])
+def submit_jobs():
+    """Run {"jobs": [{"op", "args", "id"?}]}. With ?stream=1 results come back as NDJSON
+    in completion order; otherwise 202 with job ids to poll at /jobs/<id>. 429 when full."""
+    data = request.get_json(silent=True) or {}
+    try:
+        ids, results = runner.submit(data.get('jobs'))
+    except ValueError as e:
+        return jsonify({'error': str(e), 'ops': sorted(jobs.OPS)}), 400
+    except QueueFull:
+        response = jsonify({'error': 'job queue is full', **runner.load()})
+        response.headers['Retry-After'] = str(runner.retry_after())
+        return response, 429
+    
+    if request.args.get('stream', '0') not in ('1', 'true'):
+        return jsonify({'jobs': ids, **runner.load()}), 202
+    
+    def stream():
+        for _ in ids:
+            yield json.dumps(results.get()) + '\n'
+    return Response(stream(), mimetype='application/x-ndjson')
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    with runner.lock:
+        record = runner.jobs.get(job_id)
+        record = dict(record) if record else None
+    if record is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify(record)
+
+@app.route('/jobs')
+def job_stats():
+    return jsonify({**runner.load(), 'stats': runner.stats, 'avg_seconds': round(runner.avg_seconds, 4)})
+
+@app.route('/chunks/<chunk_hash>', methods=['PUT'])
+def put_chunk(chunk_hash):
+    """Store a chunk; the body must hash to the name"""
+    if not is_chunk_hash(chunk_hash):
+        return jsonify({'error': 'chunk name must be a lowercase sha256'}), 400
+    if (request.content_length or 0) > MAX_CHUNK_BYTES:
+        return jsonify({'error': f'chunks are limited to {MAX_CHUNK_BYTES} bytes'}), 413
+    try:
+        created = store.put(chunk_hash, request.get_data())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except OSError as e:
+        return jsonify({'error': str(e)}), 507
+    return jsonify({'hash': chunk_hash, 'created': created}), 201 if created else 200
+
+@app.route('/chunks/<chunk_hash>', methods=['GET'])
+def get_chunk(chunk_hash):
+    """Chunk bytes (HEAD for existence and size)"""
+    if not is_chunk_hash(chunk_hash) or not store.has(chunk_hash):
+        return jsonify({'error': 'no such chunk'}), 404
+    if request.method == 'HEAD':
+        response = Response(status=200)
+        response.headers['Content-Length'] = str(store.size(chunk_hash))
+        return response
+    try:
+        data = store.read(chunk_hash)
+    except FileNotFoundError:
+        return jsonify({'error': 'no such chunk'}), 404
+    response = Response(data, mimetype='application/octet-stream')
+    response.set_etag(chunk_hash)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.route('/chunks/<chunk_hash>', methods=['DELETE'])
+def delete_chunk(chunk_hash):
+    if not is_chunk_hash(chunk_hash):
+        return jsonify({'error': 'chunk name must be a lowercase sha256'}), 400
+    return jsonify({'hash': chunk_hash, 'deleted': store.delete(chunk_hash)})
+
+@app.route('/chunks')
+def chunk_stats():
+    return jsonify(dict(store.stats(), root=store.root))
+
+def gossip_meta():
+    """What this worker tells the cluster about itself (whole GB, so it rarely changes)"""
+    return {
+        'role': 'worker',
+        'node_id': os.environ.get('NODE_ID', 'worker'),
+        'http': ADVERTISE_ADDR,
+        'available_ram_gb': round(psutil.virtual_memory().available / (1024**3)),
+        'cpu_cores': os.cpu_count(),
+        'services': SERVICES
+    }
+
+def start_gossip():
+    """Join the gossip membership when GOSSIP_PORT is set"""
+    global gossip
+    if not os.environ.get('GOSSIP_PORT'):
+        return
+    gossip = GossipNode(os.environ.get('NODE_ID', socket.gethostname()), int(os.environ['GOSSIP_PORT']),
+                        advertise=os.environ.get('GOSSIP_ADVERTISE'), meta=gossip_meta(),
+                        period=float(os.environ.get('GOSSIP_PERIOD', 1.0)))
+    seeds = [s for s in os.environ.get('GOSSIP_SEEDS', '').split(',') if s.strip()]
+    gossip.start(seeds)
+    print(f"🗣️  Gossiping on UDP {gossip.addr[0]}:{gossip.addr[1]} (seeds: {seeds or 'none'})")
+    while True:
+        time.sleep(10)
+        meta = gossip_meta()
+        if meta != gossip.meta:
+            gossip.update_meta(meta)
+
+@app.route('/gossip/members')
+def gossip_members():
+    """This worker's view of the cluster"""
+    if gossip is None:
+        return jsonify({'enabled': False, 'members': []})
+    return jsonify({'enabled': True, 'self': gossip.id, 'incarnation': gossip.incarnation,
+                    'members': gossip.snapshot(), 'stats': gossip.stats})
+
+def announce():
+    """Join the combiner at COMBINER_URL, retrying until it answers"""
+    combiner_url = os.environ.get('COMBINER_URL')
+    if not combiner_url:
+        return
+    address = ADVERTISE_ADDR
+    delay = 1
+    while True:
+        try:
+            response = requests.post(f"{combiner_url.rstrip('/')}/nodes/join",
+                                     json={'address': address}, timeout=5)
+            if response.ok:
+                print(f"🤝 Joined cluster at {combiner_url} as {address}")
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 60)
+
 if __name__ == '__main__':
-    print(f"👷 Worker {os.environ.get('NODE_ID')} Started - Auto-Combine Ready")
-    app.run(host='0.0.0.0', port=5000)
+    store = LocalChunkStore(os.environ.get('STORAGE_DIR', f"~/cloud-storage/nodes/{os.environ.get('NODE_ID', 'worker')}"),
+                            reserve_bytes=int(float(os.environ.get('STORAGE_RESERVE_GB', 1)) * 1024**3))
+    runner = JobRunner(int(os.environ.get('JOB_WORKERS', 0)) or None, int(os.environ.get('JOB_QUEUE', 0)) or None)
+    print(f"👷 Worker {os.environ.get('NODE_ID')} Started on port {PORT} - Auto-Combine Ready")
+    threading.Thread(target=announce, daemon=True).start()
+    threading.Thread(target=start_gossip, daemon=True).start()
+    app.run(host='0.0.0.0', port=PORT, threaded=True)
@@ -22,6 +22,11 @@ mkdir -p ~/cluster ~/minecraft/servers ~/cloud-storage/nodes ~/backups/minecraft
 
 if [ "$SERVICE_TYPE" = "worker" ]; then
     echo "🚀 Starting Worker Node..."
+    if [ "$MC_HOST" = "1" ]; then
+        # Hosts the Minecraft servers the main node's planner places on $NODE_ID
+        echo "   🎮 Minecraft Manager (Port 5002, config from ${COMBINER_URL:-http://localhost:5001})..."
+        python3 ~/scripts/adaptive-minecraft.py &
+    fi
     python3 ~/scripts/worker.py
 else
     echo "🚀 Starting Main Cluster Terminal..."